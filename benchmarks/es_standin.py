@@ -0,0 +1,309 @@
+"""Minimal Elasticsearch stand-in for offline benchmarks.
+
+Answers the handful of APIs the SOC services call - cluster info and health,
+_search, _msearch, _bulk, _field_caps and point-in-time open/close - with
+well-formed but synthetic responses after a simulated latency. It never looks at the
+data, only at the request shape (size, aggregations), so it measures the
+services rather than a cluster.
+
+Latency is log-normal around ``latency`` (``jitter`` is the sigma, 0 for a
+fixed delay, seeded so runs repeat) and an _msearch costs a little more per
+extra search. Hits can be padded to a realistic ``_source`` size, and terms,
+filters, composite and date_histogram aggregations come back with populated
+buckets.
+
+    python benchmarks/es_standin.py --port 9299 --latency 0.05 --jitter 0.3
+"""
+import argparse
+import gzip
+import json
+import random
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+CLUSTER_INFO = {
+    "name": "es-standin",
+    "cluster_name": "benchmark",
+    "version": {"number": "8.11.1", "build_flavor": "default", "lucene_version": "9.8.0"},
+    "tagline": "You Know, for Search"
+}
+
+INTERVALS = {
+    'minute': timedelta(minutes=1),
+    'hour': timedelta(hours=1),
+    'day': timedelta(days=1),
+    'week': timedelta(weeks=1),
+    'month': timedelta(days=30)
+}
+# Extra latency per additional search in an _msearch, as a fraction of one search
+MSEARCH_COST = 0.05
+# Histogram buckets returned when the bounds are date math the stand-in does not evaluate
+DEFAULT_BUCKETS = 24
+MAX_BUCKETS = 2000
+
+
+def fake_hits(size, total, doc_bytes=0):
+    now = datetime.now(timezone.utc).isoformat()
+    padding = 'x' * doc_bytes
+    hits = []
+    for i in range(min(size, total)):
+        source = {
+            "@timestamp": now,
+            "host": {"name": f"host-{i % 7}"},
+            "user": {"name": f"user-{i % 5}"},
+            "source": {"ip": f"10.0.{i % 16}.{i % 250 + 1}"},
+            "event": {"category": "authentication", "outcome": "failure"},
+            "rule": {"id": str(5700 + i % 20), "level": 5 + i % 7, "description": "Synthetic alert"}
+        }
+        if padding:
+            source["full_log"] = padding
+        hits.append({"_index": "wazuh-alerts-standin", "_id": f"doc-{i}", "_score": None, "_source": source, "sort": [i]})
+    return hits
+
+
+def fake_histogram(histogram, doc_count, sub=None):
+    step = INTERVALS.get(histogram.get('calendar_interval') or histogram.get('fixed_interval'), INTERVALS['hour'])
+    bounds = histogram.get('extended_bounds') or {}
+    if isinstance(bounds.get('min'), int) and isinstance(bounds.get('max'), int):
+        start = datetime.fromtimestamp(bounds['min'] / 1000, timezone.utc)
+        count = int((bounds['max'] - bounds['min']) / 1000 // step.total_seconds()) + 1
+    else:
+        count = DEFAULT_BUCKETS
+        start = datetime.now(timezone.utc) - step * count
+    buckets = []
+    for i in range(max(1, min(count, MAX_BUCKETS))):
+        bucket_count = doc_count if i % 4 == 0 else 0
+        buckets.append(dict(
+            {"key": int((start + step * i).timestamp() * 1000), "doc_count": bucket_count},
+            **fake_aggregations(sub, bucket_count)
+        ))
+    return buckets
+
+
+def _keyword_source(spec):
+    return next(iter(spec.values())).get('field', '').endswith('.keyword')
+
+
+def fake_aggregations(aggs, doc_count=0):
+    """Valid results for each requested aggregation, populated from doc_count"""
+    results = {}
+    for name, agg in (aggs or {}).items():
+        sub = agg.get('aggs') or agg.get('aggregations')
+        if 'filters' in agg:
+            buckets = {}
+            for i, key in enumerate(agg['filters'].get('filters', {})):
+                count = doc_count if i % 3 == 0 else 0
+                buckets[key] = dict({"doc_count": count}, **fake_aggregations(sub, count))
+            results[name] = {"buckets": buckets}
+        elif 'filter' in agg:
+            results[name] = dict({"doc_count": doc_count}, **fake_aggregations(sub, doc_count))
+        elif 'terms' in agg:
+            field = agg['terms'].get('field', 'key').replace('.keyword', '')
+            buckets = [
+                dict({"key": f"{field}-{i}", "doc_count": max(doc_count - i, 1)}, **fake_aggregations(sub, doc_count))
+                for i in range(min(agg['terms'].get('size', 10), 10) if doc_count else 0)
+            ]
+            results[name] = {"doc_count_error_upper_bound": 0, "sum_other_doc_count": 0, "buckets": buckets}
+        elif 'composite' in agg:
+            # A single page: asking for the one after it returns nothing
+            composite = agg['composite']
+            count = 0 if 'after' in composite or not doc_count else min(composite.get('size', 10), 10)
+            buckets = [
+                dict({
+                    # Scripted and numeric sources (hour of week and the like) get numeric keys
+                    "key": {
+                        key: f"{key}-{i}" if _keyword_source(spec) else i
+                        for source in composite['sources'] for key, spec in source.items()
+                    },
+                    "doc_count": doc_count
+                }, **fake_aggregations(sub, doc_count))
+                for i in range(count)
+            ]
+            results[name] = {"buckets": buckets}
+            if buckets:
+                results[name]["after_key"] = buckets[-1]["key"]
+        elif 'date_histogram' in agg:
+            results[name] = {"buckets": fake_histogram(agg['date_histogram'], doc_count, sub)}
+        elif 'top_hits' in agg:
+            results[name] = {"hits": {
+                "total": {"value": doc_count, "relation": "eq"},
+                "max_score": None,
+                "hits": fake_hits(agg['top_hits'].get('size', 3), doc_count)
+            }}
+        elif any(kind in agg for kind in ('sum', 'avg', 'max', 'min', 'cardinality', 'value_count')):
+            results[name] = {"value": doc_count}
+        elif any(kind in agg for kind in ('max_bucket', 'min_bucket')):
+            results[name] = {"value": doc_count, "keys": [datetime.now(timezone.utc).isoformat()]}
+        elif any(kind in agg for kind in ('avg_bucket', 'sum_bucket', 'moving_fn')):
+            results[name] = {"value": doc_count}
+        elif any(kind in agg for kind in ('bucket_selector', 'bucket_sort')):
+            continue  # pipeline aggregations that only filter add nothing to the response
+        else:
+            results[name] = {"buckets": []}
+    return results
+
+
+class StandinHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+    latency = 0.0
+    jitter = 0.0
+    total_hits = 25
+    doc_bytes = 0
+    random = random.Random(1)
+    random_lock = threading.Lock()
+
+    def log_message(self, format, *args):
+        pass
+
+    def _delay(self, searches=1):
+        """Simulated service time in seconds for a request carrying ``searches`` searches"""
+        factor = 1.0
+        if self.jitter:
+            with self.random_lock:
+                factor = self.random.lognormvariate(0, self.jitter)
+        return self.latency * factor * (1 + MSEARCH_COST * (searches - 1))
+
+    def _body(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        raw = self.rfile.read(length) if length else b''
+        if raw and self.headers.get('Content-Encoding') == 'gzip':
+            raw = gzip.decompress(raw)
+        return raw
+
+    def _reply(self, payload, status=200):
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('X-Elastic-Product', 'Elasticsearch')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _search_response(self, body, took):
+        size = body.get('size', 10)
+        response = {
+            "took": int(took * 1000),
+            "timed_out": False,
+            "_shards": {"total": 1, "successful": 1, "skipped": 0, "failed": 0},
+            "hits": {
+                "total": {"value": self.total_hits, "relation": "eq"},
+                "max_score": None,
+                "hits": fake_hits(size, self.total_hits, self.doc_bytes)
+            }
+        }
+        if body.get('aggs') or body.get('aggregations'):
+            response["aggregations"] = fake_aggregations(body.get('aggs') or body.get('aggregations'), self.total_hits)
+        if body.get('profile'):
+            response["profile"] = {"shards": [{
+                "id": "[standin][wazuh-alerts-standin][0]",
+                "searches": [{"query": [], "rewrite_time": 0, "collector": []}],
+                "aggregations": []
+            }]}
+        if body.get('pit'):
+            response["pit_id"] = body['pit'].get('id')
+            # search_after pages end once the cursor has been handed back
+            if body.get('search_after'):
+                response["hits"]["hits"] = []
+        return response
+
+    def do_HEAD(self):
+        self._reply({})
+
+    def do_GET(self):
+        self._route(self._body())
+
+    def do_POST(self):
+        self._route(self._body())
+
+    def do_PUT(self):
+        self._body()
+        self._reply({"acknowledged": True})
+
+    def do_DELETE(self):
+        self._body()
+        self._reply({"succeeded": True, "num_freed": 1})
+
+    def _route(self, raw):
+        path = urlparse(self.path).path
+        if path == '/':
+            self._reply(CLUSTER_INFO)
+            return
+        if path == '/_cluster/health':
+            self._reply({"cluster_name": CLUSTER_INFO['cluster_name'], "status": "green", "number_of_nodes": 1})
+            return
+        if path.startswith('/_ingest/pipeline/') or path.startswith('/_index_template/'):
+            # No pipelines or templates are installed; PUT acknowledges any
+            self._reply({}, status=404)
+            return
+
+        if path.endswith('/_msearch'):
+            bodies = [json.loads(line) for line in raw.splitlines() if line.strip()][1::2]
+            took = self._delay(len(bodies))
+            time.sleep(took)
+            responses = [dict(self._search_response(body, took), status=200) for body in bodies]
+            self._reply({"took": int(took * 1000), "responses": responses})
+            return
+
+        took = self._delay()
+        time.sleep(took)
+        if path.endswith('/_search'):
+            self._reply(self._search_response(json.loads(raw or b'{}'), took))
+        elif path.endswith('/_bulk'):
+            actions = raw.count(b'\n') // 2
+            items = [{"create": {"status": 201, "result": "created"}}] * actions
+            self._reply({"took": int(took * 1000), "errors": False, "items": items})
+        elif path.endswith('/_field_caps'):
+            self._reply({"indices": [], "fields": {}})
+        elif path.endswith('/_pit'):
+            self._reply({"id": "standin-pit"})
+        else:
+            self._reply({"error": {"type": "unsupported", "reason": path}, "status": 400}, status=400)
+
+
+class StandinServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024
+
+
+def serve(port=9299, latency=0.05, total_hits=25, jitter=0.0, doc_bytes=0, seed=1):
+    """Start the stand-in on a background thread and return the server.
+
+    ``port=0`` picks a free port; read it back from ``server.server_port``.
+    """
+    handler = type('Handler', (StandinHandler,), {
+        "latency": latency,
+        "jitter": jitter,
+        "total_hits": total_hits,
+        "doc_bytes": doc_bytes,
+        "random": random.Random(seed),
+        "random_lock": threading.Lock()
+    })
+    server = StandinServer(('127.0.0.1', port), handler)
+    threading.Thread(target=server.serve_forever, name='es-standin', daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--port', type=int, default=9299)
+    parser.add_argument('--latency', type=float, default=0.05, help='median seconds per search request')
+    parser.add_argument('--jitter', type=float, default=0.0, help='log-normal sigma of the latency, 0 = fixed')
+    parser.add_argument('--hits', type=int, default=25, help='total hits reported per search')
+    parser.add_argument('--doc-bytes', type=int, default=0, help='padding added to every hit _source')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    server = serve(args.port, args.latency, args.hits, args.jitter, args.doc_bytes, args.seed)
+    print(f"Elasticsearch stand-in on http://127.0.0.1:{args.port} ({args.latency * 1000:g}ms per search)")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,123 @@
+"""Minimal Ollama stand-in for offline benchmarks.
+
+Answers ``/api/generate`` (non-streaming) and ``/api/tags``. Each call takes
+``load + prompt_tokens / prompt_rate + completion_tokens / generation_rate``
+seconds, with prompt tokens estimated as four characters per token, and
+reports the same counters and nanosecond durations Ollama does, so token
+throughput metrics see plausible values. Like Ollama, only ``parallel``
+generations run at once and the rest queue.
+
+    python benchmarks/ollama_standin.py --port 11499 --generation-rate 40
+"""
+import argparse
+import json
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+CHARS_PER_TOKEN = 4
+RESPONSE_WORDS = (
+    "The activity shows repeated failed authentications from a small set of sources "
+    "followed by a success, which is consistent with a brute force attempt. "
+    "Risk assessment: Medium. Block the sources and reset the affected credentials."
+).split()
+
+
+class OllamaHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+    load = 0.05
+    prompt_rate = 500.0
+    generation_rate = 40.0
+    completion_tokens = 200
+    slots = threading.Semaphore(1)
+
+    def log_message(self, format, *args):
+        pass
+
+    def _reply(self, payload, status=200):
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if urlparse(self.path).path == '/api/tags':
+            self._reply({"models": [{"name": "llama3:latest"}]})
+        else:
+            self._reply({"error": "not found"}, status=404)
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        body = json.loads(self.rfile.read(length) or b'{}')
+        if urlparse(self.path).path != '/api/generate':
+            self._reply({"error": "not found"}, status=404)
+            return
+
+        prompt_tokens = max(1, len(body.get('prompt', '')) // CHARS_PER_TOKEN)
+        prompt_seconds = prompt_tokens / self.prompt_rate
+        eval_seconds = self.completion_tokens / self.generation_rate
+        with self.slots:
+            time.sleep(self.load + prompt_seconds + eval_seconds)
+
+        words = [RESPONSE_WORDS[i % len(RESPONSE_WORDS)] for i in range(self.completion_tokens)]
+        self._reply({
+            "model": body.get('model', 'llama3'),
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "response": ' '.join(words),
+            "done": True,
+            "total_duration": int((self.load + prompt_seconds + eval_seconds) * 1e9),
+            "load_duration": int(self.load * 1e9),
+            "prompt_eval_count": prompt_tokens,
+            "prompt_eval_duration": int(prompt_seconds * 1e9),
+            "eval_count": self.completion_tokens,
+            "eval_duration": int(eval_seconds * 1e9)
+        })
+
+
+class OllamaServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024
+
+
+def serve(port=11499, load=0.05, prompt_rate=500.0, generation_rate=40.0, completion_tokens=200, parallel=1):
+    """Start the stand-in on a background thread and return the server.
+
+    ``port=0`` picks a free port; read it back from ``server.server_port``.
+    """
+    handler = type('Handler', (OllamaHandler,), {
+        "load": load,
+        "prompt_rate": prompt_rate,
+        "generation_rate": generation_rate,
+        "completion_tokens": completion_tokens,
+        "slots": threading.Semaphore(parallel)
+    })
+    server = OllamaServer(('127.0.0.1', port), handler)
+    threading.Thread(target=server.serve_forever, name='ollama-standin', daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--port', type=int, default=11499)
+    parser.add_argument('--load', type=float, default=0.05, help='fixed seconds per call')
+    parser.add_argument('--prompt-rate', type=float, default=500.0, help='prompt tokens per second')
+    parser.add_argument('--generation-rate', type=float, default=40.0, help='completion tokens per second')
+    parser.add_argument('--tokens', type=int, default=200, help='completion tokens per call')
+    parser.add_argument('--parallel', type=int, default=1, help='generations served at once')
+    args = parser.parse_args()
+
+    server = serve(args.port, args.load, args.prompt_rate, args.generation_rate, args.tokens, args.parallel)
+    print(f"Ollama stand-in on http://127.0.0.1:{args.port}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
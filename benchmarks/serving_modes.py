@@ -0,0 +1,123 @@
+"""Concurrent-request throughput of the threat-hunting service, Flask vs ASGI.
+
+Starts the Elasticsearch stand-in, then runs the service once per serving
+mode (threaded Flask dev server as shipped, and uvicorn on asgi_app) and
+drives each hunt route with a fixed number of requests at several
+concurrency levels. Background routing refresh still runs; the scheduler is
+disabled, the result cache TTL is zero and findings go to a throwaway
+database.
+
+    python benchmarks/serving_modes.py --concurrency 10,50,200 --requests 1000
+
+Both modes coalesce identical concurrent hunts in the result cache, so the
+MITRE requests vary ``size`` to keep every request a real search.
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import requests
+
+import es_standin
+from harness import free_port, run_concurrent
+
+SERVICE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'threat-hunting')
+
+IOCS = [
+    '192.168.1.100', '10.0.0.5', 'evil-domain[.]com', 'login.example.net',
+    'd41d8cd98f00b204e9800998ecf8427e', 'da39a3ee5e6b4b0d3255bfef95601890afd80709',
+    'hxxp://malicious.example/payload.exe', 'attacker@example.org'
+]
+
+ROUTES = {
+    'mitre': lambda session, base, i: session.get(
+        f"{base}/api/hunt/mitre/T1110", params={"time_range": "24h", "size": 50 + i % 500}
+    ),
+    'iocs': lambda session, base, i: session.post(
+        f"{base}/api/hunt/iocs", json={"iocs": IOCS, "time_range": "24h", "size": 10}
+    ),
+    'anomalies': lambda session, base, i: session.get(
+        f"{base}/api/hunt/anomalies", params={"time_range": "24h"}
+    )
+}
+
+
+def start_service(mode, port, es_url, db_path):
+    env = dict(
+        os.environ,
+        ELASTICSEARCH_URL=es_url,
+        HUNT_SCHEDULER_ENABLED='false',
+        HUNT_CACHE_TTL='0',
+        HUNT_FINDINGS_DB=db_path,
+        PYTHONUNBUFFERED='1'
+    )
+    if mode == 'flask':
+        command = [sys.executable, '-m', 'flask', '--app', 'app', 'run', '--port', str(port), '--with-threads']
+    else:
+        command = [sys.executable, '-m', 'uvicorn', 'asgi_app:app', '--port', str(port),
+                   '--log-level', 'warning', '--no-access-log']
+    process = subprocess.Popen(command, cwd=SERVICE_DIR, env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    base = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            requests.get(f"{base}/api/health", timeout=1)
+            return process, base
+        except requests.RequestException:
+            time.sleep(0.2)
+    process.kill()
+    raise RuntimeError(f"{mode} service did not start")
+
+
+def run_load(base, route, total, concurrency):
+    local = threading.local()
+
+    def one(i):
+        session = getattr(local, 'session', None)
+        if session is None:
+            session = local.session = requests.Session()
+        response = ROUTES[route](session, base, i)
+        return response.status_code == 200 and 'error' not in response.json()
+
+    return run_concurrent(one, total, concurrency)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--modes', default='flask,asgi')
+    parser.add_argument('--routes', default=','.join(ROUTES))
+    parser.add_argument('--concurrency', default='10,50,200')
+    parser.add_argument('--requests', type=int, default=1000, help='requests per route and concurrency level')
+    parser.add_argument('--latency', type=float, default=0.05, help='simulated seconds per ES search')
+    args = parser.parse_args()
+
+    es_port = free_port()
+    es_standin.serve(es_port, args.latency)
+    es_url = f"http://127.0.0.1:{es_port}"
+    levels = [int(level) for level in args.concurrency.split(',')]
+    routes = args.routes.split(',')
+
+    print(f"ES stand-in latency {args.latency * 1000:g}ms, {args.requests} requests per cell")
+    print(f"{'mode':<6} {'route':<10} {'conc':>5} {'req/s':>9} {'p50 ms':>9} {'p99 ms':>9} {'errors':>7}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for mode in args.modes.split(','):
+            process, base = start_service(mode, free_port(), es_url, os.path.join(tmp, f"{mode}.db"))
+            try:
+                for route in routes:
+                    for level in levels:
+                        stats = run_load(base, route, args.requests, level)
+                        print(f"{mode:<6} {route:<10} {level:>5} {stats['throughput']:>9.1f} "
+                              f"{stats['p50']:>9.1f} {stats['p99']:>9.1f} {stats['errors']:>7}")
+            finally:
+                process.terminate()
+                process.wait()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,185 @@
+"""Offline benchmark suite with regression gates.
+
+Starts the Elasticsearch and Ollama stand-ins in-process, loads the
+threat-hunting and ai-chat apps against them and calls the hot paths
+directly - ``ThreatHunter.hunt_mitre_attack``, ``hunt_iocs`` and
+``hunt_anomalies``, ``SOCAnalyzer.search_logs`` and ``analyze_with_ai`` - at
+each concurrency level. Throughput and p50/p99 latency are compared with
+``baselines.json``; the run exits non-zero when a case has errors, its p99
+grew or its throughput fell by more than the tolerance. Nothing leaves
+localhost.
+
+    python benchmarks/suite.py                      # compare with the baselines
+    python benchmarks/suite.py --cases hunt_iocs --concurrency 1,32
+    python benchmarks/suite.py --update-baseline    # record this machine's numbers
+
+Baselines depend on the machine; record them on the one that runs the gate.
+The result cache TTL is zero, the scheduler is off and findings go to a
+throwaway database. Identical concurrent MITRE hunts are coalesced by the
+cache, so those calls vary ``size`` to keep every call a real search.
+"""
+import argparse
+import atexit
+import importlib.util
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+
+import es_standin
+import ollama_standin
+from harness import run_concurrent
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baselines.json')
+
+# Stand-in behaviour the baselines were recorded with
+ES_SETTINGS = {"latency": 0.02, "jitter": 0.25, "total_hits": 50, "doc_bytes": 1500}
+OLLAMA_SETTINGS = {"load": 0.02, "prompt_rate": 4000.0, "generation_rate": 1000.0, "completion_tokens": 100, "parallel": 4}
+
+IOCS = [
+    '192.168.1.100', '10.0.0.5', 'evil-domain[.]com', 'login.example.net',
+    'd41d8cd98f00b204e9800998ecf8427e', 'da39a3ee5e6b4b0d3255bfef95601890afd80709',
+    'hxxp://malicious.example/payload.exe', 'attacker@example.org'
+]
+QUESTION = "Are these failed logins part of a brute force attack?"
+
+
+def load_app(name, directory):
+    """Import ``<directory>/app.py`` under its own module name"""
+    path = os.path.join(ROOT, directory)
+    sys.path.insert(0, path)
+    spec = importlib.util.spec_from_file_location(name, os.path.join(path, 'app.py'))
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+def build_cases(threat_hunting, ai_chat):
+    hunter = threat_hunting.threat_hunter
+    analyzer = ai_chat.soc_analyzer
+    logs = analyzer.search_logs('event.outcome:failure', '1h')
+
+    def mitre(i):
+        return 'error' not in hunter.hunt_mitre_attack('T1110', '24h', size=50 + i % 500)
+
+    def iocs(i):
+        results = hunter.hunt_iocs(IOCS, '24h', size=10)
+        return 'error' not in results and not any('error' in result for result in results.values())
+
+    def anomalies(i):
+        results = hunter.hunt_anomalies('24h')
+        return 'error' not in results and not any('error' in result for result in results.values())
+
+    def search_logs(i):
+        return 'error' not in analyzer.search_logs('event.outcome:failure', '1h')
+
+    def analyze(i):
+        answer = analyzer.analyze_with_ai(logs, QUESTION)
+        return not answer.startswith(('AI model error', 'AI analysis error'))
+
+    return {
+        "hunt_mitre_attack": mitre,
+        "hunt_iocs": iocs,
+        "hunt_anomalies": anomalies,
+        "search_logs": search_logs,
+        "analyze_with_ai": analyze
+    }
+
+
+def compare(stats, baseline, tolerance):
+    """Reasons this result regressed against its baseline"""
+    problems = []
+    if stats['errors']:
+        problems.append(f"{stats['errors']} errors")
+    if baseline:
+        if stats['p99'] > baseline['p99'] * (1 + tolerance):
+            problems.append(f"p99 {stats['p99']:.1f}ms > {baseline['p99']:.1f}ms")
+        if stats['throughput'] < baseline['throughput'] * (1 - tolerance):
+            problems.append(f"throughput {stats['throughput']:.1f}/s < {baseline['throughput']:.1f}/s")
+    return problems
+
+
+def load_baselines():
+    try:
+        with open(BASELINES) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {"cases": {}}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--cases', default='hunt_mitre_attack,hunt_iocs,hunt_anomalies,search_logs,analyze_with_ai')
+    parser.add_argument('--concurrency', default='1,16')
+    parser.add_argument('--iterations', type=int, default=200, help='calls per case and concurrency level')
+    parser.add_argument('--tolerance', type=float, default=0.3, help='allowed relative regression')
+    parser.add_argument('--update-baseline', action='store_true', help='store these results as the baselines')
+    args = parser.parse_args()
+
+    es_server = es_standin.serve(0, **ES_SETTINGS)
+    ollama_server = ollama_standin.serve(0, **OLLAMA_SETTINGS)
+    tmp = tempfile.mkdtemp(prefix='soc-bench-')
+    atexit.register(shutil.rmtree, tmp, ignore_errors=True)
+    os.environ.update(
+        ELASTICSEARCH_URL=f"http://127.0.0.1:{es_server.server_port}",
+        OLLAMA_URL=f"http://127.0.0.1:{ollama_server.server_port}",
+        HUNT_SCHEDULER_ENABLED='false',
+        HUNT_CACHE_TTL='0',
+        HUNT_SLOW_THRESHOLD_MS='0',
+        HUNT_FINDINGS_DB=os.path.join(tmp, 'findings.db'),
+        HUNT_SLOW_LOG=os.path.join(tmp, 'slow_hunts.log')
+    )
+    cases = build_cases(load_app('threat_hunting_app', 'threat-hunting'), load_app('ai_chat_app', 'ai-chat'))
+
+    baselines = load_baselines()
+    settings = {"es": ES_SETTINGS, "ollama": OLLAMA_SETTINGS}
+    if not args.update_baseline and baselines.get('settings', settings) != settings:
+        print("Warning: baselines were recorded with different stand-in settings")
+
+    levels = [int(level) for level in args.concurrency.split(',')]
+    results = {}
+    failures = 0
+    print(f"{'case':<18} {'conc':>5} {'calls/s':>9} {'p50 ms':>9} {'p99 ms':>9} {'errors':>7}  verdict")
+    for name in args.cases.split(','):
+        call = cases[name]
+        for i in range(5):
+            call(i)
+        for level in levels:
+            stats = run_concurrent(call, args.iterations, level)
+            results.setdefault(name, {})[str(level)] = {key: round(value, 1) for key, value in stats.items()}
+            baseline = baselines['cases'].get(name, {}).get(str(level))
+            problems = compare(stats, baseline, args.tolerance)
+            if args.update_baseline:
+                verdict = 'recorded'
+            elif problems:
+                verdict = 'REGRESSED: ' + ', '.join(problems)
+                failures += 1
+            else:
+                verdict = 'ok' if baseline else 'no baseline'
+            print(f"{name:<18} {level:>5} {stats['throughput']:>9.1f} {stats['p50']:>9.1f} "
+                  f"{stats['p99']:>9.1f} {stats['errors']:>7}  {verdict}")
+
+    if args.update_baseline:
+        for name, levels_run in results.items():
+            for level, stats in levels_run.items():
+                stats.pop('errors')
+                baselines['cases'].setdefault(name, {})[level] = stats
+        baselines.update(settings=settings, recorded_on=platform.platform(), python=platform.python_version())
+        with open(BASELINES, 'w') as f:
+            json.dump(baselines, f, indent=2, sort_keys=True)
+            f.write('\n')
+        print(f"Baselines written to {BASELINES}")
+        return 0
+
+    if failures:
+        print(f"{failures} regression(s) beyond {args.tolerance:.0%}")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,88 @@
+# Ingest-time IOC tagging (see threat-hunting/ioc_dictionary.py).
+#
+# Looks each event's IPs, domains, hashes, URLs and email addresses up in one
+# in-memory hash of known indicators. The filter instance is shared by all
+# pipeline workers, so the dictionary is held once, and a reload swaps in a
+# new hash without blocking the workers still reading the old one.
+#
+# The first matching field sets threat.indicator.type, the typed
+# threat.indicator.* value, soc.ioc.field and the ioc_match tag.
+require 'json'
+
+# [event field, ECS name, threat.indicator field, case-insensitive]; keep in
+# step with ioc_fields in threat-hunting/app.py
+IOC_FIELDS = [
+  ['[source][ip]', 'source.ip', '[threat][indicator][ip]', false],
+  ['[destination][ip]', 'destination.ip', '[threat][indicator][ip]', false],
+  ['[client][ip]', 'client.ip', '[threat][indicator][ip]', false],
+  ['[server][ip]', 'server.ip', '[threat][indicator][ip]', false],
+  ['[domain]', 'domain', '[threat][indicator][url][domain]', true],
+  ['[url][domain]', 'url.domain', '[threat][indicator][url][domain]', true],
+  ['[dns][question][name]', 'dns.question.name', '[threat][indicator][url][domain]', true],
+  ['[file][hash][md5]', 'file.hash.md5', '[threat][indicator][file][hash][md5]', true],
+  ['[file][hash][sha1]', 'file.hash.sha1', '[threat][indicator][file][hash][sha1]', true],
+  ['[file][hash][sha256]', 'file.hash.sha256', '[threat][indicator][file][hash][sha256]', true],
+  ['[email][from][address]', 'email.from.address', '[threat][indicator][email][address]', true],
+  ['[email][to][address]', 'email.to.address', '[threat][indicator][email][address]', true],
+  ['[user][email]', 'user.email', '[threat][indicator][email][address]', true],
+  ['[url][original]', 'url.original', '[threat][indicator][url][original]', false],
+  ['[url][full]', 'url.full', '[threat][indicator][url][original]', false]
+].freeze
+
+def register(params)
+  @path = params.fetch('dictionary_path')
+  @refresh_interval = params.fetch('refresh_interval', 300).to_f
+  @tag = params.fetch('tag', 'ioc_match')
+  @reload_lock = Mutex.new
+  @indicators = {}
+  @mtime = nil
+  @next_check = 0
+  reload
+end
+
+def filter(event)
+  reload if now >= @next_check
+  indicators = @indicators
+  return [event] if indicators.empty? || event.get('[threat][indicator][type]')
+
+  IOC_FIELDS.each do |field, name, target, fold|
+    value = event.get(field)
+    next if value.nil?
+    (value.is_a?(Array) ? value : [value]).each do |candidate|
+      candidate = candidate.to_s
+      type = indicators[fold ? candidate.downcase : candidate]
+      next unless type
+      event.set('[threat][indicator][type]', type)
+      event.set(target, candidate)
+      event.set('[soc][ioc][field]', name)
+      tags = event.get('tags')
+      tags = tags.nil? ? [] : Array(tags)
+      event.set('tags', tags + [@tag]) unless tags.include?(@tag)
+      return [event]
+    end
+  end
+  [event]
+end
+
+def now
+  Process.clock_gettime(Process::CLOCK_MONOTONIC)
+end
+
+# Only one worker reloads; the rest keep matching against the current hash
+def reload
+  return unless @reload_lock.try_lock
+  begin
+    @next_check = now + @refresh_interval
+    mtime = File.mtime(@path)
+    return if mtime == @mtime
+    loaded = JSON.parse(File.read(@path))
+    raise ArgumentError, 'expected a JSON object of indicator => type' unless loaded.is_a?(Hash)
+    @indicators = loaded.freeze
+    @mtime = mtime
+  rescue StandardError => e
+    # Keep the last good dictionary
+    warn "ioc_tagger: could not load #{@path}: #{e.message}"
+  ensure
+    @reload_lock.unlock
+  end
+end
@@ -113,7 +113,7 @@ start_services() {
     # Wait for Elasticsearch to be ready
     echo -e "${BLUE}⏳ Waiting for Elasticsearch to be ready...${NC}"
     timeout=300
-    while ! curl -s -k "https://localhost:9200" &>/dev/null && [[ $timeout -gt 0 ]]; do
+    while ! curl -s "http://localhost:9200" &>/dev/null && [[ $timeout -gt 0 ]]; do
         sleep 5
         timeout=$((timeout - 5))
         echo -n "."
@@ -125,7 +125,19 @@ start_services() {
     else
         echo -e "${GREEN}✓ Elasticsearch is ready${NC}"
     fi
-    
+
+    # Install the soc-enrich pipeline, then the template that makes it the
+    # default pipeline of wazuh-alerts-*; the pipeline must exist first
+    echo -e "${BLUE}🧪 Installing soc-enrich ingest pipeline...${NC}"
+    if curl -s -f -X PUT "http://localhost:9200/_ingest/pipeline/soc-enrich" \
+        -H 'Content-Type: application/json' --data-binary @../configs/ingest-pipeline.json &>/dev/null &&
+       curl -s -f -X PUT "http://localhost:9200/_index_template/soc-enrich" \
+        -H 'Content-Type: application/json' --data-binary @../configs/ingest-index-template.json &>/dev/null; then
+        echo -e "${GREEN}✓ Ingest pipeline installed${NC}"
+    else
+        echo -e "${YELLOW}⚠️  Could not install the ingest pipeline; threat-hunting retries on startup${NC}"
+    fi
+
     # Start remaining services
     docker-compose up --build -d
     
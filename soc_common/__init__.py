@@ -0,0 +1 @@
+"""Modules shared by the SOC platform Python services."""
@@ -0,0 +1,56 @@
+"""Alert rules from ``configs/alert-rules.yml``.
+
+The file groups rules by category; each rule has a name, a query, a
+``threshold`` of ``count`` events within ``timeframe`` and its MITRE ATT&CK
+techniques. Hunts look their thresholds up by rule name so detection
+thresholds are tuned in one place. A missing or unreadable file falls back
+to the defaults the caller passes.
+"""
+import os
+
+import yaml
+
+from soc_common import timerange
+
+ALERT_RULES_PATH = os.getenv(
+    'ALERT_RULES_PATH',
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'configs', 'alert-rules.yml')
+)
+
+
+class Threshold:
+    def __init__(self, rule, count, timeframe):
+        self.rule = rule
+        self.count = int(count)
+        self.timeframe = timeframe
+        self.span = timerange.parse_span(timeframe)
+
+    def describe(self):
+        return {"rule": self.rule, "count": self.count, "timeframe": self.timeframe}
+
+
+class AlertRules:
+    def __init__(self, path=ALERT_RULES_PATH):
+        self.path = path
+        self.rules = {}
+        try:
+            with open(path) as f:
+                config = yaml.safe_load(f) or {}
+        except (OSError, yaml.YAMLError) as e:
+            print(f"Alert rules unavailable, using built-in thresholds: {e}")
+            return
+        for category, rules in config.items():
+            if not isinstance(rules, list):
+                continue  # alert_settings and other non-rule sections
+            for rule in rules:
+                if isinstance(rule, dict) and rule.get('name'):
+                    self.rules[rule['name']] = dict(rule, category=category)
+
+    def threshold(self, name, count, timeframe):
+        """Threshold of the named rule, or the given defaults when it is absent or invalid"""
+        configured = self.rules.get(name, {}).get('threshold') or {}
+        try:
+            return Threshold(name, configured.get('count', count), configured.get('timeframe', timeframe))
+        except (TypeError, ValueError) as e:
+            print(f"Invalid threshold for alert rule {name!r}, using defaults: {e}")
+            return Threshold(name, count, timeframe)
@@ -0,0 +1,209 @@
+"""Elasticsearch clients shared by the SOC services.
+
+A bare ``Elasticsearch([url])`` gets ten pooled connections per node, no
+compression, no retries and a 10 second timeout for every call; under load
+requests queue for a connection and failed ones are not retried. The clients
+built here size the pool, compress requests, keep idle connections alive,
+retry connection failures, timeouts and 429/502/503/504 responses after an
+exponential backoff with full jitter, and take their defaults from the
+environment:
+
+    ES_CONNECTIONS_PER_NODE   pooled connections per node (64)
+    ES_REQUEST_TIMEOUT        default per-call timeout in seconds (10)
+    ES_HTTP_COMPRESS          gzip request and response bodies (true)
+    ES_MAX_RETRIES            retries after the first attempt (3)
+    ES_RETRY_ON_TIMEOUT       retry calls that timed out (true)
+    ES_RETRY_BACKOFF          base backoff in seconds (0.1)
+    ES_RETRY_BACKOFF_MAX      backoff cap in seconds (2)
+    ES_TCP_KEEPALIVE          idle seconds before TCP keepalive probes, 0 = off (30)
+    ES_HEALTH_INTERVAL        seconds a health probe result is reused (10)
+
+Individual calls override the timeout with
+``es.options(request_timeout=...)``.
+"""
+import asyncio
+import os
+import random
+import socket
+import threading
+import time
+
+from elastic_transport import (
+    AsyncTransport,
+    ConnectionError,
+    ConnectionTimeout,
+    Transport,
+    Urllib3HttpNode
+)
+from elastic_transport.client_utils import DEFAULT
+from elasticsearch import AsyncElasticsearch, Elasticsearch
+
+ES_CONNECTIONS_PER_NODE = int(os.getenv('ES_CONNECTIONS_PER_NODE', '64'))
+ES_REQUEST_TIMEOUT = float(os.getenv('ES_REQUEST_TIMEOUT', '10'))
+ES_HTTP_COMPRESS = os.getenv('ES_HTTP_COMPRESS', 'true').lower() == 'true'
+ES_MAX_RETRIES = int(os.getenv('ES_MAX_RETRIES', '3'))
+ES_RETRY_ON_TIMEOUT = os.getenv('ES_RETRY_ON_TIMEOUT', 'true').lower() == 'true'
+ES_RETRY_BACKOFF = float(os.getenv('ES_RETRY_BACKOFF', '0.1'))
+ES_RETRY_BACKOFF_MAX = float(os.getenv('ES_RETRY_BACKOFF_MAX', '2'))
+ES_TCP_KEEPALIVE = int(os.getenv('ES_TCP_KEEPALIVE', '30'))
+ES_HEALTH_INTERVAL = float(os.getenv('ES_HEALTH_INTERVAL', '10'))
+
+
+def backoff_delay(attempt, base=ES_RETRY_BACKOFF, cap=ES_RETRY_BACKOFF_MAX):
+    """Full-jitter exponential backoff before retry number ``attempt + 1``"""
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+def _retry_settings(transport, kwargs):
+    max_retries = kwargs.pop('max_retries', DEFAULT)
+    retry_on_timeout = kwargs.get('retry_on_timeout', DEFAULT)
+    retry_on_status = kwargs.get('retry_on_status', DEFAULT)
+    return (
+        transport.max_retries if max_retries is DEFAULT else max_retries,
+        transport.retry_on_timeout if retry_on_timeout is DEFAULT else retry_on_timeout,
+        transport.retry_on_status if retry_on_status is DEFAULT else retry_on_status
+    )
+
+
+def _should_retry(error, retry_on_timeout):
+    if isinstance(error, ConnectionTimeout):
+        return retry_on_timeout
+    return isinstance(error, ConnectionError)
+
+
+class BackoffTransport(Transport):
+    """Transport that waits a jittered backoff between retries.
+
+    The stock transport retries immediately, which against a single busy
+    node just repeats the failure; here each attempt is a single-shot
+    request and the retry loop sleeps in between.
+    """
+    retry_backoff = ES_RETRY_BACKOFF
+    retry_backoff_max = ES_RETRY_BACKOFF_MAX
+
+    def perform_request(self, method, target, **kwargs):
+        max_retries, retry_on_timeout, retry_on_status = _retry_settings(self, kwargs)
+        for attempt in range(max_retries + 1):
+            try:
+                response = super().perform_request(method, target, max_retries=0, **kwargs)
+            except (ConnectionError, ConnectionTimeout) as e:
+                if attempt >= max_retries or not _should_retry(e, retry_on_timeout):
+                    raise
+            else:
+                if attempt >= max_retries or response.meta.status not in retry_on_status:
+                    return response
+            time.sleep(backoff_delay(attempt, self.retry_backoff, self.retry_backoff_max))
+
+
+class AsyncBackoffTransport(AsyncTransport):
+    """BackoffTransport for AsyncElasticsearch"""
+    retry_backoff = ES_RETRY_BACKOFF
+    retry_backoff_max = ES_RETRY_BACKOFF_MAX
+
+    async def perform_request(self, method, target, **kwargs):
+        max_retries, retry_on_timeout, retry_on_status = _retry_settings(self, kwargs)
+        for attempt in range(max_retries + 1):
+            try:
+                response = await super().perform_request(method, target, max_retries=0, **kwargs)
+            except (ConnectionError, ConnectionTimeout) as e:
+                if attempt >= max_retries or not _should_retry(e, retry_on_timeout):
+                    raise
+            else:
+                if attempt >= max_retries or response.meta.status not in retry_on_status:
+                    return response
+            await asyncio.sleep(backoff_delay(attempt, self.retry_backoff, self.retry_backoff_max))
+
+
+class KeepAliveHttpNode(Urllib3HttpNode):
+    """urllib3 node whose pooled sockets send TCP keepalive probes, so idle
+    connections are not silently dropped by firewalls or NAT"""
+    tcp_keepalive = ES_TCP_KEEPALIVE
+
+    def __init__(self, config):
+        super().__init__(config)
+        if self.tcp_keepalive <= 0:
+            return
+        options = [(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1), (socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)]
+        for name, value in (('TCP_KEEPIDLE', self.tcp_keepalive), ('TCP_KEEPINTVL', 10), ('TCP_KEEPCNT', 3)):
+            if hasattr(socket, name):
+                options.append((socket.IPPROTO_TCP, getattr(socket, name), value))
+        self.pool.conn_kw['socket_options'] = options
+
+
+def _client_options(
+    connections_per_node=None,
+    request_timeout=None,
+    http_compress=None,
+    max_retries=None,
+    retry_on_timeout=None
+):
+    return {
+        "connections_per_node": connections_per_node or ES_CONNECTIONS_PER_NODE,
+        "request_timeout": request_timeout or ES_REQUEST_TIMEOUT,
+        "http_compress": ES_HTTP_COMPRESS if http_compress is None else http_compress,
+        "max_retries": ES_MAX_RETRIES if max_retries is None else max_retries,
+        "retry_on_timeout": ES_RETRY_ON_TIMEOUT if retry_on_timeout is None else retry_on_timeout
+    }
+
+
+def create_client(url, **options):
+    """Tuned synchronous Elasticsearch client; options override the environment"""
+    return Elasticsearch(
+        [url],
+        transport_class=BackoffTransport,
+        node_class=KeepAliveHttpNode,
+        **_client_options(**options)
+    )
+
+
+def create_async_client(url, **options):
+    """Tuned AsyncElasticsearch client; options override the environment"""
+    return AsyncElasticsearch(
+        [url],
+        transport_class=AsyncBackoffTransport,
+        **_client_options(**options)
+    )
+
+
+class HealthProbe:
+    """Lazily checks cluster health and reuses the answer for ``interval`` seconds.
+
+    Building a client never contacts the cluster, so "the client exists" says
+    nothing about reachability; the probe asks ``_cluster/health`` on first
+    use, with a short timeout and no retries, and concurrent callers share a
+    single in-flight check.
+    """
+
+    def __init__(self, client, interval=ES_HEALTH_INTERVAL, timeout=2):
+        self.client = client
+        self.interval = interval
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._checked_at = 0
+        self._result = None
+
+    def check(self):
+        with self._lock:
+            if self._result and time.monotonic() - self._checked_at < self.interval:
+                return self._result
+            self._result = self._probe()
+            self._checked_at = time.monotonic()
+            return self._result
+
+    @property
+    def connected(self):
+        return self.check()['status'] == 'connected'
+
+    def _probe(self):
+        if not self.client:
+            return {"status": "disconnected", "error": "Elasticsearch client not configured"}
+        started = time.monotonic()
+        try:
+            health = self.client.options(request_timeout=self.timeout, max_retries=0).cluster.health()
+        except Exception as e:
+            return {"status": "disconnected", "error": str(e)}
+        return {
+            "status": "connected",
+            "cluster_status": health['status'],
+            "latency_ms": round((time.monotonic() - started) * 1000, 1)
+        }
@@ -0,0 +1,107 @@
+"""The ``soc-enrich`` ingest pipeline from ``configs/ingest-pipeline.json``.
+
+The ``soc-enrich`` index template (``configs/ingest-index-template.json``)
+makes it the ``index.default_pipeline`` of ``wazuh-alerts-*``, so every event
+Logstash writes there goes through it. It stores values that hunts and alert
+rules used to compute at query time:
+
+- ``network.direction``, when the shipper left it out;
+- ``soc.login.hour_of_day`` and ``soc.login.hour_of_week``;
+- ``soc.dns.question_length`` and ``soc.dns.question_entropy``;
+- ``soc.network.size_class``.
+
+Logstash does not name the pipeline itself: until it is installed, events
+are indexed without the derived fields rather than rejected. Those events,
+and other shippers' indices, lack these fields, so searches pair each
+derived clause with its raw equivalent (``with_fallback``).
+
+The pipeline and the template are each installed only when the cluster lacks
+their ``version``, so bump the version in the JSON file whenever you edit it.
+The pipeline goes in first: an index whose default pipeline is missing
+rejects every write.
+
+    python -m soc_common.ingest --url http://localhost:9200
+"""
+import argparse
+import json
+import os
+
+from elasticsearch import NotFoundError
+
+from soc_common import es_client
+
+INGEST_PIPELINE_ID = os.getenv('INGEST_PIPELINE_ID', 'soc-enrich')
+INGEST_PIPELINE_PATH = os.getenv(
+    'INGEST_PIPELINE_PATH',
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'configs', 'ingest-pipeline.json')
+)
+INGEST_TEMPLATE_PATH = os.getenv(
+    'INGEST_TEMPLATE_PATH',
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'configs', 'ingest-index-template.json')
+)
+
+
+def load(path=INGEST_PIPELINE_PATH):
+    with open(path) as f:
+        return json.load(f)
+
+
+def with_fallback(field, derived, raw):
+    """Match ``derived`` on events the pipeline stored ``field`` on, and
+    ``raw`` on events indexed without it"""
+    return {
+        "bool": {
+            "should": [
+                derived,
+                {"bool": {"must_not": [{"exists": {"field": field}}], "filter": [raw]}}
+            ],
+            "minimum_should_match": 1
+        }
+    }
+
+
+def install(client, pipeline_id=INGEST_PIPELINE_ID, path=INGEST_PIPELINE_PATH,
+            template_path=INGEST_TEMPLATE_PATH):
+    """Create or update the pipeline and the index template routing to it;
+    returns False when both versions are already installed"""
+    installed = False
+    definition = load(path)
+    try:
+        current = client.ingest.get_pipeline(id=pipeline_id).get(pipeline_id, {})
+    except NotFoundError:
+        current = {}
+    if current.get('version') != definition.get('version'):
+        client.ingest.put_pipeline(id=pipeline_id, **definition)
+        installed = True
+
+    template = load(template_path)
+    try:
+        current = client.indices.get_index_template(name=pipeline_id)['index_templates'][0]['index_template']
+    except NotFoundError:
+        current = {}
+    if current.get('version') != template.get('version'):
+        client.indices.put_index_template(name=pipeline_id, **template)
+        # Templates only apply to new indices; today's index takes the
+        # setting directly
+        client.indices.put_settings(
+            index=','.join(template['index_patterns']),
+            settings={"index.default_pipeline": template['template']['settings']['index.default_pipeline']},
+            allow_no_indices=True
+        )
+        installed = True
+    return installed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Install the SOC enrichment ingest pipeline")
+    parser.add_argument('--url', default=os.getenv('ELASTICSEARCH_URL', 'http://localhost:9200'))
+    parser.add_argument('--path', default=INGEST_PIPELINE_PATH)
+    parser.add_argument('--template', default=INGEST_TEMPLATE_PATH)
+    parser.add_argument('--id', default=INGEST_PIPELINE_ID)
+    args = parser.parse_args()
+    installed = install(es_client.create_client(args.url), args.id, args.path, args.template)
+    print(f"Pipeline {args.id} {'installed' if installed else 'already up to date'}")
+
+
+if __name__ == '__main__':
+    main()
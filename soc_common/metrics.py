@@ -0,0 +1,170 @@
+"""Prometheus metrics shared by the SOC services.
+
+Each service exposes these on ``/metrics``: request latency and in-flight
+requests per route and per Socket.IO event, Elasticsearch ``took`` next to
+the wall-clock time of the same call, Ollama latency and token throughput,
+and result cache counters. The gap between ES ``took`` and wall time is
+time spent queueing for a connection, on the network and deserialising.
+"""
+import functools
+import threading
+import time
+
+from flask import Response, g, request
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Gauge, Histogram, generate_latest
+from prometheus_client.core import REGISTRY, CounterMetricFamily, GaugeMetricFamily
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+LLM_BUCKETS = (0.25, 0.5, 1, 2, 5, 10, 20, 30, 60, 120)
+TOKEN_RATE_BUCKETS = (1, 2, 5, 10, 20, 35, 50, 75, 100, 200)
+
+HTTP_LATENCY = Histogram(
+    'soc_http_request_duration_seconds',
+    'HTTP request latency by route',
+    ['method', 'route', 'status'],
+    buckets=LATENCY_BUCKETS
+)
+HTTP_IN_FLIGHT = Gauge('soc_http_requests_in_flight', 'HTTP requests being served', ['route'])
+
+SOCKETIO_LATENCY = Histogram(
+    'soc_socketio_event_duration_seconds',
+    'Socket.IO event handler latency',
+    ['event', 'outcome'],
+    buckets=LATENCY_BUCKETS
+)
+SOCKETIO_IN_FLIGHT = Gauge('soc_socketio_events_in_flight', 'Socket.IO events being handled', ['event'])
+
+ES_TOOK = Histogram(
+    'soc_es_took_seconds',
+    'Search time reported by Elasticsearch (took)',
+    ['operation'],
+    buckets=LATENCY_BUCKETS
+)
+ES_WALL = Histogram(
+    'soc_es_request_duration_seconds',
+    'Wall-clock time of the same Elasticsearch call as seen by the client',
+    ['operation'],
+    buckets=LATENCY_BUCKETS
+)
+ES_ERRORS = Counter('soc_es_errors_total', 'Failed Elasticsearch calls', ['operation'])
+
+OLLAMA_LATENCY = Histogram(
+    'soc_ollama_request_duration_seconds',
+    'Ollama generate call latency',
+    ['model', 'outcome'],
+    buckets=LLM_BUCKETS
+)
+OLLAMA_TOKENS = Counter('soc_ollama_tokens_total', 'Tokens processed by Ollama', ['model', 'kind'])
+OLLAMA_TOKEN_RATE = Histogram(
+    'soc_ollama_tokens_per_second',
+    'Ollama generation throughput per call',
+    ['model'],
+    buckets=TOKEN_RATE_BUCKETS
+)
+
+
+class _CacheCollector:
+    """Reads registered caches' stats() at scrape time"""
+
+    def __init__(self):
+        self.caches = {}
+        self._lock = threading.Lock()
+
+    def collect(self):
+        lookups = CounterMetricFamily('soc_cache_lookups', 'Cache lookups by result', labels=['cache', 'result'])
+        evictions = CounterMetricFamily('soc_cache_evictions', 'Entries evicted for space', labels=['cache'])
+        entries = GaugeMetricFamily('soc_cache_entries', 'Entries held', labels=['cache'])
+        size = GaugeMetricFamily('soc_cache_bytes', 'Approximate bytes held', labels=['cache'])
+        ratio = GaugeMetricFamily('soc_cache_hit_ratio', 'Lookups served without a new execution', labels=['cache'])
+
+        with self._lock:
+            caches = dict(self.caches)
+        for name, cache in caches.items():
+            stats = cache.stats()
+            for result in ('hits', 'misses', 'coalesced'):
+                lookups.add_metric([name, result], stats[result])
+            evictions.add_metric([name], stats['evictions'])
+            entries.add_metric([name], stats['entries'])
+            size.add_metric([name], stats['bytes'])
+            ratio.add_metric([name], stats['hit_ratio'])
+        return [lookups, evictions, entries, size, ratio]
+
+
+_caches = _CacheCollector()
+REGISTRY.register(_caches)
+
+
+def register_cache(name, cache):
+    """Export a cache with a ``stats()`` method under the given name"""
+    with _caches._lock:
+        _caches.caches[name] = cache
+
+
+def observe_es(operation, started, result=None):
+    """Record wall time since ``started`` and, when present, the ``took`` of result"""
+    ES_WALL.labels(operation).observe(time.perf_counter() - started)
+    if result is not None and 'took' in result:
+        ES_TOOK.labels(operation).observe(result['took'] / 1000)
+
+
+def es_error(operation):
+    ES_ERRORS.labels(operation).inc()
+
+
+def observe_ollama(model, started, result=None):
+    """Record an Ollama /api/generate call; result is its JSON body on success"""
+    OLLAMA_LATENCY.labels(model, 'ok' if result is not None else 'error').observe(time.perf_counter() - started)
+    if not result:
+        return
+    OLLAMA_TOKENS.labels(model, 'prompt').inc(result.get('prompt_eval_count', 0))
+    OLLAMA_TOKENS.labels(model, 'completion').inc(result.get('eval_count', 0))
+    if result.get('eval_count') and result.get('eval_duration'):
+        # Ollama reports durations in nanoseconds
+        OLLAMA_TOKEN_RATE.labels(model).observe(result['eval_count'] / (result['eval_duration'] / 1e9))
+
+
+def timed_event(event):
+    """Decorator timing a Socket.IO event handler"""
+    def decorate(handler):
+        @functools.wraps(handler)
+        def wrapper(*args, **kwargs):
+            SOCKETIO_IN_FLIGHT.labels(event).inc()
+            started = time.perf_counter()
+            outcome = 'error'
+            try:
+                result = handler(*args, **kwargs)
+                outcome = 'ok'
+                return result
+            finally:
+                SOCKETIO_LATENCY.labels(event, outcome).observe(time.perf_counter() - started)
+                SOCKETIO_IN_FLIGHT.labels(event).dec()
+        return wrapper
+    return decorate
+
+
+def instrument_flask(app):
+    """Time every Flask request by route and serve ``/metrics``"""
+    @app.before_request
+    def _start_timer():
+        g.metrics_route = request.url_rule.rule if request.url_rule else 'unmatched'
+        g.metrics_started = time.perf_counter()
+        HTTP_IN_FLIGHT.labels(g.metrics_route).inc()
+
+    @app.after_request
+    def _record_status(response):
+        g.metrics_status = response.status_code
+        return response
+
+    # Teardown runs after a streamed response has been fully sent
+    @app.teardown_request
+    def _stop_timer(error=None):
+        started = g.pop('metrics_started', None)
+        if started is None:
+            return
+        status = g.pop('metrics_status', 500)
+        HTTP_LATENCY.labels(request.method, g.metrics_route, str(status)).observe(time.perf_counter() - started)
+        HTTP_IN_FLIGHT.labels(g.metrics_route).dec()
+
+    @app.route('/metrics')
+    def metrics():
+        return Response(generate_latest(), mimetype=CONTENT_TYPE_LATEST)
@@ -0,0 +1,205 @@
+"""Time range handling shared by the SOC services.
+
+A time range is either a relative span ending now (``15m``, ``36h``, ``90d``,
+``2w``) or an absolute ISO 8601 window written as ``start/end``
+(``2025-01-01T00:00:00Z/2025-01-02T00:00:00Z``). Relative windows are emitted
+as rounded date math such as ``now-24h/h`` so repeated searches produce the
+same request and can be served from the Elasticsearch shard request cache.
+"""
+import re
+from datetime import datetime, timedelta, timezone
+
+_RELATIVE = re.compile(r'^(\d+)([smhdw])$')
+_UNIT_SECONDS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400, 'w': 604800}
+
+_INTERVAL_SECONDS = {'minute': 60, 'hour': 3600, 'day': 86400}
+
+_BUCKET_LABELS = {
+    'minute': '%Y-%m-%dT%H:%M',
+    'hour': '%Y-%m-%dT%H:00',
+    'day': '%Y-%m-%d'
+}
+
+# Index patterns written as one index per day (Logstash's %{+YYYY.MM.dd})
+DAILY_INDEX_PREFIXES = ('wazuh-alerts-',)
+# Beyond this many days the wildcard pattern is cheaper than a long index list
+MAX_EXPANDED_INDICES = 62
+
+
+def rounding_unit(span):
+    """Date math rounding unit for a window of the given length"""
+    if span <= timedelta(hours=3):
+        return 'm'
+    if span <= timedelta(days=14):
+        return 'h'
+    return 'd'
+
+
+def histogram_interval(span):
+    """Calendar interval giving a readable number of timeline buckets"""
+    if span <= timedelta(hours=3):
+        return 'minute'
+    if span <= timedelta(days=3):
+        return 'hour'
+    return 'day'
+
+
+def bucket_label(key, interval):
+    """Readable label for a date_histogram bucket key (epoch milliseconds)"""
+    timestamp = datetime.fromtimestamp(key / 1000, timezone.utc)
+    return timestamp.strftime(_BUCKET_LABELS[interval])
+
+
+def floor_time(timestamp, unit):
+    """Round an aware datetime down to a minute, hour or day boundary"""
+    if unit == 'd':
+        return timestamp.replace(hour=0, minute=0, second=0, microsecond=0)
+    if unit == 'h':
+        return timestamp.replace(minute=0, second=0, microsecond=0)
+    return timestamp.replace(second=0, microsecond=0)
+
+
+def snap(timestamp, bucket_seconds):
+    """Round an aware datetime down to a multiple of bucket_seconds"""
+    offset = timestamp.timestamp() % bucket_seconds
+    return timestamp - timedelta(seconds=offset)
+
+
+def _parse_instant(value):
+    timestamp = datetime.fromisoformat(value.strip())
+    if timestamp.tzinfo is None:
+        timestamp = timestamp.replace(tzinfo=timezone.utc)
+    return timestamp.astimezone(timezone.utc)
+
+
+class TimeWindow:
+    def __init__(self, spec, start, end, relative=None, unit=None, length=None):
+        self.spec = spec
+        self.start = start
+        self.end = end
+        self.relative = relative
+        self.unit = unit
+        self.length = length or end - start
+
+    @property
+    def span(self):
+        return self.end - self.start
+
+    def bounds(self):
+        """Range bounds for an Elasticsearch range query"""
+        if self.relative:
+            return {"gte": f"now-{self.relative}/{self.unit}", "lte": "now/m"}
+        return {"gte": self.start.isoformat(), "lte": self.end.isoformat()}
+
+    def range_clause(self, field='@timestamp'):
+        return {"range": {field: self.bounds()}}
+
+    @property
+    def interval(self):
+        return histogram_interval(self.length)
+
+    def histogram(self, field='@timestamp'):
+        """date_histogram aggregation covering the whole window, empty buckets included"""
+        if self.relative:
+            bounds = self.bounds()
+            extended = {"min": bounds["gte"], "max": bounds["lte"]}
+        else:
+            extended = {
+                "min": int(self.start.timestamp() * 1000),
+                "max": int(self.end.timestamp() * 1000)
+            }
+        return {
+            "date_histogram": {
+                "field": field,
+                "calendar_interval": self.interval,
+                "min_doc_count": 0,
+                "extended_bounds": extended
+            }
+        }
+
+    def bucket_count(self):
+        """Upper bound on the buckets ``histogram`` returns for this window,
+        counting the partial buckets at either end"""
+        return int(self.span.total_seconds() // _INTERVAL_SECONDS[self.interval]) + 2
+
+    def timeline(self, histogram):
+        """Flatten a date_histogram aggregation response into {label: count}"""
+        interval = self.interval
+        return {
+            bucket_label(bucket['key'], interval): bucket['doc_count']
+            for bucket in histogram.get('buckets', [])
+        }
+
+    def indices(self, pattern):
+        """Resolve a daily index pattern to the concrete indices the window covers.
+
+        Patterns that are not known to be daily, or windows longer than
+        MAX_EXPANDED_INDICES days, are returned unchanged.
+        """
+        prefix = pattern[:-1] if pattern.endswith('*') else None
+        if prefix not in DAILY_INDEX_PREFIXES:
+            return [pattern]
+
+        day = self.start.date()
+        last = self.end.date()
+        if (last - day).days >= MAX_EXPANDED_INDICES:
+            return [pattern]
+
+        indices = []
+        while day <= last:
+            indices.append(f"{prefix}{day:%Y.%m.%d}")
+            day += timedelta(days=1)
+        return indices
+
+    def cache_key(self, bucket_seconds):
+        """Key identifying this window within a bucket of the given size"""
+        if self.relative:
+            return (self.relative, snap(self.end, bucket_seconds).isoformat())
+        return (self.start.isoformat(), self.end.isoformat())
+
+    def __repr__(self):
+        return f"TimeWindow({self.spec!r}, {self.start.isoformat()}, {self.end.isoformat()})"
+
+
+def parse_span(value):
+    """Length of a relative span such as ``5m`` or ``24h`` as a timedelta"""
+    match = _RELATIVE.match(str(value).strip())
+    if not match or int(match.group(1)) <= 0:
+        raise ValueError(f"Invalid span: {value!r}")
+    return timedelta(seconds=int(match.group(1)) * _UNIT_SECONDS[match.group(2)])
+
+
+def parse(value, now=None):
+    """Parse a relative span or absolute ISO window into a TimeWindow.
+
+    Raises ValueError for anything unrecognised instead of silently falling
+    back to a default span.
+    """
+    if isinstance(value, TimeWindow):
+        return value
+
+    spec = str(value).strip()
+    now = now or datetime.now(timezone.utc)
+
+    match = _RELATIVE.match(spec)
+    if match:
+        amount, unit = int(match.group(1)), match.group(2)
+        if amount <= 0:
+            raise ValueError(f"Invalid time range: {value!r}")
+        span = timedelta(seconds=amount * _UNIT_SECONDS[unit])
+        rounding = rounding_unit(span)
+        start = floor_time(now - span, rounding)
+        return TimeWindow(spec, start, now, relative=spec, unit=rounding, length=span)
+
+    if '/' in spec:
+        start_text, _, end_text = spec.partition('/')
+        try:
+            start = _parse_instant(start_text)
+            end = _parse_instant(end_text) if end_text.strip() else now
+        except ValueError:
+            raise ValueError(f"Invalid time range: {value!r}")
+        if start >= end:
+            raise ValueError(f"Invalid time range: {value!r} (start must be before end)")
+        return TimeWindow(spec, start, end)
+
+    raise ValueError(f"Invalid time range: {value!r}")
@@ -1,364 +1,1877 @@
-from flask import Flask, render_template, request, jsonify
+from flask import Flask, Response, render_template, request, jsonify, stream_with_context
 from flask_cors import CORS
 import requests
+import contextvars
 import json
 import os
-from datetime import datetime, timedelta
-from elasticsearch import Elasticsearch
-import re
+from concurrent.futures import ThreadPoolExecutor, wait
+from datetime import datetime, timedelta, timezone
+import sys
+import threading
+import time
+
+# Shared SOC modules live at the repository root; containers copy them next to app.py
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from soc_common import alert_rules, es_client, ingest, metrics, timerange
+
+import exfiltration
+import hunt_timing
+import ioc_classifier
+import lateral_movement
+import login_profiles
+import threshold_hunts
+from hunt_cache import HuntCache
+from index_routing import IndexRouter, query_fields
+from query_compiler import QueryCompileError, compile_query
+from findings_store import FindingsStore, parse_timestamp, source_field
+from hunt_scheduler import HuntScheduler, parse_intervals
+from login_profiles import LoginProfiles
 
 app = Flask(__name__)
 CORS(app)
+metrics.instrument_flask(app)
 
 # Configuration
 ELASTICSEARCH_URL = os.getenv('ELASTICSEARCH_URL', 'http://localhost:9200')
 MISP_URL = os.getenv('MISP_URL', 'http://localhost:8080')
 WAZUH_URL = os.getenv('WAZUH_URL', 'http://localhost:55000')
+IOC_MSEARCH_BATCH_SIZE = int(os.getenv('IOC_MSEARCH_BATCH_SIZE', '200'))
+IOC_COMPILE_CHUNK_SIZE = int(os.getenv('IOC_COMPILE_CHUNK_SIZE', '1000'))
+# Elasticsearch's search.max_buckets; searches that nest a timeline per
+# indicator or per source are sized to stay under it
+HUNT_MAX_BUCKETS = int(os.getenv('HUNT_MAX_BUCKETS', '65536'))
+# Logstash tags events carrying a known indicator (logstash/ioc_tagger.rb)
+IOC_MATCH_TAG = os.getenv('IOC_MATCH_TAG', 'ioc_match')
+IOC_MATCH_INDEX = os.getenv('IOC_MATCH_INDEX', 'wazuh-alerts-*')
+ECS_KEYWORD_SUFFIX = os.getenv('ECS_KEYWORD_SUFFIX', '.keyword')
+ANOMALY_HUNT_WORKERS = int(os.getenv('ANOMALY_HUNT_WORKERS', '8'))
+ANOMALY_HUNT_DEADLINE = float(os.getenv('ANOMALY_HUNT_DEADLINE', '30'))
+EXPORT_PAGE_SIZE = int(os.getenv('EXPORT_PAGE_SIZE', '2000'))
+EXPORT_PIT_KEEP_ALIVE = os.getenv('EXPORT_PIT_KEEP_ALIVE', '2m')
+HUNT_REQUEST_TIMEOUT = float(os.getenv('HUNT_REQUEST_TIMEOUT', '30'))
+HUNT_CACHE_TTL = float(os.getenv('HUNT_CACHE_TTL', '60'))
+HUNT_CACHE_BUCKET = int(os.getenv('HUNT_CACHE_BUCKET', '60'))
+HUNT_CACHE_MAX_ENTRIES = int(os.getenv('HUNT_CACHE_MAX_ENTRIES', '256'))
+HUNT_CACHE_MAX_BYTES = int(os.getenv('HUNT_CACHE_MAX_BYTES', str(64 * 1024 * 1024)))
+HUNT_INDEX_CANDIDATES = os.getenv('HUNT_INDEX_CANDIDATES', '*,-.*,-the_hive*,-thehive*,-cortex*,-misp*')
+HUNT_ROUTING_REFRESH = int(os.getenv('HUNT_ROUTING_REFRESH', '300'))
+HUNT_SCHEDULER_ENABLED = os.getenv('HUNT_SCHEDULER_ENABLED', 'true').lower() == 'true'
+HUNT_SCHEDULER_TECHNIQUE_INTERVAL = float(os.getenv('HUNT_SCHEDULER_TECHNIQUE_INTERVAL', '60'))
+HUNT_SCHEDULER_ANOMALY_INTERVAL = float(os.getenv('HUNT_SCHEDULER_ANOMALY_INTERVAL', '300'))
+HUNT_SCHEDULER_INTERVALS = os.getenv('HUNT_SCHEDULER_INTERVALS', '')
+HUNT_SCHEDULER_BACKFILL = os.getenv('HUNT_SCHEDULER_BACKFILL', '24h')
+HUNT_SCHEDULER_LAG = int(os.getenv('HUNT_SCHEDULER_LAG', '60'))
+# Hits one scheduled run may store before deferring the rest to the next run
+HUNT_SCHEDULER_MAX_FINDINGS = int(os.getenv('HUNT_SCHEDULER_MAX_FINDINGS', '10000'))
+# Techniques too broad to copy into the findings store (all web/DNS traffic,
+# every failed login); their interactive hunts always search Elasticsearch
+HUNT_SCHEDULER_SKIP = os.getenv('HUNT_SCHEDULER_SKIP', 'T1071,T1110')
+HUNT_FINDINGS_DB = os.getenv(
+    'HUNT_FINDINGS_DB',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'findings.db')
+)
+HUNT_FINDINGS_RETENTION_DAYS = int(os.getenv('HUNT_FINDINGS_RETENTION_DAYS', '30'))
+# Searches slower than this are re-run once with profiling into the slow-hunt log (0 disables)
+HUNT_SLOW_THRESHOLD_MS = float(os.getenv('HUNT_SLOW_THRESHOLD_MS', '2000'))
+HUNT_SLOW_LOG = os.getenv(
+    'HUNT_SLOW_LOG',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'slow_hunts.log')
+)
+HUNT_SLOW_LOG_MAX_BYTES = int(os.getenv('HUNT_SLOW_LOG_MAX_BYTES', str(10 * 1024 * 1024)))
+HUNT_SLOW_LOG_BACKUPS = int(os.getenv('HUNT_SLOW_LOG_BACKUPS', '5'))
+HUNT_SLOW_PROFILE_COOLDOWN = float(os.getenv('HUNT_SLOW_PROFILE_COOLDOWN', '300'))
+# Composite aggregation paging for the threshold and lateral movement hunts
+THRESHOLD_HUNT_PAGE_SIZE = int(os.getenv('THRESHOLD_HUNT_PAGE_SIZE', '1000'))
+THRESHOLD_HUNT_MAX_PAGES = int(os.getenv('THRESHOLD_HUNT_MAX_PAGES', '50'))
+# Lateral movement fan-out hunt: movers are compared with their own history
+# over LATERAL_BASELINE before the hunt window
+LATERAL_DESTINATION_FIELD = os.getenv('LATERAL_DESTINATION_FIELD', 'destination.address')
+LATERAL_BASELINE = os.getenv('LATERAL_BASELINE', '30d')
+LATERAL_MIN_FANOUT = int(os.getenv('LATERAL_MIN_FANOUT', '3'))
+LATERAL_MIN_RATIO = float(os.getenv('LATERAL_MIN_RATIO', '2'))
+LATERAL_EDGES_PER_MOVER = int(os.getenv('LATERAL_EDGES_PER_MOVER', '20'))
+# Each mover carries daily buckets for the window and baseline plus its edges;
+# keep a page well under search.max_buckets
+LATERAL_HUNT_PAGE_SIZE = int(os.getenv('LATERAL_HUNT_PAGE_SIZE', '250'))
+# Slow-drip exfiltration hunt: outbound bytes per EXFIL_SUB_WINDOW, summed over
+# EXFIL_SLIDING_WINDOWS consecutive sub-windows and scored against each
+# source's rolling baseline (EWMA with weight EXFIL_BASELINE_ALPHA per sub-window)
+EXFIL_BYTES_FIELD = os.getenv('EXFIL_BYTES_FIELD', 'network.bytes')
+EXFIL_SUB_WINDOW = os.getenv('EXFIL_SUB_WINDOW', '1h')
+EXFIL_SLIDING_WINDOWS = int(os.getenv('EXFIL_SLIDING_WINDOWS', '6'))
+EXFIL_BASELINE_ALPHA = float(os.getenv('EXFIL_BASELINE_ALPHA', '0.02'))
+EXFIL_BASELINE_MIN_SAMPLES = int(os.getenv('EXFIL_BASELINE_MIN_SAMPLES', '24'))
+EXFIL_MIN_SCORE = float(os.getenv('EXFIL_MIN_SCORE', '4'))
+EXFIL_MIN_BYTES = int(os.getenv('EXFIL_MIN_BYTES', str(50 * 1024 * 1024)))
+EXFIL_MIN_STDDEV = float(os.getenv('EXFIL_MIN_STDDEV', str(1024 * 1024)))
+EXFIL_DESTINATIONS = int(os.getenv('EXFIL_DESTINATIONS', '5'))
+# Upper bound; wide windows get smaller pages to fit HUNT_MAX_BUCKETS
+EXFIL_HUNT_PAGE_SIZE = int(os.getenv('EXFIL_HUNT_PAGE_SIZE', '200'))
+EXFIL_HUNT_MAX_PAGES = int(os.getenv('EXFIL_HUNT_MAX_PAGES', '250'))
+# Per-user hour-of-week login profiles: built from LOGIN_PROFILE_BACKFILL of
+# successful logins, then topped up at most every LOGIN_PROFILE_REFRESH seconds.
+# A login is unusual when less than LOGIN_UNUSUAL_SHARE of the user's logins
+# fall in its hour of week, once the user has LOGIN_PROFILE_MIN_LOGINS logins
+LOGIN_PROFILE_BACKFILL = os.getenv('LOGIN_PROFILE_BACKFILL', '28d')
+LOGIN_PROFILE_REFRESH = float(os.getenv('LOGIN_PROFILE_REFRESH', '300'))
+LOGIN_PROFILE_MIN_LOGINS = int(os.getenv('LOGIN_PROFILE_MIN_LOGINS', '20'))
+LOGIN_UNUSUAL_SHARE = float(os.getenv('LOGIN_UNUSUAL_SHARE', '0.002'))
+LOGIN_PROFILE_PAGE_SIZE = int(os.getenv('LOGIN_PROFILE_PAGE_SIZE', '5000'))
+LOGIN_PROFILE_MAX_PAGES = int(os.getenv('LOGIN_PROFILE_MAX_PAGES', '2000'))
+# Hunts filter on the fields the soc-enrich ingest pipeline stores, falling back
+# per event to the raw fields where they are missing; false always uses the raw ones
+DERIVED_FIELDS = os.getenv('DERIVED_FIELDS', 'true').lower() == 'true'
+INGEST_PIPELINE_INSTALL = os.getenv('INGEST_PIPELINE_INSTALL', 'true').lower() == 'true'
+# 'flask' (threaded WSGI) or 'asgi' (async hunt routes, see asgi_app.py)
+THREAT_HUNTING_SERVER = os.getenv('THREAT_HUNTING_SERVER', 'flask').lower()
 
-# Initialize Elasticsearch client
+# Initialize Elasticsearch client; building it does not contact the cluster,
+# es_health does that lazily
 try:
-    es = Elasticsearch([ELASTICSEARCH_URL])
+    es = es_client.create_client(ELASTICSEARCH_URL)
 except Exception as e:
-    print(f"Failed to connect to Elasticsearch: {e}")
+    print(f"Invalid Elasticsearch configuration: {e}")
     es = None
+es_health = es_client.HealthProbe(es)
 
 class ThreatHunter:
     def __init__(self):
         self.es = es
+        self.hunt_pool = ThreadPoolExecutor(max_workers=ANOMALY_HUNT_WORKERS, thread_name_prefix='hunt')
+        self.hunt_cache = HuntCache(
+            ttl=HUNT_CACHE_TTL,
+            max_entries=HUNT_CACHE_MAX_ENTRIES,
+            max_bytes=HUNT_CACHE_MAX_BYTES
+        )
+        metrics.register_cache('hunts', self.hunt_cache)
+        self.slow_hunts = hunt_timing.SlowHuntLog(
+            HUNT_SLOW_LOG,
+            threshold_ms=HUNT_SLOW_THRESHOLD_MS,
+            max_bytes=HUNT_SLOW_LOG_MAX_BYTES,
+            backups=HUNT_SLOW_LOG_BACKUPS,
+            cooldown=HUNT_SLOW_PROFILE_COOLDOWN
+        )
         
         # MITRE ATT&CK TTPs mapped to search queries
         self.attack_patterns = {
             'T1078': {  # Valid Accounts
                 'name': 'Valid Accounts',
                 'query': 'event.category:authentication AND event.outcome:success AND user.name:("admin" OR "administrator" OR "root")',
-                'description': 'Detect use of valid accounts for unauthorized access'
+                'description': 'Detect use of valid accounts for unauthorized access',
+                'indices': ['wazuh-alerts-*', 'winlogbeat-*', 'auditbeat-*']
             },
             'T1110': {  # Brute Force
                 'name': 'Brute Force',
                 'query': 'event.category:authentication AND event.outcome:failure',
-                'description': 'Multiple failed authentication attempts'
+                'description': 'Multiple failed authentication attempts',
+                'indices': ['wazuh-alerts-*', 'winlogbeat-*', 'auditbeat-*']
             },
             'T1059': {  # Command and Scripting Interpreter
                 'name': 'Command and Scripting Interpreter',
                 'query': 'process.name:("cmd.exe" OR "powershell.exe" OR "bash" OR "sh") AND process.args:*',
-                'description': 'Suspicious command line activity'
+                'description': 'Suspicious command line activity',
+                'indices': ['wazuh-alerts-*', 'winlogbeat-*', 'auditbeat-*']
             },
             'T1055': {  # Process Injection
                 'name': 'Process Injection',
                 'query': 'event.category:process AND process.name:("svchost.exe" OR "winlogon.exe" OR "lsass.exe")',
-                'description': 'Potential process injection activity'
+                'description': 'Potential process injection activity',
+                'indices': ['wazuh-alerts-*', 'winlogbeat-*', 'auditbeat-*']
             },
             'T1071': {  # Application Layer Protocol
                 'name': 'Application Layer Protocol',
                 'query': 'network.protocol:("http" OR "https" OR "dns") AND destination.port:(80 OR 443 OR 53)',
-                'description': 'Suspicious network protocol usage'
+                'description': 'Suspicious network protocol usage',
+                'indices': ['wazuh-alerts-*', 'packetbeat-*', 'filebeat-*']
             },
             'T1105': {  # Ingress Tool Transfer
                 'name': 'Ingress Tool Transfer',
                 'query': 'file.extension:("exe" OR "dll" OR "bat" OR "ps1" OR "sh") AND file.path:*',
-                'description': 'File transfers and tool deployment'
+                'description': 'File transfers and tool deployment',
+                'indices': ['wazuh-alerts-*', 'winlogbeat-*', 'auditbeat-*']
             }
         }
         
-        # IOC patterns
-        self.ioc_patterns = {
-            'ip': r'^(?:(?:25[0-5]|2[0-4][0-9]|[01]?[0-9][0-9]?)\.){3}(?:25[0-5]|2[0-4][0-9]|[01]?[0-9][0-9]?)$',
-            'domain': r'^(?:[a-zA-Z0-9](?:[a-zA-Z0-9-]{0,61}[a-zA-Z0-9])?\.)+[a-zA-Z]{2,}$',
-            'md5': r'^[a-fA-F0-9]{32}$',
-            'sha1': r'^[a-fA-F0-9]{40}$',
-            'sha256': r'^[a-fA-F0-9]{64}$',
-            'email': r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$',
-            'url': r'^https?://[^\s/$.?#].[^\s]*$'
+        # Compile the catalogue once into filter-context DSL; query_string is
+        # kept only for user-supplied ad-hoc queries
+        self.query_plans = self._compile_attack_patterns()
+        
+        # Detection thresholds come from the matching rules in configs/alert-rules.yml
+        rules = alert_rules.AlertRules()
+        self.thresholds = {
+            'brute_force': rules.threshold('Multiple Failed Login Attempts', 5, '5m'),
+            'password_spray': rules.threshold('Password Spraying', 10, '10m')
+        }
+        
+        # Filters behind each anomaly hunt, without the time range
+        self.anomaly_filters = {
+            'unusual_logins': [
+                {"term": {"event.category": "authentication"}},
+                {"term": {"event.outcome": "success"}}
+            ],
+            'privilege_escalation': [
+                {"query_string": {"query": 'process.args:("runas" OR "sudo" OR "su" OR "net user" OR "net group")'}}
+            ],
+            'dns_tunneling': [
+                {"term": {"dns.question.type" + ECS_KEYWORD_SUFFIX: "TXT"}},
+                self._derived(
+                    'soc.dns.question_length',
+                    {"range": {"soc.dns.question_length": {"gt": 50}}},
+                    {"regexp": {"dns.question.name" + ECS_KEYWORD_SUFFIX: ".{51,}"}}
+                )
+            ],
+            'lateral_movement': [
+                {"query_string": {"query": 'process.name:("net.exe" OR "psexec.exe" OR "wmic.exe" OR "ssh.exe")'}}
+            ]
+        }
+        
+        # ECS fields that can hold each IOC type
+        self.ioc_fields = {
+            'ip': ['source.ip', 'destination.ip', 'client.ip', 'server.ip'],
+            'domain': ['domain', 'url.domain', 'dns.question.name'],
+            'md5': ['file.hash.md5'],
+            'sha1': ['file.hash.sha1'],
+            'sha256': ['file.hash.sha256'],
+            'email': ['email.from.address', 'email.to.address', 'user.email'],
+            'url': ['url.original', 'url.full']
+        }
+        
+        # Index patterns searched for each IOC type until routing discovery
+        # has resolved them from _field_caps
+        self.ioc_indices = {
+            'ip': ['wazuh-alerts-*', 'packetbeat-*', 'filebeat-*'],
+            'domain': ['wazuh-alerts-*', 'packetbeat-*', 'filebeat-*'],
+            'md5': ['wazuh-alerts-*', 'winlogbeat-*', 'auditbeat-*'],
+            'sha1': ['wazuh-alerts-*', 'winlogbeat-*', 'auditbeat-*'],
+            'sha256': ['wazuh-alerts-*', 'winlogbeat-*', 'auditbeat-*'],
+            'email': ['wazuh-alerts-*', 'filebeat-*'],
+            'url': ['wazuh-alerts-*', 'packetbeat-*', 'filebeat-*']
+        }
+        
+        # ECS fields each anomaly hunt filters or aggregates on, and the index
+        # patterns searched for it until routing discovery has resolved them
+        self.anomaly_fields = {
+            'unusual_logins': ['event.category', 'event.outcome', 'user.name'],
+            'privilege_escalation': ['process.args'],
+            'data_exfiltration': ['source.ip', 'destination.ip', EXFIL_BYTES_FIELD],
+            'dns_tunneling': ['dns.question.type', 'dns.question.name'],
+            'lateral_movement': ['process.name', 'user.name', 'host.name', LATERAL_DESTINATION_FIELD]
+        }
+        self.anomaly_indices = {
+            'unusual_logins': ['wazuh-alerts-*', 'winlogbeat-*', 'auditbeat-*', 'filebeat-*'],
+            'privilege_escalation': ['wazuh-alerts-*', 'winlogbeat-*', 'auditbeat-*'],
+            'data_exfiltration': ['wazuh-alerts-*', 'packetbeat-*', 'filebeat-*'],
+            'dns_tunneling': ['wazuh-alerts-*', 'packetbeat-*'],
+            'lateral_movement': ['wazuh-alerts-*', 'winlogbeat-*', 'auditbeat-*']
         }
         
-    def hunt_mitre_attack(self, technique_id, time_range='24h'):
+        # Route each technique, IOC type and anomaly hunt to the indices that
+        # map its fields
+        self.router = IndexRouter(
+            self.es,
+            HUNT_INDEX_CANDIDATES,
+            refresh_interval=HUNT_ROUTING_REFRESH
+        )
+        for technique_id, technique in self.attack_patterns.items():
+            self.router.register(
+                ('technique', technique_id),
+                query_fields(technique['query']),
+                match='all',
+                seed=technique.get('indices')
+            )
+        for ioc_type, fields in self.ioc_fields.items():
+            self.router.register(('ioc', ioc_type), fields, match='any', seed=self.ioc_indices.get(ioc_type))
+        self.router.register(('ioc', 'tagged'), ['threat.indicator.type'], match='any', seed=[IOC_MATCH_INDEX])
+        for name, fields in self.anomaly_fields.items():
+            self.router.register(('anomaly', name), fields, match='all', seed=self.anomaly_indices.get(name))
+        if self.es:
+            self.router.start()
+        
+        # Keep the cluster's soc-enrich pipeline in step with configs/ingest-pipeline.json
+        if self.es and INGEST_PIPELINE_INSTALL:
+            threading.Thread(target=self._install_ingest_pipeline, name='ingest-pipeline', daemon=True).start()
+        
+        # Continuously hunt every technique and anomaly into the local
+        # findings store, one watermark per hunt
+        self.findings = FindingsStore(HUNT_FINDINGS_DB)
+        self.scheduler = HuntScheduler(
+            self,
+            self.findings,
+            backfill=HUNT_SCHEDULER_BACKFILL,
+            lag=HUNT_SCHEDULER_LAG,
+            retention_days=HUNT_FINDINGS_RETENTION_DAYS,
+            max_findings=HUNT_SCHEDULER_MAX_FINDINGS
+        )
+        intervals = parse_intervals(HUNT_SCHEDULER_INTERVALS)
+        skipped = {name.strip() for name in HUNT_SCHEDULER_SKIP.split(',') if name.strip()}
+        for technique_id in self.attack_patterns:
+            if technique_id in skipped:
+                continue
+            self.scheduler.register(
+                f"technique:{technique_id}",
+                self.query_plans[technique_id]['query'],
+                lambda technique_id=technique_id: self.router.indices(('technique', technique_id)),
+                intervals.get(technique_id, HUNT_SCHEDULER_TECHNIQUE_INTERVAL)
+            )
+        for name in self._anomaly_hunts():
+            self.scheduler.register(
+                f"anomaly:{name}",
+                {"bool": {"filter": self.anomaly_filters[name]}},
+                lambda name=name: self.router.indices(('anomaly', name)),
+                intervals.get(name, HUNT_SCHEDULER_ANOMALY_INTERVAL)
+            )
+        if self.es and HUNT_SCHEDULER_ENABLED:
+            self.scheduler.start()
+        
+        # Hour-of-week login counters per user, persisted in the findings store
+        self._login_profiles_lock = threading.Lock()
+        self._login_profiles_refreshed = 0
+        self._load_login_profiles()
+        
+    def _derived(self, field, derived, raw):
+        """Filter on a field stored by the soc-enrich pipeline, falling back
+        to ``raw`` for events indexed without it"""
+        return ingest.with_fallback(field, derived, raw) if DERIVED_FIELDS else raw
+    
+    def _install_ingest_pipeline(self):
+        try:
+            if ingest.install(self.es):
+                print(f"Installed ingest pipeline {ingest.INGEST_PIPELINE_ID}")
+        except Exception as e:
+            print(f"Failed to install ingest pipeline {ingest.INGEST_PIPELINE_ID}: {e}")
+    
+    def _compile_attack_patterns(self):
+        """Compile every attack pattern query into a cached query plan"""
+        plans = {}
+        for technique_id, technique in self.attack_patterns.items():
+            try:
+                plans[technique_id] = {
+                    "mode": "dsl",
+                    "query": compile_query(technique['query'], ECS_KEYWORD_SUFFIX)
+                }
+            except QueryCompileError as e:
+                print(f"Using query_string for {technique_id}: {e}")
+                plans[technique_id] = {
+                    "mode": "query_string",
+                    "query": {"query_string": {"query": technique['query']}}
+                }
+        return plans
+    
+    def hunt_mitre_attack(self, technique_id, time_range='24h', size=100):
         """Hunt for specific MITRE ATT&CK techniques"""
         if not self.es:
             return {"error": "Elasticsearch not connected"}
-            
+        
         if technique_id not in self.attack_patterns:
             return {"error": f"Unknown MITRE ATT&CK technique: {technique_id}"}
-            
+        
         technique = self.attack_patterns[technique_id]
         
         try:
-            # Calculate time range
-            now = datetime.utcnow()
-            if time_range == '1h':
-                start_time = now - timedelta(hours=1)
-            elif time_range == '24h':
-                start_time = now - timedelta(hours=24)
-            elif time_range == '7d':
-                start_time = now - timedelta(days=7)
-            else:
-                start_time = now - timedelta(hours=24)
-            
-            search_body = {
+            with hunt_timing.phase('parse'):
+                window = timerange.parse(time_range)
+        except ValueError as e:
+            return {"error": str(e)}
+        
+        return self._cached_hunt(
+            'mitre',
+            (technique_id, size),
+            window,
+            lambda: self._run_mitre_hunt(technique_id, technique, window, size)
+        )
+    
+    def _cached_hunt(self, kind, key_parts, window, compute, cacheable=None):
+        """Result of ``compute()``, shared by identical requests: the key is
+        the hunt kind and parameters plus the window snapped to a cache
+        bucket, so requests within the bucket share a single execution"""
+        computed = []
+        
+        def run():
+            computed.append(True)
+            return compute()
+        
+        result = self.hunt_cache.get_or_compute(
+            (kind,) + key_parts + window.cache_key(HUNT_CACHE_BUCKET),
+            run,
+            cacheable=cacheable or (lambda result: 'error' not in result)
+        )
+        hunt_timing.add('cache', 0, 'miss' if computed else 'hit')
+        return result
+    
+    def _run_mitre_hunt(self, technique_id, technique, window, size):
+        """Execute a MITRE ATT&CK technique search and record the execution"""
+        split = self.scheduler.covered_split(f"technique:{technique_id}", window)
+        if split:
+            result = self._run_incremental_mitre_hunt(technique_id, technique, window, size, split)
+        else:
+            result = self._search_mitre_hunt(technique_id, technique, window, size)
+        
+        return self._record_mitre_execution(technique_id, window, result)
+    
+    def _record_mitre_execution(self, technique_id, window, result):
+        if 'error' not in result:
+            hits = result['results']['hits']
+            with hunt_timing.phase('record'):
+                result['execution_id'] = self._record_execution(
+                    f"technique:{technique_id}",
+                    [('', hit) for hit in hits['hits']],
+                    technique=technique_id,
+                    window=window,
+                    total=hits['total']['value']
+                )
+        return result
+    
+    def _search_mitre_hunt(self, technique_id, technique, window, size):
+        try:
+            with hunt_timing.phase('build'):
+                search_body = self._mitre_search_body(technique_id, window.range_clause(), window, size)
+            result = self._search(
+                'mitre',
+                self.router.indices(('technique', technique_id)),
+                search_body,
+                hunt=f"technique:{technique_id}"
+            )
+            return self._mitre_response(technique, window, result)
+        except Exception as e:
+            return {"error": str(e)}
+    
+    def _mitre_response(self, technique, window, result):
+        with hunt_timing.phase('shape'):
+            return {
+                "technique": technique,
+                "results": getattr(result, 'body', result),
+                "interval": window.interval,
+                "timeline": window.timeline(result['aggregations']['timeline'])
+            }
+
+    def hunt_mitre_sweep(self, time_range='24h', technique_ids=None):
+        """Count every technique per time bucket in a single _msearch"""
+        if not self.es:
+            return {"error": "Elasticsearch not connected"}
+    
+        technique_ids = list(technique_ids or self.attack_patterns)
+        unknown = [technique_id for technique_id in technique_ids if technique_id not in self.attack_patterns]
+        if unknown:
+            return {"error": f"Unknown MITRE ATT&CK technique: {', '.join(unknown)}"}
+    
+        try:
+            with hunt_timing.phase('parse'):
+                window = timerange.parse(time_range)
+        except ValueError as e:
+            return {"error": str(e)}
+    
+        def compute():
+            try:
+                with hunt_timing.phase('build'):
+                    searches = self._mitre_sweep_searches(technique_ids, window)
+                response = self._msearch('mitre_sweep', searches)
+            except Exception as e:
+                return {"error": str(e)}
+            return self._mitre_sweep_response(technique_ids, window, response['responses'])
+    
+        return self._cached_hunt(
+            'mitre_sweep',
+            (tuple(technique_ids),),
+            window,
+            compute,
+            cacheable=self._sweep_cacheable
+        )
+    
+    def _mitre_sweep_searches(self, technique_ids, window):
+        """Size-0 count, timeline and top host per technique, as _msearch entries"""
+        searches = []
+        for technique_id in technique_ids:
+            searches.append({"index": self.router.indices(('technique', technique_id)), "request_cache": True})
+            searches.append({
                 "query": {
                     "bool": {
-                        "must": [
-                            {"query_string": {"query": technique['query']}},
-                            {"range": {"@timestamp": {"gte": start_time.isoformat()}}}
+                        "filter": [
+                            self.query_plans[technique_id]['query'],
+                            window.range_clause()
                         ]
                     }
                 },
-                "size": 100,
-                "sort": [{"@timestamp": {"order": "desc"}}],
+                "size": 0,
+                "track_total_hits": True,
                 "aggs": {
-                    "hosts": {
-                        "terms": {"field": "host.name.keyword", "size": 10}
-                    },
-                    "users": {
-                        "terms": {"field": "user.name.keyword", "size": 10}
+                    "timeline": window.histogram(),
+                    "top_host": {
+                        "terms": {"field": "host.name.keyword", "size": 1}
                     }
                 }
+            })
+        return searches
+    
+    def _mitre_sweep_response(self, technique_ids, window, responses):
+        """Shape per-technique responses into a technique x time-bucket matrix"""
+        with hunt_timing.phase('shape'):
+            techniques = {}
+            timelines = {}
+            for technique_id, result in zip(technique_ids, responses):
+                entry = {"name": self.attack_patterns[technique_id]['name']}
+                if 'error' in result:
+                    entry["error"] = self._msearch_error(result['error'])
+                else:
+                    top = result['aggregations']['top_host']['buckets']
+                    entry["total"] = result['hits']['total']['value']
+                    entry["top_host"] = {"name": top[0]['key'], "count": top[0]['doc_count']} if top else None
+                    timelines[technique_id] = window.timeline(result['aggregations']['timeline'])
+                techniques[technique_id] = entry
+    
+            buckets = sorted(set().union(*timelines.values()))
+            for technique_id, timeline in timelines.items():
+                techniques[technique_id]["counts"] = [timeline.get(bucket, 0) for bucket in buckets]
+            return {
+                "interval": window.interval,
+                "buckets": buckets,
+                "techniques": techniques
             }
-            
-            result = self.es.search(index="*", body=search_body)
+    
+    @staticmethod
+    def _sweep_cacheable(result):
+        return 'error' not in result and not any('error' in entry for entry in result['techniques'].values())
+    
+    def _search(self, operation, index, body, hunt=None, label=None, **options):
+        """Run a hunt search, recording metrics and Server-Timing phases"""
+        options.setdefault('request_timeout', HUNT_REQUEST_TIMEOUT)
+        started = time.perf_counter()
+        try:
+            result = self.es.options(**options).search(index=index, body=body)
+        except Exception:
+            metrics.es_error(operation)
+            raise
+        self._observe_search(operation, started, result, index, body, hunt=hunt, label=label)
+        return result
+    
+    def _observe_search(self, operation, started, result, index, body, hunt=None, label=None):
+        """Record a finished search and queue a profiled re-run when it was slow"""
+        metrics.observe_es(operation, started, result)
+        elapsed = hunt_timing.record_es(started, result, label)
+        self.slow_hunts.maybe_capture(
+            hunt or operation,
+            elapsed,
+            {"index": index, "body": body},
+            lambda: self._profile_search(index, body)
+        )
+    
+    def _msearch(self, operation, searches):
+        """Run a hunt _msearch, recording metrics and Server-Timing phases"""
+        started = time.perf_counter()
+        try:
+            response = self.es.options(request_timeout=HUNT_REQUEST_TIMEOUT).msearch(searches=searches)
+        except Exception:
+            metrics.es_error(operation)
+            raise
+        self._observe_msearch(operation, started, response, searches)
+        return response
+    
+    def _observe_msearch(self, operation, started, response, searches):
+        metrics.observe_es(operation, started, response)
+        elapsed = hunt_timing.record_es(started, response)
+        self.slow_hunts.maybe_capture(
+            operation,
+            elapsed,
+            {"searches": searches},
+            lambda: self._profile_msearch(searches)
+        )
+    
+    def _profile_search(self, index, body):
+        result = self.es.options(request_timeout=HUNT_REQUEST_TIMEOUT).search(
+            index=index,
+            body=dict(body, profile=True)
+        )
+        return {"took": result['took'], "profile": result['profile']}
+    
+    def _profile_msearch(self, searches):
+        # Bodies are the odd entries; headers stay as they were
+        profiled = [dict(entry, profile=True) if i % 2 else entry for i, entry in enumerate(searches)]
+        responses = self.es.options(request_timeout=HUNT_REQUEST_TIMEOUT).msearch(searches=profiled)['responses']
+        return [
+            {"took": response.get('took'), "profile": response.get('profile'), "error": response.get('error')}
+            for response in responses
+        ]
+    
+    def _record_execution(self, hunt, hits, technique=None, window=None, total=None, params=None):
+        """Store a hunt execution; recording problems never fail the hunt"""
+        try:
+            return self.findings.record_execution(
+                hunt,
+                hits,
+                technique=technique,
+                time_range=window.spec if window else None,
+                window=window,
+                total=total,
+                params=params
+            )
+        except Exception as e:
+            print(f"Failed to record {hunt} execution: {e}")
+            return None
+    
+    def _mitre_search_body(self, technique_id, range_clause, window, size):
+        return {
+            "query": {
+                "bool": {
+                    "filter": [
+                        self.query_plans[technique_id]['query'],
+                        range_clause
+                    ]
+                }
+            },
+            "size": size,
+            "sort": [{"@timestamp": {"order": "desc"}}],
+            "track_total_hits": True,
+            "aggs": {
+                "timeline": window.histogram(),
+                "hosts": {
+                    "terms": {"field": "host.name.keyword", "size": 10}
+                },
+                "users": {
+                    "terms": {"field": "user.name.keyword", "size": 10}
+                }
+            }
+        }
+    
+    def _run_incremental_mitre_hunt(self, technique_id, technique, window, size, split):
+        """Answer the covered part of the window from the findings store and
+        only search Elasticsearch for what arrived after the split point"""
+        try:
+            with hunt_timing.phase('store', 'Findings store'):
+                stored = self.findings.summarize(
+                    f"technique:{technique_id}", window.start, split, window.interval, size
+                )
+            with hunt_timing.phase('build'):
+                live_range = {"range": {"@timestamp": {"gte": split.isoformat(), "lte": "now"}}}
+                search_body = self._mitre_search_body(technique_id, live_range, window, size)
+            result = self._search(
+                'mitre_incremental',
+                self.router.indices(('technique', technique_id)),
+                search_body,
+                hunt=f"technique:{technique_id}"
+            )
+            live = getattr(result, 'body', result)
+        
+            timeline = window.timeline(live['aggregations']['timeline'])
+            for bucket, count in stored['timeline'].items():
+                timeline[bucket] = timeline.get(bucket, 0) + count
+        
+            aggregations = {}
+            for name in ('hosts', 'users'):
+                counts = dict(stored[name])
+                for bucket in live['aggregations'][name]['buckets']:
+                    counts[bucket['key']] = counts.get(bucket['key'], 0) + bucket['doc_count']
+                top = sorted(counts.items(), key=lambda item: item[1], reverse=True)[:10]
+                aggregations[name] = {"buckets": [{"key": key, "doc_count": count} for key, count in top]}
+        
+            hits = live['hits']['hits'] + stored['hits']
             return {
                 "technique": technique,
-                "results": result,
-                "timeline": self._create_timeline(result['hits']['hits'])
+                "results": {
+                    "took": live.get('took'),
+                    "timed_out": live.get('timed_out', False),
+                    "hits": {
+                        "total": {"value": live['hits']['total']['value'] + stored['total'], "relation": "eq"},
+                        "hits": hits[:size]
+                    },
+                    "aggregations": aggregations
+                },
+                "interval": window.interval,
+                "timeline": dict(sorted(timeline.items())),
+                "coverage": {
+                    "findings_store": [window.start.isoformat(), split.isoformat()],
+                    "elasticsearch": [split.isoformat(), window.end.isoformat()]
+                }
             }
         except Exception as e:
             return {"error": str(e)}
     
-    def hunt_iocs(self, iocs, time_range='24h'):
+    def hunt_iocs(self, iocs, time_range='24h', batch_size=None, size=50):
         """Hunt for Indicators of Compromise"""
         if not self.es:
             return {"error": "Elasticsearch not connected"}
-            
+        
+        batch_size = max(1, int(batch_size or IOC_MSEARCH_BATCH_SIZE))
         results = {}
         
-        for ioc in iocs:
-            ioc_type = self._detect_ioc_type(ioc)
-            query = self._build_ioc_query(ioc, ioc_type)
-            
-            if query:
-                try:
-                    # Calculate time range
-                    now = datetime.utcnow()
-                    if time_range == '1h':
-                        start_time = now - timedelta(hours=1)
-                    elif time_range == '24h':
-                        start_time = now - timedelta(hours=24)
-                    elif time_range == '7d':
-                        start_time = now - timedelta(days=7)
-                    else:
-                        start_time = now - timedelta(hours=24)
-                    
-                    search_body = {
-                        "query": {
-                            "bool": {
-                                "must": [
-                                    {"query_string": {"query": query}},
-                                    {"range": {"@timestamp": {"gte": start_time.isoformat()}}}
-                                ]
-                            }
-                        },
-                        "size": 50,
-                        "sort": [{"@timestamp": {"order": "desc"}}]
-                    }
-                    
-                    result = self.es.search(index="*", body=search_body)
+        try:
+            with hunt_timing.phase('parse'):
+                window = timerange.parse(time_range)
+        except ValueError as e:
+            return {"error": str(e)}
+        
+        # Pack the compiled searches into _msearch batches and fan the
+        # responses back out; msearch keeps response order aligned with
+        # request order.
+        with hunt_timing.phase('build'):
+            pending = self._plan_ioc_searches(iocs, window, size)
+        for offset in range(0, len(pending), batch_size):
+            batch = pending[offset:offset + batch_size]
+            try:
+                response = self._msearch('iocs', self._ioc_msearch_body(batch))
+            except Exception as e:
+                self._fail_ioc_batch(results, batch, e)
+                continue
+            self._collect_ioc_responses(results, batch, response['responses'], window)
+        
+        self._record_ioc_execution(results, window)
+        return results
+    
+    def _plan_ioc_searches(self, iocs, window, size):
+        """Classify once, then compile each chunk of indicators into a single
+        type-grouped search; returns ``(chunk, search_body)`` pairs.
+        
+        Every indicator brings its own filter bucket and timeline, so chunks
+        shrink as the window's timeline grows to stay under HUNT_MAX_BUCKETS.
+        """
+        classified = [(ioc, self._detect_ioc_type(ioc)) for ioc in dict.fromkeys(iocs)]
+        chunk_size = max(1, min(IOC_COMPILE_CHUNK_SIZE, HUNT_MAX_BUCKETS // (window.bucket_count() + 1)))
+        pending = []
+        for offset in range(0, len(classified), chunk_size):
+            chunk = classified[offset:offset + chunk_size]
+            pending.append((chunk, self._compile_ioc_search(chunk, window, size)))
+        return pending
+    
+    def _ioc_msearch_body(self, batch):
+        searches = []
+        for chunk, search_body in batch:
+            ioc_types = dict.fromkeys(('ioc', ioc_type) for _, ioc_type in chunk)
+            searches.append({"index": self.router.indices(*ioc_types)})
+            searches.append(search_body)
+        return searches
+    
+    def _fail_ioc_batch(self, results, batch, error):
+        for chunk, _ in batch:
+            for ioc, _ in chunk:
+                results[ioc] = {"error": str(error)}
+    
+    def _collect_ioc_responses(self, results, batch, responses, window):
+        with hunt_timing.phase('shape'):
+            for (chunk, _), result in zip(batch, responses):
+                if 'error' in result:
+                    error = self._msearch_error(result['error'])
+                    for ioc, _ in chunk:
+                        results[ioc] = {"error": error}
+                    continue
+        
+                buckets = result['aggregations']['iocs']['buckets']
+                for ioc, ioc_type in chunk:
+                    bucket = buckets.get(ioc, {})
                     results[ioc] = {
                         "type": ioc_type,
-                        "matches": result['hits']['total']['value'],
-                        "hits": result['hits']['hits']
+                        "matches": bucket.get('doc_count', 0),
+                        "hits": bucket.get('hits', {}).get('hits', {}).get('hits', []),
+                        "timeline": window.timeline(bucket.get('timeline', {}))
                     }
-                except Exception as e:
-                    results[ioc] = {"error": str(e)}
+    
+    def _record_ioc_execution(self, results, window):
+        with hunt_timing.phase('record'):
+            self._record_execution(
+                'iocs',
+                [(ioc, hit) for ioc, result in results.items() for hit in result.get('hits', [])],
+                window=window,
+                total=sum(result.get('matches', 0) for result in results.values()),
+                params={"iocs": list(results)}
+            )
+    
+    def hunt_ioc_matches(self, time_range='24h', size=50):
+        """Events Logstash tagged with a known indicator at ingest time"""
+        if not self.es:
+            return {"error": "Elasticsearch not connected"}
         
-        return results
+        try:
+            with hunt_timing.phase('parse'):
+                window = timerange.parse(time_range)
+        except ValueError as e:
+            return {"error": str(e)}
+        
+        return self._cached_hunt(
+            'ioc_matches',
+            (size,),
+            window,
+            lambda: self._run_ioc_matches_hunt(window, size)
+        )
     
-    def hunt_anomalies(self, time_range='24h'):
+    def _run_ioc_matches_hunt(self, window, size):
+        try:
+            with hunt_timing.phase('build'):
+                body = {
+                    "query": {
+                        "bool": {
+                            "filter": [
+                                {"term": {"tags" + ECS_KEYWORD_SUFFIX: IOC_MATCH_TAG}},
+                                window.range_clause()
+                            ]
+                        }
+                    },
+                    "size": size,
+                    "sort": [{"@timestamp": {"order": "desc"}}],
+                    "track_total_hits": True,
+                    "aggs": {
+                        "timeline": window.histogram(),
+                        "types": {"terms": {"field": "threat.indicator.type" + ECS_KEYWORD_SUFFIX, "size": 10}},
+                        "fields": {"terms": {"field": "soc.ioc.field" + ECS_KEYWORD_SUFFIX, "size": 20}},
+                        "hosts": {"terms": {"field": "host.name" + ECS_KEYWORD_SUFFIX, "size": 10}}
+                    }
+                }
+            result = self._search('ioc_matches', self.router.indices(('ioc', 'tagged')), body)
+        except Exception as e:
+            return {"error": str(e)}
+        
+        with hunt_timing.phase('shape'):
+            aggregations = result['aggregations']
+            hits = result['hits']['hits']
+            total = result['hits']['total']['value']
+            summary = {
+                name: {bucket['key']: bucket['doc_count'] for bucket in aggregations[name]['buckets']}
+                for name in ('types', 'fields', 'hosts')
+            }
+        with hunt_timing.phase('record'):
+            execution_id = self._record_execution(
+                'ioc_matches',
+                [(source_field(hit['_source'], 'soc.ioc.field'), hit) for hit in hits],
+                window=window,
+                total=total
+            )
+        return dict(
+            summary,
+            total=total,
+            hits=hits,
+            timeline=window.timeline(aggregations['timeline']),
+            execution_id=execution_id
+        )
+    
+    def hunt_anomalies(self, time_range='24h', deadline=None):
         """Hunt for behavioral anomalies"""
         if not self.es:
             return {"error": "Elasticsearch not connected"}
-            
-        anomalies = {}
         
-        # Hunt for unusual login times
-        anomalies['unusual_logins'] = self._hunt_unusual_login_times(time_range)
+        try:
+            with hunt_timing.phase('parse'):
+                window = timerange.parse(time_range)
+        except ValueError as e:
+            return {"error": str(e)}
         
-        # Hunt for privilege escalation
-        anomalies['privilege_escalation'] = self._hunt_privilege_escalation(time_range)
+        deadline = float(deadline or ANOMALY_HUNT_DEADLINE)
+        expires = time.monotonic() + deadline
         
-        # Hunt for data exfiltration
-        anomalies['data_exfiltration'] = self._hunt_data_exfiltration(time_range)
+        # Run every hunt at once against a single overall deadline; hunts
+        # still running when it expires are reported as timed out while the
+        # finished ones are returned as usual.
+        futures = {
+            name: self.hunt_pool.submit(
+                contextvars.copy_context().run, self._run_anomaly_hunt, name, hunt, window, deadline, expires
+            )
+            for name, hunt in self._anomaly_hunts().items()
+        }
+        futures.update(
+            (name, self.hunt_pool.submit(
+                contextvars.copy_context().run, self._run_anomaly_scorer, scorer, time_range, deadline, expires
+            ))
+            for name, scorer in self._anomaly_scorers().items()
+        )
+        wait(futures.values(), timeout=deadline)
         
-        # Hunt for lateral movement
-        anomalies['lateral_movement'] = self._hunt_lateral_movement(time_range)
+        anomalies = {}
+        for name, future in futures.items():
+            if future.done():
+                anomalies[name] = future.result()
+            else:
+                future.cancel()
+                anomalies[name] = self._anomaly_timeout(deadline)
         
+        self._record_anomaly_execution(anomalies, window)
         return anomalies
     
-    def _detect_ioc_type(self, ioc):
-        """Detect the type of IOC"""
-        for ioc_type, pattern in self.ioc_patterns.items():
-            if re.match(pattern, ioc):
-                return ioc_type
-        return 'unknown'
-    
-    def _build_ioc_query(self, ioc, ioc_type):
-        """Build Elasticsearch query for IOC"""
-        if ioc_type == 'ip':
-            return f'(source.ip:"{ioc}" OR destination.ip:"{ioc}" OR client.ip:"{ioc}" OR server.ip:"{ioc}")'
-        elif ioc_type == 'domain':
-            return f'(domain:"{ioc}" OR url.domain:"{ioc}" OR dns.question.name:"{ioc}")'
-        elif ioc_type in ['md5', 'sha1', 'sha256']:
-            return f'(file.hash.md5:"{ioc}" OR file.hash.sha1:"{ioc}" OR file.hash.sha256:"{ioc}")'
-        elif ioc_type == 'email':
-            return f'(email.from.address:"{ioc}" OR email.to.address:"{ioc}" OR user.email:"{ioc}")'
-        elif ioc_type == 'url':
-            return f'(url.original:"{ioc}" OR url.full:"{ioc}")'
-        else:
-            return f'"{ioc}"'
+    def _anomaly_hunts(self):
+        """Anomaly hunts by name; each returns the search to run for a window"""
+        return {
+            'privilege_escalation': self._hunt_privilege_escalation,
+            'dns_tunneling': self._hunt_dns_tunneling
+        }
+    
+    def _anomaly_scorers(self):
+        """Anomaly hunts answered by their own endpoint's scoring (and cache);
+        each is called with the time range"""
+        return {
+            'unusual_logins': self.hunt_unusual_logins,
+            'data_exfiltration': self.hunt_exfiltration,
+            'lateral_movement': self.hunt_lateral_movement
+        }
     
-    def _hunt_unusual_login_times(self, time_range):
-        """Hunt for logins outside business hours"""
+    def _run_anomaly_scorer(self, scorer, time_range, deadline, expires):
+        # Scorers page through aggregations without a request timeout of
+        # their own, so a late start is the only point they can be skipped
+        if expires - time.monotonic() <= 0:
+            return self._anomaly_timeout(deadline)
         try:
-            search_body = {
-                "query": {
-                    "bool": {
-                        "must": [
-                            {"term": {"event.category": "authentication"}},
-                            {"term": {"event.outcome": "success"}},
-                            {"range": {"@timestamp": {"gte": f"now-{time_range}"}}}
-                        ],
-                        "should": [
-                            {"range": {"@timestamp": {"time_zone": "UTC", "format": "hour", "gte": "22"}}},
-                            {"range": {"@timestamp": {"time_zone": "UTC", "format": "hour", "lt": "06"}}}
-                        ]
-                    }
-                },
-                "size": 20,
-                "sort": [{"@timestamp": {"order": "desc"}}]
-            }
-            
-            result = self.es.search(index="*", body=search_body)
-            return result
+            return scorer(time_range)
         except Exception as e:
             return {"error": str(e)}
     
-    def _hunt_privilege_escalation(self, time_range):
-        """Hunt for potential privilege escalation"""
+    def _run_anomaly_hunt(self, name, hunt, window, deadline, expires):
+        # The pool is shared by all requests, so a hunt may start late; it
+        # only gets what is left of its request's deadline
+        remaining = expires - time.monotonic()
+        if remaining <= 0:
+            return self._anomaly_timeout(deadline)
         try:
-            search_body = {
-                "query": {
-                    "bool": {
-                        "must": [
-                            {"query_string": {"query": 'process.args:("runas" OR "sudo" OR "su" OR "net user" OR "net group")'}},
-                            {"range": {"@timestamp": {"gte": f"now-{time_range}"}}}
-                        ]
-                    }
-                },
-                "size": 20,
-                "sort": [{"@timestamp": {"order": "desc"}}]
+            search, split = self._anomaly_search(name, hunt, window)
+            # A retry could only finish after the deadline
+            result = self._search(
+                f"anomaly:{name}",
+                search['index'],
+                search['body'],
+                label=name,
+                request_timeout=remaining,
+                retry_on_timeout=False
+            )
+            result = getattr(result, 'body', result)
+            if split:
+                result = self._merge_stored_anomalies(name, window, split, search['body'], result)
+            return result
+        except Exception as e:
+            return {"error": str(e)}
+    
+    def _anomaly_search(self, name, hunt, window):
+        """The search for an anomaly hunt, and the point up to which the
+        scheduler's findings answer it (None when Elasticsearch must cover
+        the whole window)"""
+        split = self.scheduler.covered_split(f"anomaly:{name}", window)
+        if not split:
+            return hunt(window), None
+        return hunt(timerange.TimeWindow(window.spec, split, window.end)), split
+    
+    def _merge_stored_anomalies(self, name, window, split, body, live):
+        """Add the findings store's share of the window to a search that only
+        covered what arrived after the split point, keeping the hunt's order"""
+        size = body['size']
+        field = next(iter(body['sort'][0]))
+        by_time = field == '@timestamp'
+        with hunt_timing.phase('store', 'Findings store'):
+            stored = self.findings.summarize(
+                f"anomaly:{name}", window.start, split, window.interval, size,
+                order_field=None if by_time else field
+            )
+        hits = live['hits']['hits'] + stored['hits']
+        if not by_time:
+            def value(hit):
+                found = source_field(hit['_source'], field)
+                return (found is not None, found or 0)
+            hits.sort(key=value, reverse=True)
+        total = live['hits']['total']
+        return dict(
+            live,
+            hits=dict(
+                live['hits'],
+                total={"value": total['value'] + stored['total'], "relation": total.get('relation', 'eq')},
+                hits=hits[:size]
+            ),
+            coverage={
+                "findings_store": [window.start.isoformat(), split.isoformat()],
+                "elasticsearch": [split.isoformat(), window.end.isoformat()]
             }
+        )
+    
+    def _anomaly_timeout(self, deadline):
+        return {"error": f"Hunt timed out after {deadline:g}s", "timed_out": True}
+    
+    def _record_anomaly_execution(self, anomalies, window):
+        # Scorer results carry no hits; they record executions of their own
+        with hunt_timing.phase('record'):
+            self._record_execution(
+                'anomalies',
+                [
+                    (name, hit)
+                    for name, result in anomalies.items() if 'error' not in result
+                    for hit in result.get('hits', {}).get('hits', [])
+                ],
+                window=window
+            )
+    
+    def hunt_brute_force(self, time_range='24h'):
+        """Sources and accounts that crossed the brute force threshold"""
+        return self._threshold_hunt('brute_force', time_range)
+    
+    def hunt_password_spray(self, time_range='24h'):
+        """Sources that failed logins across too many accounts"""
+        return self._threshold_hunt('password_spray', time_range)
+    
+    def _threshold_hunt(self, name, time_range):
+        if not self.es:
+            return {"error": "Elasticsearch not connected"}
+        
+        try:
+            with hunt_timing.phase('parse'):
+                window = timerange.parse(time_range)
+        except ValueError as e:
+            return {"error": str(e)}
+        
+        return self._cached_hunt(
+            'threshold',
+            (name,),
+            window,
+            lambda: self._run_threshold_hunt(name, window)
+        )
+    
+    def _run_threshold_hunt(self, name, window):
+        threshold = self.thresholds[name]
+        build_body, shape_offender = {
+            'brute_force': (threshold_hunts.brute_force_body, threshold_hunts.brute_force_offender),
+            'password_spray': (threshold_hunts.password_spray_body, threshold_hunts.password_spray_offender)
+        }[name]
+        try:
+            with hunt_timing.phase('build'):
+                body = build_body(
+                    self.query_plans['T1110']['query'],
+                    window.range_clause(),
+                    threshold,
+                    THRESHOLD_HUNT_PAGE_SIZE,
+                    ECS_KEYWORD_SUFFIX
+                )
+            buckets, complete = self._composite_pages(
+                f"threshold:{name}",
+                self.router.indices(('technique', 'T1110')),
+                body,
+                'offenders',
+                THRESHOLD_HUNT_MAX_PAGES
+            )
+        except Exception as e:
+            return {"error": str(e)}
+        
+        with hunt_timing.phase('shape'):
+            offenders = sorted(
+                (shape_offender(bucket) for bucket in buckets),
+                key=lambda offender: (offender['peak'], offender['failures']),
+                reverse=True
+            )
+        with hunt_timing.phase('record'):
+            execution_id = self._record_execution(
+                f"threshold:{name}",
+                [('', threshold_hunts.as_hit(name, offender)) for offender in offenders],
+                technique='T1110',
+                window=window,
+                total=len(offenders)
+            )
+        return {
+            "threshold": threshold.describe(),
+            "offenders": offenders,
+            # False when THRESHOLD_HUNT_MAX_PAGES stopped paging early
+            "complete": complete,
+            "execution_id": execution_id
+        }
+    
+    def hunt_lateral_movement(self, time_range='7d', baseline=LATERAL_BASELINE, limit=100):
+        """Users fanning out to more hosts than usual, biggest jump first"""
+        if not self.es:
+            return {"error": "Elasticsearch not connected"}
+        
+        try:
+            with hunt_timing.phase('parse'):
+                window = timerange.parse(time_range)
+                baseline_span = timerange.parse_span(baseline)
+        except ValueError as e:
+            return {"error": str(e)}
+        
+        return self._cached_hunt(
+            'lateral_movement',
+            (baseline, limit),
+            window,
+            lambda: self._run_lateral_movement_hunt(window, baseline, baseline_span, limit)
+        )
+    
+    def _run_lateral_movement_hunt(self, window, baseline, baseline_span, limit):
+        baseline_start = window.start - baseline_span
+        try:
+            with hunt_timing.phase('build'):
+                body = lateral_movement.search_body(
+                    self.anomaly_filters['lateral_movement'],
+                    window,
+                    baseline_start,
+                    LATERAL_DESTINATION_FIELD,
+                    LATERAL_HUNT_PAGE_SIZE,
+                    ECS_KEYWORD_SUFFIX,
+                    LATERAL_MIN_FANOUT,
+                    LATERAL_MIN_RATIO,
+                    LATERAL_EDGES_PER_MOVER
+                )
+            buckets, complete = self._composite_pages(
+                'lateral_movement',
+                self.router.indices(('anomaly', 'lateral_movement')),
+                body,
+                'movers',
+                THRESHOLD_HUNT_MAX_PAGES
+            )
+        except Exception as e:
+            return {"error": str(e)}
+        
+        with hunt_timing.phase('shape'):
+            movers = lateral_movement.rank(lateral_movement.mover(bucket) for bucket in buckets)
+        with hunt_timing.phase('record'):
+            execution_id = self._record_execution(
+                'lateral_movement',
+                [('', lateral_movement.as_hit(entry)) for entry in movers],
+                window=window,
+                total=len(movers)
+            )
+        return {
+            "baseline": {"span": baseline, "start": baseline_start.isoformat(), "end": window.start.isoformat()},
+            "min_fanout": LATERAL_MIN_FANOUT,
+            "min_ratio": LATERAL_MIN_RATIO,
+            "total": len(movers),
+            "movers": movers[:limit],
+            # False when THRESHOLD_HUNT_MAX_PAGES stopped paging early
+            "complete": complete,
+            "execution_id": execution_id
+        }
+    
+    def hunt_exfiltration(self, time_range='24h', limit=20):
+        """Sources whose sliding outbound volume deviates most from their baseline"""
+        if not self.es:
+            return {"error": "Elasticsearch not connected"}
+        
+        try:
+            with hunt_timing.phase('parse'):
+                window = timerange.parse(time_range)
+                step = timerange.parse_span(EXFIL_SUB_WINDOW)
+                if exfiltration.destination_buckets(window, step, EXFIL_DESTINATIONS) > HUNT_MAX_BUCKETS:
+                    raise ValueError(
+                        f"Time range {time_range} has too many {EXFIL_SUB_WINDOW} sub-windows "
+                        f"for HUNT_MAX_BUCKETS ({HUNT_MAX_BUCKETS})"
+                    )
+        except ValueError as e:
+            return {"error": str(e)}
+        
+        return self._cached_hunt(
+            'exfiltration',
+            (limit,),
+            window,
+            lambda: self._run_exfiltration_hunt(window, step, limit)
+        )
+    
+    def _run_exfiltration_hunt(self, window, step, limit):
+        interval = f"{int(step.total_seconds())}s"
+        # Every source carries a bucket per sub-window; size pages and
+        # destination batches to stay under HUNT_MAX_BUCKETS
+        page_size = max(1, min(EXFIL_HUNT_PAGE_SIZE, HUNT_MAX_BUCKETS // exfiltration.host_buckets(window, step)))
+        batch_size = max(1, HUNT_MAX_BUCKETS // exfiltration.destination_buckets(window, step, EXFIL_DESTINATIONS))
+        try:
+            with hunt_timing.phase('build'):
+                body = exfiltration.host_series_body(
+                    exfiltration.OUTBOUND,
+                    window,
+                    interval,
+                    EXFIL_SLIDING_WINDOWS,
+                    page_size,
+                    ECS_KEYWORD_SUFFIX,
+                    EXFIL_BYTES_FIELD
+                )
+            index = self.router.indices(('anomaly', 'data_exfiltration'))
+            buckets, complete = self._composite_pages(
+                'exfiltration',
+                index,
+                body,
+                'sources',
+                EXFIL_HUNT_MAX_PAGES
+            )
             
-            result = self.es.search(index="*", body=search_body)
-            return result
+            with hunt_timing.phase('shape'):
+                sources = [exfiltration.host_summary(bucket) for bucket in buckets]
+                baselines = self.findings.get_baselines(
+                    exfiltration.BASELINE_METRIC,
+                    [source['source_ip'] for source in sources]
+                )
+                for source in sources:
+                    baseline = baselines.get(source['source_ip'])
+                    source['score'] = exfiltration.score(
+                        baseline,
+                        source['peak_sliding_bytes'],
+                        EXFIL_SLIDING_WINDOWS,
+                        EXFIL_BASELINE_MIN_SAMPLES,
+                        EXFIL_MIN_STDDEV
+                    )
+                    source['baseline'] = exfiltration.describe_baseline(baseline, EXFIL_SLIDING_WINDOWS)
+                deviators = sorted(
+                    (
+                        source for source in sources
+                        if source['score'] is not None
+                        and source['score'] >= EXFIL_MIN_SCORE
+                        and source['peak_sliding_bytes'] >= EXFIL_MIN_BYTES
+                    ),
+                    key=lambda source: source['score'],
+                    reverse=True
+                )[:limit]
+            
+            by_source = {}
+            for offset in range(0, len(deviators), batch_size):
+                result = self._search(
+                    'exfiltration:destinations',
+                    index,
+                    exfiltration.destination_body(
+                        exfiltration.OUTBOUND,
+                        window,
+                        [source['source_ip'] for source in deviators[offset:offset + batch_size]],
+                        interval,
+                        EXFIL_SLIDING_WINDOWS,
+                        EXFIL_DESTINATIONS,
+                        ECS_KEYWORD_SUFFIX,
+                        EXFIL_BYTES_FIELD
+                    )
+                )
+                by_source.update(
+                    (bucket['key'], exfiltration.destination_summaries(bucket))
+                    for bucket in result['aggregations']['sources']['buckets']
+                )
+            for source in deviators:
+                source['top_destinations'] = by_source.get(source['source_ip'], [])
         except Exception as e:
             return {"error": str(e)}
+        
+        with hunt_timing.phase('record'):
+            self._update_exfiltration_baselines(sources, baselines, step, window)
+            execution_id = self._record_execution(
+                'exfiltration',
+                [('', exfiltration.as_hit(source)) for source in deviators],
+                window=window,
+                total=len(deviators)
+            )
+        return {
+            "sub_window": EXFIL_SUB_WINDOW,
+            "sliding_windows": EXFIL_SLIDING_WINDOWS,
+            "min_score": EXFIL_MIN_SCORE,
+            "min_bytes": EXFIL_MIN_BYTES,
+            "sources": len(sources),
+            # Sources still short of EXFIL_BASELINE_MIN_SAMPLES sub-windows
+            "learning": sum(1 for source in sources if source['score'] is None),
+            "deviators": deviators,
+            # False when EXFIL_HUNT_MAX_PAGES stopped paging early
+            "complete": complete,
+            "execution_id": execution_id
+        }
     
-    def _hunt_data_exfiltration(self, time_range):
-        """Hunt for potential data exfiltration"""
+    def _update_exfiltration_baselines(self, sources, baselines, step, window):
+        """Fold the window's closed sub-windows into each source's baseline"""
+        updates = {}
+        for source in sources:
+            baseline = baselines.get(source['source_ip'])
+            covered_until = parse_timestamp(baseline['covered_until']) if baseline else None
+            points = exfiltration.closed_points(source['series'], step, window, covered_until)
+            if points:
+                updates[source['source_ip']] = dict(
+                    exfiltration.fold(baseline, points, EXFIL_BASELINE_ALPHA),
+                    covered_until=points[-1][0]
+                )
         try:
-            search_body = {
-                "query": {
-                    "bool": {
-                        "must": [
-                            {"range": {"network.bytes": {"gte": 10485760}}},  # 10MB+
-                            {"term": {"network.direction": "outbound"}},
-                            {"range": {"@timestamp": {"gte": f"now-{time_range}"}}}
-                        ]
+            self.findings.set_baselines(exfiltration.BASELINE_METRIC, updates)
+        except Exception as e:
+            print(f"Failed to update exfiltration baselines: {e}")
+    
+    def hunt_unusual_logins(self, time_range='24h', limit=100):
+        """Successful logins at hours of the week the user rarely logs in"""
+        if not self.es:
+            return {"error": "Elasticsearch not connected"}
+        
+        try:
+            with hunt_timing.phase('parse'):
+                window = timerange.parse(time_range)
+        except ValueError as e:
+            return {"error": str(e)}
+        
+        return self._cached_hunt(
+            'unusual_logins',
+            (limit,),
+            window,
+            lambda: self._run_unusual_logins_hunt(window, limit)
+        )
+    
+    def _run_unusual_logins_hunt(self, window, limit):
+        try:
+            with hunt_timing.phase('profiles'):
+                covered_until = self._refresh_login_profiles()
+            with hunt_timing.phase('build'):
+                aggs = {
+                    "latest": {
+                        "top_hits": {
+                            "size": 1,
+                            "sort": [{"@timestamp": {"order": "desc"}}],
+                            "_source": {"includes": ["@timestamp", "user.name", "host.name", "source.ip"]}
+                        }
                     }
-                },
-                "size": 20,
-                "sort": [{"network.bytes": {"order": "desc"}}]
-            }
-            
-            result = self.es.search(index="*", body=search_body)
-            return result
+                }
+                if covered_until:
+                    # Logins already folded into the profiles are left out when scoring
+                    aggs["folded"] = {"filter": {"range": {"@timestamp": {"lt": covered_until}}}}
+                bodies = login_profiles.hour_of_week_bodies(
+                    self.anomaly_filters['unusual_logins'],
+                    window.range_clause(),
+                    LOGIN_PROFILE_PAGE_SIZE,
+                    ECS_KEYWORD_SUFFIX,
+                    derived=DERIVED_FIELDS,
+                    aggs=aggs
+                )
+            buckets, complete = self._hour_of_week_pages('unusual_logins', bodies)
         except Exception as e:
             return {"error": str(e)}
+        
+        with hunt_timing.phase('shape'):
+            # A user and hour can come from both the stored-hour and script passes
+            cells = {}
+            for bucket in buckets:
+                cell = cells.setdefault(
+                    (bucket['key']['user'], int(bucket['key']['hour'])),
+                    {"logins": 0, "folded": 0, "latest": []}
+                )
+                cell['logins'] += bucket['doc_count']
+                cell['folded'] += bucket.get('folded', {}).get('doc_count', 0)
+                cell['latest'].extend(bucket['latest']['hits']['hits'])
+            unusual, learning = [], set()
+            for (user, hour_of_week), cell in cells.items():
+                share, logins = self.login_profiles.share(user, hour_of_week, exclude=cell['folded'])
+                if share is None or logins < LOGIN_PROFILE_MIN_LOGINS:
+                    learning.add(user)
+                    continue
+                if share < LOGIN_UNUSUAL_SHARE:
+                    unusual.append(dict(
+                        login_profiles.describe_hour(hour_of_week),
+                        user=user,
+                        hour_of_week=hour_of_week,
+                        logins=cell['logins'],
+                        share=round(share, 5),
+                        profile_logins=logins,
+                        latest=max(cell['latest'], key=lambda hit: hit.get('sort', [0])[0], default=None)
+                    ))
+            unusual.sort(key=lambda entry: (entry['share'], -entry['logins']))
+        with hunt_timing.phase('record'):
+            execution_id = self._record_execution(
+                'unusual_logins',
+                [(f"{entry['day']} {entry['hour']:02d}:00", entry['latest']) for entry in unusual if entry['latest']],
+                window=window,
+                total=len(unusual)
+            )
+        return {
+            "max_share": LOGIN_UNUSUAL_SHARE,
+            "min_logins": LOGIN_PROFILE_MIN_LOGINS,
+            "profiles": len(self.login_profiles),
+            # Users without LOGIN_PROFILE_MIN_LOGINS profiled logins are not scored
+            "learning": len(learning),
+            "total": len(unusual),
+            "unusual": unusual[:limit],
+            # False when LOGIN_PROFILE_MAX_PAGES stopped paging early
+            "complete": complete,
+            "execution_id": execution_id
+        }
+    
+    def _load_login_profiles(self):
+        profiles = LoginProfiles()
+        for user, hours in self.findings.login_profiles():
+            profiles.load(user, hours)
+        self.login_profiles = profiles
+    
+    def _refresh_login_profiles(self):
+        """Fold successful logins since the last update into the profiles;
+        returns how far the profiles cover"""
+        with self._login_profiles_lock:
+            watermark = self.findings.get_watermark('login_profiles')
+            if time.monotonic() - self._login_profiles_refreshed < LOGIN_PROFILE_REFRESH:
+                return watermark['covered_until'] if watermark else None
+            
+            # Whole hours only, behind the scheduler's ingest lag
+            until = timerange.floor_time(datetime.now(timezone.utc) - timedelta(seconds=HUNT_SCHEDULER_LAG), 'h')
+            if watermark:
+                since = parse_timestamp(watermark['covered_until'])
+                coverage_start = parse_timestamp(watermark['coverage_start'])
+            else:
+                since = coverage_start = until - timerange.parse_span(LOGIN_PROFILE_BACKFILL)
+            if since < until:
+                bodies = login_profiles.hour_of_week_bodies(
+                    self.anomaly_filters['unusual_logins'],
+                    {"range": {"@timestamp": {"gte": since.isoformat(), "lt": until.isoformat()}}},
+                    LOGIN_PROFILE_PAGE_SIZE,
+                    ECS_KEYWORD_SUFFIX,
+                    derived=DERIVED_FIELDS
+                )
+                buckets, complete = self._hour_of_week_pages('login_profiles', bodies)
+                if not complete:
+                    # Advancing the watermark would drop the unread pages for good
+                    raise ValueError("Login profile update exceeded LOGIN_PROFILE_MAX_PAGES")
+                users = set()
+                for bucket in buckets:
+                    self.login_profiles.add(bucket['key']['user'], int(bucket['key']['hour']), bucket['doc_count'])
+                    users.add(bucket['key']['user'])
+                try:
+                    self.findings.save_login_profiles(
+                        [(user, self.login_profiles.packed(user)) for user in users],
+                        coverage_start,
+                        until
+                    )
+                except Exception:
+                    # Keep memory in step with the store, which still has the old watermark
+                    self._load_login_profiles()
+                    raise
+                watermark = self.findings.get_watermark('login_profiles')
+            self._login_profiles_refreshed = time.monotonic()
+            return watermark['covered_until'] if watermark else None
+    
+    def _hour_of_week_pages(self, operation, bodies):
+        """Login cells from every hour-of-week search; returns ``(buckets, complete)``"""
+        buckets, complete = [], True
+        for body in bodies:
+            cells, cells_complete = self._composite_pages(
+                operation,
+                self.router.indices(('anomaly', 'unusual_logins')),
+                body,
+                'cells',
+                LOGIN_PROFILE_MAX_PAGES
+            )
+            buckets.extend(cells)
+            complete = complete and cells_complete
+        return buckets, complete
+    
+    def _composite_pages(self, operation, index, body, name, max_pages):
+        """Buckets of composite aggregation ``name`` across pages, following
+        ``after_key``; returns ``(buckets, complete)``"""
+        buckets = []
+        aggregation = body['aggs'][name]
+        for _ in range(max_pages):
+            result = self._search(operation, index, body)
+            page = result['aggregations'][name]
+            buckets.extend(page['buckets'])
+            if not page.get('after_key'):
+                return buckets, True
+            # A fresh body per page keeps earlier requests intact for the slow log
+            after = dict(aggregation, composite=dict(aggregation['composite'], after=page['after_key']))
+            body = dict(body, aggs=dict(body['aggs'], **{name: after}))
+        return buckets, False
+    
+    def classify_iocs(self, iocs):
+        """Classify a batch of indicators, refanging defanged forms"""
+        return [
+            {"ioc": ioc, "normalized": normalized, "type": ioc_type}
+            for ioc, normalized, ioc_type in ioc_classifier.classify_many(iocs)
+        ]
+    
+    def _detect_ioc_type(self, ioc):
+        """Detect the type of IOC"""
+        return ioc_classifier.classify(ioc)
+    
+    def export_hunt(self, technique_id=None, iocs=None, query=None, time_range='24h', page_size=None):
+        """Stream every hit of a technique, IOC or ad-hoc hunt.
+        
+        Pages through a point-in-time with ``search_after`` so memory use is
+        bounded by one page regardless of the result size. Yields one list of
+        hits per page.
+        """
+        if not self.es:
+            raise ValueError("Elasticsearch not connected")
+        
+        window = timerange.parse(time_range)
+        page_size = max(1, min(int(page_size or EXPORT_PAGE_SIZE), 10000))
+        
+        if technique_id:
+            if technique_id not in self.attack_patterns:
+                raise ValueError(f"Unknown MITRE ATT&CK technique: {technique_id}")
+            clause = self.query_plans[technique_id]['query']
+            index = self.router.indices(('technique', technique_id))
+        elif iocs:
+            classified = [(ioc, self._detect_ioc_type(ioc)) for ioc in dict.fromkeys(iocs)]
+            should, _ = self._compile_ioc_clauses(classified)
+            clause = {"bool": {"should": should, "minimum_should_match": 1}}
+            index = self.router.indices(*dict.fromkeys(('ioc', ioc_type) for _, ioc_type in classified))
+        elif query:
+            clause = {"query_string": {"query": query}}
+            index = "*"
+        else:
+            raise ValueError("One of technique, iocs or query is required")
+        
+        return self._export_pages(clause, window, page_size, index)
     
-    def _hunt_lateral_movement(self, time_range):
-        """Hunt for lateral movement indicators"""
+    def _export_pages(self, clause, window, page_size, index, source=None):
+        pit_id = self.es.open_point_in_time(index=index, keep_alive=EXPORT_PIT_KEEP_ALIVE)['id']
         try:
-            search_body = {
-                "query": {
+            search_after = None
+            while True:
+                search_body = {
+                    "query": {"bool": {"filter": [clause, window.range_clause()]}},
+                    "size": page_size,
+                    "pit": {"id": pit_id, "keep_alive": EXPORT_PIT_KEEP_ALIVE},
+                    "sort": [{"@timestamp": {"order": "asc"}}, {"_shard_doc": {"order": "asc"}}],
+                    "track_total_hits": False
+                }
+                if source:
+                    search_body["_source"] = source
+                if search_after:
+                    search_body["search_after"] = search_after
+                
+                started = time.perf_counter()
+                result = self.es.options(request_timeout=HUNT_REQUEST_TIMEOUT).search(body=search_body)
+                metrics.observe_es('export_page', started, result)
+                pit_id = result['pit_id']
+                hits = result['hits']['hits']
+                if not hits:
+                    break
+                
+                yield hits
+                if len(hits) < page_size:
+                    break
+                search_after = hits[-1]['sort']
+        finally:
+            try:
+                self.es.close_point_in_time(id=pit_id)
+            except Exception as e:
+                print(f"Failed to close point-in-time: {e}")
+    
+    def _msearch_error(self, error):
+        """Flatten an error entry from an _msearch response into a message"""
+        if isinstance(error, dict):
+            return error.get('reason') or error.get('type') or json.dumps(error)
+        return str(error)
+    
+    def _ioc_values(self, ioc, ioc_type):
+        """Exact-match values to look up for an IOC on keyword fields"""
+        if ioc_type in ['md5', 'sha1', 'sha256']:
+            return list(dict.fromkeys([ioc, ioc.lower(), ioc.upper()]))
+        if ioc_type in ['domain', 'email']:
+            return list(dict.fromkeys([ioc, ioc.lower()]))
+        return [ioc]
+    
+    def _compile_ioc_clauses(self, classified):
+        """Type-grouped should clauses plus per-indicator attribution filters"""
+        grouped = {}
+        attribution = {}
+        should = []
+        
+        for ioc, ioc_type in classified:
+            fields = self.ioc_fields.get(ioc_type)
+            values = self._ioc_values(ioc_classifier.refang(ioc), ioc_type)
+            if fields:
+                for field in fields:
+                    grouped.setdefault(field, []).extend(values)
+                attribution[ioc] = {
                     "bool": {
-                        "must": [
-                            {"query_string": {"query": 'process.name:("net.exe" OR "psexec.exe" OR "wmic.exe" OR "ssh.exe")'}},
-                            {"range": {"@timestamp": {"gte": f"now-{time_range}"}}}
+                        "should": [
+                            {"terms": {field + ECS_KEYWORD_SUFFIX: values}} for field in fields
                         ]
                     }
-                },
-                "size": 20,
-                "sort": [{"@timestamp": {"order": "desc"}}]
+                }
+            else:
+                # Unclassified indicators keep the free-text phrase search
+                escaped = ioc.replace('\\', '\\\\').replace('"', '\\"')
+                clause = {"query_string": {"query": f'"{escaped}"'}}
+                should.append(clause)
+                attribution[ioc] = clause
+        
+        for field, values in grouped.items():
+            should.append({"terms": {field + ECS_KEYWORD_SUFFIX: list(dict.fromkeys(values)), "_name": field}})
+        
+        return should, attribution
+    
+    def _compile_ioc_search(self, classified, window, size=50):
+        """Compile classified IOCs into one type-grouped terms search.
+        
+        Indicators sharing an ECS field are folded into a single ``terms``
+        filter, so the query cost grows with the number of fields rather than
+        the number of indicators. A keyed ``filters`` aggregation with a
+        ``top_hits`` sub-aggregation maps matching documents back to the
+        individual indicators they contain, and a per-indicator
+        ``date_histogram`` gives full-population timelines.
+        """
+        should, attribution = self._compile_ioc_clauses(classified)
+        
+        return {
+            "query": {
+                "bool": {
+                    "filter": [
+                        window.range_clause()
+                    ],
+                    "should": should,
+                    "minimum_should_match": 1
+                }
+            },
+            "size": 0,
+            "aggs": {
+                "iocs": {
+                    "filters": {"filters": attribution},
+                    "aggs": {
+                        "timeline": window.histogram(),
+                        "hits": {
+                            "top_hits": {
+                                "size": size,
+                                "sort": [{"@timestamp": {"order": "desc"}}]
+                            }
+                        }
+                    }
+                }
             }
-            
-            result = self.es.search(index="*", body=search_body)
-            return result
-        except Exception as e:
-            return {"error": str(e)}
+        }
     
-    def _create_timeline(self, hits):
-        """Create timeline from search hits"""
-        timeline = {}
-        for hit in hits:
-            timestamp = hit['_source'].get('@timestamp', 'Unknown')
-            if timestamp != 'Unknown':
-                date_key = timestamp[:10]  # YYYY-MM-DD
-                if date_key not in timeline:
-                    timeline[date_key] = 0
-                timeline[date_key] += 1
-        return timeline
+    def _hunt_privilege_escalation(self, window):
+        """Hunt for potential privilege escalation"""
+        search_body = {
+            "query": {
+                "bool": {
+                    "must": self.anomaly_filters['privilege_escalation'] + [window.range_clause()]
+                }
+            },
+            "size": 20,
+            "sort": [{"@timestamp": {"order": "desc"}}]
+        }
+        
+        return {"index": self.router.indices(('anomaly', 'privilege_escalation')), "body": search_body}
+    
+    def _hunt_dns_tunneling(self, window):
+        """Hunt for long TXT lookups, most random-looking names first"""
+        search_body = {
+            "query": {
+                "bool": {
+                    "must": self.anomaly_filters['dns_tunneling'] + [window.range_clause()]
+                }
+            },
+            "size": 20,
+            "sort": [
+                {"soc.dns.question_entropy": {"order": "desc", "unmapped_type": "float"}} if DERIVED_FIELDS
+                else {"@timestamp": {"order": "desc"}}
+            ]
+        }
+        
+        return {"index": self.router.indices(('anomaly', 'dns_tunneling')), "body": search_body}
 
 # Initialize threat hunter
 threat_hunter = ThreatHunter()
 
+@app.before_request
+def start_hunt_timings():
+    if request.path.startswith('/api/hunt/'):
+        hunt_timing.start()
+
+@app.after_request
+def add_server_timing(response):
+    timings = hunt_timing.current()
+    if timings and request.path.startswith('/api/hunt/'):
+        response.headers['Server-Timing'] = timings.header()
+    return response
+
 @app.route('/')
 def index():
     return render_template('index.html')
 
 @app.route('/api/health')
 def health():
+    elasticsearch = es_health.check()
     return jsonify({
-        "status": "healthy",
+        "status": "healthy" if elasticsearch['status'] == 'connected' else "degraded",
         "services": {
-            "elasticsearch": "connected" if es else "disconnected"
-        }
+            "elasticsearch": elasticsearch['status']
+        },
+        "elasticsearch": elasticsearch
     })
 
 @app.route('/api/hunt/mitre/<technique_id>')
 def hunt_mitre_technique(technique_id):
     time_range = request.args.get('time_range', '24h')
-    result = threat_hunter.hunt_mitre_attack(technique_id, time_range)
-    return jsonify(result)
+    size = request.args.get('size', 100, type=int)
+    result = threat_hunter.hunt_mitre_attack(technique_id, time_range, size)
+    with hunt_timing.phase('serialize'):
+        return jsonify(result)
+
+@app.route('/api/hunt/mitre/sweep')
+def hunt_mitre_sweep():
+    time_range = request.args.get('time_range', '24h')
+    techniques = request.args.get('techniques')
+    technique_ids = [t.strip() for t in techniques.split(',') if t.strip()] if techniques else None
+    result = threat_hunter.hunt_mitre_sweep(time_range, technique_ids)
+    with hunt_timing.phase('serialize'):
+        return jsonify(result)
+
+@app.route('/api/hunt/brute-force')
+def hunt_brute_force():
+    result = threat_hunter.hunt_brute_force(request.args.get('time_range', '24h'))
+    with hunt_timing.phase('serialize'):
+        return jsonify(result)
+
+@app.route('/api/hunt/password-spray')
+def hunt_password_spray():
+    result = threat_hunter.hunt_password_spray(request.args.get('time_range', '24h'))
+    with hunt_timing.phase('serialize'):
+        return jsonify(result)
+
+@app.route('/api/hunt/lateral-movement')
+def hunt_lateral_movement():
+    result = threat_hunter.hunt_lateral_movement(
+        request.args.get('time_range', '7d'),
+        request.args.get('baseline', LATERAL_BASELINE),
+        request.args.get('limit', 100, type=int)
+    )
+    with hunt_timing.phase('serialize'):
+        return jsonify(result)
+
+@app.route('/api/hunt/exfiltration')
+def hunt_exfiltration():
+    result = threat_hunter.hunt_exfiltration(
+        request.args.get('time_range', '24h'),
+        request.args.get('limit', 20, type=int)
+    )
+    with hunt_timing.phase('serialize'):
+        return jsonify(result)
+
+@app.route('/api/hunt/unusual-logins')
+def hunt_unusual_logins():
+    result = threat_hunter.hunt_unusual_logins(
+        request.args.get('time_range', '24h'),
+        request.args.get('limit', 100, type=int)
+    )
+    with hunt_timing.phase('serialize'):
+        return jsonify(result)
+
+@app.route('/api/hunt/login-profiles')
+def login_profiles_status():
+    profiles = threat_hunter.login_profiles
+    return jsonify({
+        "users": len(profiles),
+        "bytes": profiles.nbytes,
+        "watermark": threat_hunter.findings.get_watermark('login_profiles')
+    })
+
+@app.route('/api/hunt/login-profiles/<path:user>')
+def login_profile(user):
+    profile = threat_hunter.login_profiles.profile(user)
+    if profile is None:
+        return jsonify({"error": f"No login profile for {user}"}), 404
+    return jsonify(dict(profile, user=user, days=list(login_profiles.DAYS)))
+
+@app.route('/api/hunt/routing')
+def hunt_routing():
+    return jsonify(threat_hunter.router.describe())
+
+@app.route('/api/hunt/scheduler')
+def hunt_scheduler_status():
+    return jsonify(threat_hunter.scheduler.status())
+
+@app.route('/api/hunts')
+def list_hunts():
+    since = until = None
+    if request.args.get('time_range'):
+        try:
+            window = timerange.parse(request.args['time_range'])
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        since, until = window.start, window.end
+    
+    executions = threat_hunter.findings.list_executions(
+        hunt=request.args.get('hunt'),
+        technique=request.args.get('technique'),
+        host=request.args.get('host'),
+        user=request.args.get('user'),
+        since=since,
+        until=until,
+        limit=request.args.get('limit', 50, type=int)
+    )
+    return jsonify({"executions": executions})
+
+@app.route('/api/hunts/<int:execution_id>')
+def get_hunt(execution_id):
+    execution = threat_hunter.findings.get_execution(execution_id)
+    if not execution:
+        return jsonify({"error": f"Unknown hunt execution: {execution_id}"}), 404
+    return jsonify(execution)
+
+@app.route('/api/hunts/diff')
+def diff_hunts():
+    base = request.args.get('base', type=int)
+    target = request.args.get('target', type=int)
+    if base is None or target is None:
+        return jsonify({"error": "base and target execution ids are required"}), 400
+    
+    diff = threat_hunter.findings.diff_executions(base, target)
+    if not diff:
+        return jsonify({"error": "Unknown hunt execution"}), 404
+    return jsonify(diff)
+
+@app.route('/api/hunt/slow')
+def hunt_slow_log():
+    return jsonify(threat_hunter.slow_hunts.status())
+
+@app.route('/api/hunt/cache/stats')
+def hunt_cache_stats():
+    return jsonify(threat_hunter.hunt_cache.stats())
 
 @app.route('/api/hunt/iocs', methods=['POST'])
 def hunt_iocs():
     data = request.get_json()
     iocs = data.get('iocs', [])
     time_range = data.get('time_range', '24h')
+    batch_size = data.get('batch_size')
+    size = data.get('size', 50)
     
-    result = threat_hunter.hunt_iocs(iocs, time_range)
-    return jsonify(result)
+    result = threat_hunter.hunt_iocs(iocs, time_range, batch_size, size)
+    with hunt_timing.phase('serialize'):
+        return jsonify(result)
+
+@app.route('/api/hunt/ioc-matches')
+def hunt_ioc_matches():
+    result = threat_hunter.hunt_ioc_matches(
+        request.args.get('time_range', '24h'),
+        request.args.get('size', 50, type=int)
+    )
+    with hunt_timing.phase('serialize'):
+        return jsonify(result)
+
+@app.route('/api/hunt/export', methods=['POST'])
+def export_hunt():
+    data = request.get_json()
+    
+    try:
+        pages = threat_hunter.export_hunt(
+            technique_id=data.get('technique'),
+            iocs=data.get('iocs'),
+            query=data.get('query'),
+            time_range=data.get('time_range', '24h'),
+            page_size=data.get('page_size')
+        )
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    def generate():
+        try:
+            for hits in pages:
+                yield ''.join(json.dumps(hit) + '\n' for hit in hits)
+        except Exception as e:
+            yield json.dumps({"error": str(e)}) + '\n'
+    
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+@app.route('/api/iocs/classify', methods=['POST'])
+def classify_iocs():
+    data = request.get_json()
+    iocs = data.get('iocs', [])
+    
+    results = threat_hunter.classify_iocs(iocs)
+    counts = {}
+    for entry in results:
+        counts[entry['type']] = counts.get(entry['type'], 0) + 1
+    return jsonify({"results": results, "counts": counts})
 
 @app.route('/api/hunt/anomalies')
 def hunt_anomalies():
     time_range = request.args.get('time_range', '24h')
-    result = threat_hunter.hunt_anomalies(time_range)
-    return jsonify(result)
+    deadline = request.args.get('deadline', type=float)
+    result = threat_hunter.hunt_anomalies(time_range, deadline)
+    with hunt_timing.phase('serialize'):
+        return jsonify(result)
 
 @app.route('/api/attack/patterns')
 def get_attack_patterns():
     return jsonify(threat_hunter.attack_patterns)
 
+@app.route('/api/attack/patterns/compiled')
+def get_compiled_attack_patterns():
+    return jsonify(threat_hunter.query_plans)
+
 if __name__ == '__main__':
     print("🔍 Starting Threat Hunting Interface...")
     print(f"Elasticsearch: {ELASTICSEARCH_URL}")
     print(f"MISP: {MISP_URL}")
-    app.run(host='0.0.0.0', port=7777, debug=False)
+    if THREAT_HUNTING_SERVER == 'asgi':
+        import uvicorn
+        # Let asgi_app reuse this module rather than import it (and start its threads) twice
+        sys.modules.setdefault('app', sys.modules[__name__])
+        uvicorn.run('asgi_app:app', host='0.0.0.0', port=7777)
+    else:
+        app.run(host='0.0.0.0', port=7777, debug=False)
@@ -0,0 +1,372 @@
+"""Async (ASGI) serving mode for the threat-hunting service.
+
+The Flask app holds a worker thread for every hunt while it waits on
+Elasticsearch. Here the hunt routes - ``/api/hunt/mitre/<id>``,
+``/api/hunt/mitre/sweep``, ``/api/hunt/iocs`` and ``/api/hunt/anomalies`` -
+run natively on AsyncElasticsearch, so one process keeps hundreds of hunts in
+flight. They
+reuse the ThreatHunter's query plans, index router, result cache and findings
+store and return the same response shapes. Every other route is the Flask app
+mounted as WSGI.
+
+Run with ``uvicorn asgi_app:app --port 7777`` or
+``THREAT_HUNTING_SERVER=asgi python app.py``.
+"""
+import asyncio
+import os
+import time
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, Request
+from fastapi.middleware.wsgi import WSGIMiddleware
+from fastapi.responses import JSONResponse
+from fastapi.routing import APIRoute
+from starlette.routing import Match
+
+import app as threat_hunting
+import hunt_timing
+from soc_common import es_client, metrics, timerange
+
+ASYNC_ES_CONNECTIONS = int(os.getenv('ASYNC_ES_CONNECTIONS', '256'))
+ASYNC_IOC_MSEARCH_CONCURRENCY = int(os.getenv('ASYNC_IOC_MSEARCH_CONCURRENCY', '4'))
+
+
+class AsyncThreatHunter:
+    """Hunts of a ThreatHunter executed on an AsyncElasticsearch client"""
+
+    def __init__(self, hunter, es):
+        self.hunter = hunter
+        self.es = es
+
+    async def hunt_mitre_attack(self, technique_id, time_range='24h', size=100):
+        """Hunt for specific MITRE ATT&CK techniques"""
+        hunter = self.hunter
+        if not self.es:
+            return {"error": "Elasticsearch not connected"}
+
+        if technique_id not in hunter.attack_patterns:
+            return {"error": f"Unknown MITRE ATT&CK technique: {technique_id}"}
+
+        technique = hunter.attack_patterns[technique_id]
+
+        try:
+            with hunt_timing.phase('parse'):
+                window = timerange.parse(time_range)
+        except ValueError as e:
+            return {"error": str(e)}
+
+        return await self._cached_hunt(
+            'mitre',
+            (technique_id, size),
+            window,
+            lambda: self._run_mitre_hunt(technique_id, technique, window, size)
+        )
+
+    async def _cached_hunt(self, kind, key_parts, window, compute, cacheable=None):
+        """Coroutine counterpart of ThreatHunter._cached_hunt; ``compute`` is
+        a coroutine function. Keys match the Flask path, so both modes share
+        cached results"""
+        computed = []
+
+        def run():
+            computed.append(True)
+            return compute()
+
+        result = await self.hunter.hunt_cache.aget_or_compute(
+            (kind,) + key_parts + window.cache_key(threat_hunting.HUNT_CACHE_BUCKET),
+            run,
+            cacheable=cacheable or (lambda result: 'error' not in result)
+        )
+        hunt_timing.add('cache', 0, 'miss' if computed else 'hit')
+        return result
+
+    async def _run_mitre_hunt(self, technique_id, technique, window, size):
+        hunter = self.hunter
+        split = await asyncio.to_thread(hunter.scheduler.covered_split, f"technique:{technique_id}", window)
+        if split:
+            # The store-assisted path reads SQLite; keep it off the event loop
+            result = await asyncio.to_thread(
+                hunter._run_incremental_mitre_hunt, technique_id, technique, window, size, split
+            )
+        else:
+            try:
+                with hunt_timing.phase('build'):
+                    search_body = hunter._mitre_search_body(technique_id, window.range_clause(), window, size)
+                response = await self._search(
+                    'mitre',
+                    hunter.router.indices(('technique', technique_id)),
+                    search_body,
+                    hunt=f"technique:{technique_id}"
+                )
+                result = hunter._mitre_response(technique, window, response)
+            except Exception as e:
+                result = {"error": str(e)}
+
+        return await asyncio.to_thread(hunter._record_mitre_execution, technique_id, window, result)
+
+    async def hunt_mitre_sweep(self, time_range='24h', technique_ids=None):
+        """Count every technique per time bucket in a single _msearch"""
+        hunter = self.hunter
+        if not self.es:
+            return {"error": "Elasticsearch not connected"}
+
+        technique_ids = list(technique_ids or hunter.attack_patterns)
+        unknown = [technique_id for technique_id in technique_ids if technique_id not in hunter.attack_patterns]
+        if unknown:
+            return {"error": f"Unknown MITRE ATT&CK technique: {', '.join(unknown)}"}
+
+        try:
+            with hunt_timing.phase('parse'):
+                window = timerange.parse(time_range)
+        except ValueError as e:
+            return {"error": str(e)}
+
+        async def compute():
+            try:
+                with hunt_timing.phase('build'):
+                    searches = hunter._mitre_sweep_searches(technique_ids, window)
+                response = await self._msearch('mitre_sweep', searches)
+            except Exception as e:
+                return {"error": str(e)}
+            return hunter._mitre_sweep_response(technique_ids, window, response['responses'])
+
+        return await self._cached_hunt(
+            'mitre_sweep',
+            (tuple(technique_ids),),
+            window,
+            compute,
+            cacheable=hunter._sweep_cacheable
+        )
+
+    async def hunt_iocs(self, iocs, time_range='24h', batch_size=None, size=50):
+        """Hunt for Indicators of Compromise"""
+        hunter = self.hunter
+        if not self.es:
+            return {"error": "Elasticsearch not connected"}
+
+        batch_size = max(1, int(batch_size or threat_hunting.IOC_MSEARCH_BATCH_SIZE))
+
+        try:
+            with hunt_timing.phase('parse'):
+                window = timerange.parse(time_range)
+        except ValueError as e:
+            return {"error": str(e)}
+
+        # Send the _msearch batches concurrently (bounded, so one large IOC
+        # list cannot flood the cluster) and fan them out in request order
+        with hunt_timing.phase('build'):
+            pending = hunter._plan_ioc_searches(iocs, window, size)
+        batches = [pending[offset:offset + batch_size] for offset in range(0, len(pending), batch_size)]
+        limit = asyncio.Semaphore(ASYNC_IOC_MSEARCH_CONCURRENCY)
+
+        async def msearch(batch):
+            async with limit:
+                return await self._msearch('iocs', hunter._ioc_msearch_body(batch))
+
+        responses = await asyncio.gather(*(msearch(batch) for batch in batches), return_exceptions=True)
+
+        results = {}
+        for batch, response in zip(batches, responses):
+            if isinstance(response, Exception):
+                hunter._fail_ioc_batch(results, batch, response)
+            else:
+                hunter._collect_ioc_responses(results, batch, response['responses'], window)
+
+        await asyncio.to_thread(hunter._record_ioc_execution, results, window)
+        return results
+
+    async def hunt_anomalies(self, time_range='24h', deadline=None):
+        """Hunt for behavioral anomalies"""
+        hunter = self.hunter
+        if not self.es:
+            return {"error": "Elasticsearch not connected"}
+
+        try:
+            with hunt_timing.phase('parse'):
+                window = timerange.parse(time_range)
+        except ValueError as e:
+            return {"error": str(e)}
+
+        deadline = float(deadline or threat_hunting.ANOMALY_HUNT_DEADLINE)
+        expires = time.monotonic() + deadline
+
+        # Unlike the thread pool, cancelling a timed-out task also aborts its
+        # request to Elasticsearch
+        tasks = {
+            name: asyncio.ensure_future(self._run_anomaly_hunt(name, hunt, window, deadline, expires))
+            for name, hunt in hunter._anomaly_hunts().items()
+        }
+        # Scorers page on the sync client; keep them off the event loop
+        tasks.update(
+            (name, asyncio.ensure_future(
+                asyncio.to_thread(hunter._run_anomaly_scorer, scorer, time_range, deadline, expires)
+            ))
+            for name, scorer in hunter._anomaly_scorers().items()
+        )
+        await asyncio.wait(tasks.values(), timeout=deadline)
+
+        anomalies = {}
+        for name, task in tasks.items():
+            if task.done():
+                anomalies[name] = task.result()
+            else:
+                task.cancel()
+                anomalies[name] = hunter._anomaly_timeout(deadline)
+
+        await asyncio.to_thread(hunter._record_anomaly_execution, anomalies, window)
+        return anomalies
+
+    async def _run_anomaly_hunt(self, name, hunt, window, deadline, expires):
+        hunter = self.hunter
+        try:
+            search, split = await asyncio.to_thread(hunter._anomaly_search, name, hunt, window)
+            # Reading the findings store's split took part of the deadline
+            remaining = expires - time.monotonic()
+            if remaining <= 0:
+                return hunter._anomaly_timeout(deadline)
+            result = await self._search(
+                f"anomaly:{name}",
+                search['index'],
+                search['body'],
+                label=name,
+                request_timeout=remaining,
+                retry_on_timeout=False
+            )
+            if split:
+                return await asyncio.to_thread(
+                    hunter._merge_stored_anomalies, name, window, split, search['body'], result.body
+                )
+            return result.body
+        except Exception as e:
+            return {"error": str(e)}
+
+    async def _search(self, operation, index, body, hunt=None, label=None, **options):
+        """Async counterpart of ThreatHunter._search; slow searches are
+        profiled on the sync client in the background"""
+        options.setdefault('request_timeout', threat_hunting.HUNT_REQUEST_TIMEOUT)
+        started = time.perf_counter()
+        try:
+            result = await self.es.options(**options).search(index=index, body=body)
+        except Exception:
+            metrics.es_error(operation)
+            raise
+        self.hunter._observe_search(operation, started, result, index, body, hunt=hunt, label=label)
+        return result
+
+    async def _msearch(self, operation, searches):
+        started = time.perf_counter()
+        try:
+            response = await self.es.options(request_timeout=threat_hunting.HUNT_REQUEST_TIMEOUT).msearch(
+                searches=searches
+            )
+        except Exception:
+            metrics.es_error(operation)
+            raise
+        self.hunter._observe_msearch(operation, started, response, searches)
+        return response
+
+
+def _arg(request, name, default=None, type=str):
+    """Query parameter with Flask's ``request.args.get`` semantics"""
+    try:
+        return type(request.query_params[name])
+    except (KeyError, ValueError):
+        return default
+
+
+def _create_es():
+    try:
+        return es_client.create_async_client(
+            threat_hunting.ELASTICSEARCH_URL,
+            connections_per_node=ASYNC_ES_CONNECTIONS
+        )
+    except Exception as e:
+        print(f"Invalid Elasticsearch configuration: {e}")
+        return None
+
+
+@asynccontextmanager
+async def lifespan(app):
+    yield
+    if async_hunter.es:
+        await async_hunter.es.close()
+
+
+async_hunter = AsyncThreatHunter(threat_hunting.threat_hunter, _create_es())
+app = FastAPI(title="Threat Hunting", lifespan=lifespan, docs_url=None, redoc_url=None, openapi_url=None)
+
+
+@app.middleware('http')
+async def track_native_routes(request, call_next):
+    """Request metrics and Server-Timing for the async routes; the mounted
+    Flask app handles its own"""
+    route = next(
+        (
+            candidate.path for candidate in app.router.routes
+            if isinstance(candidate, APIRoute) and candidate.matches(request.scope)[0] == Match.FULL
+        ),
+        None
+    )
+    if route is None:
+        return await call_next(request)
+    # Label with Flask's rule syntax so both serving modes share series
+    route = route.replace('{', '<').replace('}', '>')
+
+    metrics.HTTP_IN_FLIGHT.labels(route).inc()
+    started = time.perf_counter()
+    status = 500
+    timings = hunt_timing.start()
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        response.headers['Server-Timing'] = timings.header()
+        return response
+    finally:
+        metrics.HTTP_LATENCY.labels(request.method, route, str(status)).observe(time.perf_counter() - started)
+        metrics.HTTP_IN_FLIGHT.labels(route).dec()
+
+
+# Declared before the technique route, which would otherwise match "sweep"
+@app.get('/api/hunt/mitre/sweep')
+async def hunt_mitre_sweep(request: Request):
+    time_range = _arg(request, 'time_range', '24h')
+    techniques = _arg(request, 'techniques')
+    technique_ids = [t.strip() for t in techniques.split(',') if t.strip()] if techniques else None
+    result = await async_hunter.hunt_mitre_sweep(time_range, technique_ids)
+    with hunt_timing.phase('serialize'):
+        return JSONResponse(result)
+
+
+@app.get('/api/hunt/mitre/{technique_id}')
+async def hunt_mitre_technique(technique_id: str, request: Request):
+    time_range = _arg(request, 'time_range', '24h')
+    size = _arg(request, 'size', 100, type=int)
+    result = await async_hunter.hunt_mitre_attack(technique_id, time_range, size)
+    with hunt_timing.phase('serialize'):
+        return JSONResponse(result)
+
+
+@app.post('/api/hunt/iocs')
+async def hunt_iocs(request: Request):
+    data = await request.json()
+    iocs = data.get('iocs', [])
+    time_range = data.get('time_range', '24h')
+    batch_size = data.get('batch_size')
+    size = data.get('size', 50)
+
+    result = await async_hunter.hunt_iocs(iocs, time_range, batch_size, size)
+    with hunt_timing.phase('serialize'):
+        return JSONResponse(result)
+
+
+@app.get('/api/hunt/anomalies')
+async def hunt_anomalies(request: Request):
+    time_range = _arg(request, 'time_range', '24h')
+    deadline = _arg(request, 'deadline', type=float)
+    result = await async_hunter.hunt_anomalies(time_range, deadline)
+    with hunt_timing.phase('serialize'):
+        return JSONResponse(result)
+
+
+# Everything else (UI, findings, export, routing, ...) is served by Flask
+app.mount('/', WSGIMiddleware(threat_hunting.app))
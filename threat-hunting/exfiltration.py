@@ -0,0 +1,212 @@
+"""Cumulative outbound-volume hunt for slow-drip exfiltration.
+
+A single-event size rule misses data sent in many small chunks. This hunt
+sums outbound bytes per ``source.ip`` into sub-window buckets, with a
+``moving_fn`` sliding sum over ``sliding`` consecutive buckets. The sliding
+peak is scored against the host's own rolling baseline.
+
+The baseline is an exponentially weighted mean and variance of bytes per
+sub-window, kept in the findings store. Each hunt folds in only the closed
+sub-windows after the host's ``covered_until``, so a call costs one pass over
+the window whatever the baseline's history. Scores use the baseline as it
+stood before the call, so a burst is not measured against itself.
+
+Per-destination sliding sums are fetched in a second search, for the top
+deviators only.
+"""
+import math
+from datetime import datetime, timezone
+
+BASELINE_METRIC = 'outbound_bytes'
+OUTBOUND = [{"term": {"network.direction": "outbound"}}]
+
+
+def _series(interval, sliding, bounds, bytes_field):
+    return {
+        "date_histogram": {
+            "field": "@timestamp",
+            "fixed_interval": interval,
+            "min_doc_count": 0,
+            "extended_bounds": bounds
+        },
+        "aggs": {
+            "bytes": {"sum": {"field": bytes_field}},
+            "sliding": {
+                "moving_fn": {
+                    "buckets_path": "bytes",
+                    "window": sliding,
+                    "shift": 1,  # include the current bucket
+                    "script": "MovingFunctions.sum(values)"
+                }
+            }
+        }
+    }
+
+
+def series_buckets(window, step):
+    """Sub-window buckets in one series, counting the partial ones at either end"""
+    return int(window.span / step) + 2
+
+
+def host_buckets(window, step):
+    """Aggregation buckets one source costs in ``host_series_body``"""
+    return series_buckets(window, step) + 1
+
+
+def destination_buckets(window, step, destinations):
+    """Aggregation buckets one source costs in ``destination_body``"""
+    return 1 + destinations * (series_buckets(window, step) + 1)
+
+
+def histogram_bounds(window):
+    return {"min": int(window.start.timestamp() * 1000), "max": int(window.end.timestamp() * 1000)}
+
+
+def host_series_body(filters, window, interval, sliding, page_size, keyword_suffix, bytes_field):
+    """Outbound bytes per source over sub-windows, one composite bucket per source"""
+    return {
+        "query": {"bool": {"filter": filters + [window.range_clause()]}},
+        "size": 0,
+        "aggs": {
+            "sources": {
+                "composite": {
+                    "size": page_size,
+                    "sources": [{"source_ip": {"terms": {"field": "source.ip" + keyword_suffix}}}]
+                },
+                "aggs": {
+                    "bytes": {"sum": {"field": bytes_field}},
+                    "destinations": {"cardinality": {"field": "destination.ip" + keyword_suffix}},
+                    "series": _series(interval, sliding, histogram_bounds(window), bytes_field),
+                    "peak": {"max_bucket": {"buckets_path": "series>sliding"}}
+                }
+            }
+        }
+    }
+
+
+def destination_body(filters, window, sources, interval, sliding, destinations, keyword_suffix, bytes_field):
+    """Sliding sums per destination for the given sources, largest destinations first"""
+    return {
+        "query": {
+            "bool": {
+                "filter": filters + [
+                    window.range_clause(),
+                    {"terms": {"source.ip" + keyword_suffix: sources}}
+                ]
+            }
+        },
+        "size": 0,
+        "aggs": {
+            "sources": {
+                "terms": {"field": "source.ip" + keyword_suffix, "size": len(sources)},
+                "aggs": {
+                    "destinations": {
+                        "terms": {
+                            "field": "destination.ip" + keyword_suffix,
+                            "size": destinations,
+                            "order": {"bytes": "desc"}
+                        },
+                        "aggs": {
+                            "bytes": {"sum": {"field": bytes_field}},
+                            "series": _series(interval, sliding, histogram_bounds(window), bytes_field),
+                            "peak": {"max_bucket": {"buckets_path": "series>sliding"}}
+                        }
+                    }
+                }
+            }
+        }
+    }
+
+
+def _peak(bucket):
+    peak = bucket['peak']
+    return int(peak.get('value') or 0), (peak.get('keys') or [None])[0]
+
+
+def host_summary(bucket):
+    peak, peak_at = _peak(bucket)
+    return {
+        "source_ip": bucket['key']['source_ip'],
+        "bytes": int(bucket['bytes']['value'] or 0),
+        "connections": bucket['doc_count'],
+        "destinations": bucket['destinations']['value'],
+        "peak_sliding_bytes": peak,
+        "peak_at": peak_at,
+        "series": [[point['key'], int(point['bytes']['value'] or 0)] for point in bucket['series']['buckets']]
+    }
+
+
+def destination_summaries(bucket):
+    summaries = []
+    for destination in bucket['destinations']['buckets']:
+        peak, peak_at = _peak(destination)
+        summaries.append({
+            "destination_ip": destination['key'],
+            "bytes": int(destination['bytes']['value'] or 0),
+            "connections": destination['doc_count'],
+            "peak_sliding_bytes": peak,
+            "peak_at": peak_at
+        })
+    return summaries
+
+
+def closed_points(series, step, window, covered_until):
+    """``(end, bytes)`` of sub-windows wholly inside the window and not yet folded"""
+    points = []
+    for key, value in series:
+        start = datetime.fromtimestamp(key / 1000, timezone.utc)
+        if start + step > window.end:
+            break
+        if start >= window.start and (covered_until is None or start >= covered_until):
+            points.append((start + step, value))
+    return points
+
+
+def fold(baseline, points, alpha):
+    """Fold sub-window byte counts into an exponentially weighted mean and variance"""
+    mean = baseline['mean'] if baseline else None
+    variance = baseline['variance'] if baseline else 0.0
+    samples = baseline['samples'] if baseline else 0
+    for _, value in points:
+        if mean is None:
+            mean = float(value)
+        else:
+            delta = value - mean
+            mean += alpha * delta
+            variance = (1 - alpha) * (variance + alpha * delta * delta)
+        samples += 1
+    return {"mean": mean or 0.0, "variance": variance, "samples": samples}
+
+
+def score(baseline, peak, sliding, min_samples, min_stddev):
+    """Standard deviations of a sliding-sum peak above the baseline, or None while learning"""
+    if not baseline or baseline['samples'] < min_samples:
+        return None
+    expected = baseline['mean'] * sliding
+    stddev = max(math.sqrt(baseline['variance'] * sliding), min_stddev)
+    return round((peak - expected) / stddev, 2) + 0.0  # no -0.0
+
+
+def describe_baseline(baseline, sliding):
+    if not baseline:
+        return None
+    return {
+        "mean_bytes": round(baseline['mean']),
+        "stddev_bytes": round(math.sqrt(baseline['variance'])),
+        "expected_sliding_bytes": round(baseline['mean'] * sliding),
+        "samples": baseline['samples'],
+        "covered_until": baseline['covered_until']
+    }
+
+
+def as_hit(entry):
+    """Findings-store hit for a deviating source"""
+    return {
+        "_index": "",
+        "_id": f"exfiltration:{entry['source_ip']}",
+        "_source": {
+            "@timestamp": entry['peak_at'],
+            "source": {"ip": entry['source_ip']},
+            "exfiltration": {key: value for key, value in entry.items() if key != 'series'}
+        }
+    }
@@ -0,0 +1,469 @@
+"""Local SQLite store for hunt findings and hunt executions.
+
+The hunt scheduler appends every new matching document here and records a
+per-hunt watermark, so interactive hunts can answer the already-covered part
+of a window locally and only ask Elasticsearch for what arrived since.
+
+Interactive hunts are recorded as executions together with the hits they
+returned, so analysts can list, re-open and diff past hunts without
+re-querying Elasticsearch.
+"""
+import json
+import os
+import sqlite3
+import threading
+from datetime import datetime, timezone
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS watermarks (
+    hunt TEXT PRIMARY KEY,
+    timestamp TEXT,
+    coverage_start TEXT NOT NULL,
+    covered_until TEXT NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS findings (
+    hunt TEXT NOT NULL,
+    doc_index TEXT NOT NULL,
+    doc_id TEXT NOT NULL,
+    timestamp TEXT NOT NULL,
+    host TEXT,
+    user TEXT,
+    source TEXT,
+    PRIMARY KEY (hunt, doc_index, doc_id)
+);
+CREATE INDEX IF NOT EXISTS findings_hunt_time ON findings (hunt, timestamp);
+CREATE INDEX IF NOT EXISTS findings_host ON findings (host, timestamp);
+CREATE INDEX IF NOT EXISTS findings_user ON findings (user, timestamp);
+CREATE TABLE IF NOT EXISTS executions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    hunt TEXT NOT NULL,
+    technique TEXT,
+    time_range TEXT,
+    window_start TEXT,
+    window_end TEXT,
+    executed_at TEXT NOT NULL,
+    total INTEGER,
+    params TEXT
+);
+CREATE INDEX IF NOT EXISTS executions_technique ON executions (technique, executed_at);
+CREATE INDEX IF NOT EXISTS executions_hunt ON executions (hunt, executed_at);
+CREATE INDEX IF NOT EXISTS executions_time ON executions (executed_at);
+CREATE TABLE IF NOT EXISTS execution_hits (
+    execution_id INTEGER NOT NULL REFERENCES executions (id) ON DELETE CASCADE,
+    label TEXT NOT NULL DEFAULT '',
+    doc_index TEXT NOT NULL,
+    doc_id TEXT NOT NULL,
+    timestamp TEXT,
+    host TEXT,
+    user TEXT,
+    source TEXT,
+    PRIMARY KEY (execution_id, label, doc_index, doc_id)
+);
+CREATE INDEX IF NOT EXISTS execution_hits_host ON execution_hits (host, execution_id);
+CREATE INDEX IF NOT EXISTS execution_hits_user ON execution_hits (user, execution_id);
+CREATE INDEX IF NOT EXISTS execution_hits_time ON execution_hits (timestamp);
+CREATE TABLE IF NOT EXISTS baselines (
+    metric TEXT NOT NULL,
+    entity TEXT NOT NULL,
+    mean REAL NOT NULL,
+    variance REAL NOT NULL,
+    samples INTEGER NOT NULL,
+    covered_until TEXT NOT NULL,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (metric, entity)
+);
+CREATE TABLE IF NOT EXISTS login_profiles (
+    user TEXT PRIMARY KEY,
+    hours BLOB NOT NULL,
+    updated_at REAL NOT NULL
+);
+"""
+
+# The slice of _source kept per finding: enough to list, attribute and order
+# findings without copying whole events into SQLite
+FINDING_FIELDS = [
+    '@timestamp', 'host.name', 'user.name', 'source.ip', 'destination.ip', 'destination.port',
+    'event.category', 'event.action', 'event.outcome', 'rule.id', 'rule.level', 'rule.description',
+    'process.name', 'file.path', 'url.domain', 'dns.question.name', 'network.bytes',
+    'soc.dns.question_entropy'
+]
+
+# Entities per IN (...) lookup, under SQLite's bound-parameter limit
+_LOOKUP_CHUNK = 500
+
+# SQL expressions producing the same labels as timerange.bucket_label
+_BUCKET_SQL = {
+    'minute': "substr(timestamp, 1, 16)",
+    'hour': "substr(timestamp, 1, 13) || ':00'",
+    'day': "substr(timestamp, 1, 10)"
+}
+
+
+def format_timestamp(timestamp):
+    """Fixed-width UTC form so stored timestamps compare lexicographically"""
+    return timestamp.astimezone(timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.%fZ')
+
+
+def normalize_timestamp(value):
+    if not value:
+        return None
+    try:
+        timestamp = datetime.fromisoformat(str(value))
+    except ValueError:
+        return None
+    if timestamp.tzinfo is None:
+        timestamp = timestamp.replace(tzinfo=timezone.utc)
+    return format_timestamp(timestamp)
+
+
+def parse_timestamp(value):
+    return datetime.fromisoformat(value).astimezone(timezone.utc)
+
+
+def source_field(source, path):
+    """Read a dotted ECS field from either nested or flattened _source"""
+    if path in source:
+        return source[path]
+    value = source
+    for part in path.split('.'):
+        if not isinstance(value, dict) or part not in value:
+            return None
+        value = value[part]
+    return value
+
+
+class FindingsStore:
+    def __init__(self, path):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute("PRAGMA foreign_keys=ON")
+            self._conn.executescript(_SCHEMA)
+            self._conn.commit()
+
+    def get_watermark(self, hunt):
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM watermarks WHERE hunt = ?", (hunt,)).fetchone()
+        return dict(row) if row else None
+
+    def set_watermark(self, hunt, timestamp, coverage_start, covered_until):
+        with self._lock:
+            self._conn.execute(
+                """INSERT INTO watermarks (hunt, timestamp, coverage_start, covered_until, updated_at)
+                   VALUES (?, ?, ?, ?, strftime('%s', 'now'))
+                   ON CONFLICT (hunt) DO UPDATE SET
+                       timestamp = excluded.timestamp,
+                       coverage_start = excluded.coverage_start,
+                       covered_until = excluded.covered_until,
+                       updated_at = excluded.updated_at""",
+                (hunt, timestamp, coverage_start, covered_until)
+            )
+            self._conn.commit()
+
+    def watermarks(self):
+        with self._lock:
+            rows = self._conn.execute("SELECT * FROM watermarks ORDER BY hunt").fetchall()
+        return [dict(row) for row in rows]
+
+    def record_execution(self, hunt, hits, technique=None, time_range=None, window=None,
+                         total=None, params=None):
+        """Record one hunt execution and its hits; returns the execution id.
+
+        ``hits`` is a list of ``(label, hit)`` pairs, where the label names the
+        IOC or sub-hunt that produced the hit ('' when there is only one).
+        """
+        executed_at = format_timestamp(datetime.now(timezone.utc))
+        rows = []
+        for label, hit in hits:
+            source = hit.get('_source', {})
+            rows.append((
+                label or '',
+                hit.get('_index', ''),
+                hit.get('_id', ''),
+                normalize_timestamp(source_field(source, '@timestamp')),
+                source_field(source, 'host.name'),
+                source_field(source, 'user.name'),
+                json.dumps(source)
+            ))
+        with self._lock:
+            cursor = self._conn.execute(
+                """INSERT INTO executions (hunt, technique, time_range, window_start, window_end,
+                                           executed_at, total, params)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?)""",
+                (
+                    hunt,
+                    technique,
+                    time_range,
+                    format_timestamp(window.start) if window else None,
+                    format_timestamp(window.end) if window else None,
+                    executed_at,
+                    total if total is not None else len(rows),
+                    json.dumps(params) if params else None
+                )
+            )
+            execution_id = cursor.lastrowid
+            self._conn.executemany(
+                """INSERT OR IGNORE INTO execution_hits
+                       (execution_id, label, doc_index, doc_id, timestamp, host, user, source)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?)""",
+                [(execution_id,) + row for row in rows]
+            )
+            self._conn.commit()
+        return execution_id
+
+    def list_executions(self, hunt=None, technique=None, host=None, user=None,
+                        since=None, until=None, limit=50):
+        """Newest executions first, optionally filtered by what they hit"""
+        clauses, params = [], []
+        if hunt:
+            clauses.append("e.hunt = ?")
+            params.append(hunt)
+        if technique:
+            clauses.append("e.technique = ?")
+            params.append(technique)
+        if since:
+            clauses.append("e.executed_at >= ?")
+            params.append(format_timestamp(since))
+        if until:
+            clauses.append("e.executed_at < ?")
+            params.append(format_timestamp(until))
+        for column, value in (('host', host), ('user', user)):
+            if value:
+                clauses.append(
+                    f"e.id IN (SELECT execution_id FROM execution_hits WHERE {column} = ?)"
+                )
+                params.append(value)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        with self._lock:
+            rows = self._conn.execute(
+                f"""SELECT e.*, (SELECT COUNT(*) FROM execution_hits h WHERE h.execution_id = e.id) AS stored_hits
+                    FROM executions e {where} ORDER BY e.executed_at DESC, e.id DESC LIMIT ?""",
+                params + [limit]
+            ).fetchall()
+        return [self._execution(row) for row in rows]
+
+    def get_execution(self, execution_id, include_source=True):
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM executions WHERE id = ?", (execution_id,)).fetchone()
+            if not row:
+                return None
+            hits = self._conn.execute(
+                "SELECT * FROM execution_hits WHERE execution_id = ? ORDER BY timestamp DESC",
+                (execution_id,)
+            ).fetchall()
+        execution = self._execution(row)
+        execution['hits'] = [
+            {
+                "label": hit['label'],
+                "_index": hit['doc_index'],
+                "_id": hit['doc_id'],
+                "timestamp": hit['timestamp'],
+                "host": hit['host'],
+                "user": hit['user'],
+                **({"_source": json.loads(hit['source'])} if include_source and hit['source'] else {})
+            }
+            for hit in hits
+        ]
+        return execution
+
+    def diff_executions(self, base_id, target_id):
+        """What a later execution found that an earlier one did not, and vice versa"""
+        base = self.get_execution(base_id, include_source=False)
+        target = self.get_execution(target_id, include_source=False)
+        if not base or not target:
+            return None
+
+        def keyed(execution):
+            return {(hit['label'], hit['_index'], hit['_id']): hit for hit in execution.pop('hits')}
+
+        def values(hits, field):
+            return {hit[field] for hit in hits.values() if hit[field]}
+
+        base_hits, target_hits = keyed(base), keyed(target)
+        return {
+            "base": base,
+            "target": target,
+            "added": [target_hits[key] for key in target_hits.keys() - base_hits.keys()],
+            "removed": [base_hits[key] for key in base_hits.keys() - target_hits.keys()],
+            "unchanged": len(base_hits.keys() & target_hits.keys()),
+            "hosts": {
+                "added": sorted(values(target_hits, 'host') - values(base_hits, 'host')),
+                "removed": sorted(values(base_hits, 'host') - values(target_hits, 'host'))
+            },
+            "users": {
+                "added": sorted(values(target_hits, 'user') - values(base_hits, 'user')),
+                "removed": sorted(values(base_hits, 'user') - values(target_hits, 'user'))
+            }
+        }
+
+    def _execution(self, row):
+        execution = dict(row)
+        execution['params'] = json.loads(execution['params']) if execution['params'] else None
+        return execution
+
+    def add_findings(self, hunt, hits):
+        """Append hits for a hunt, ignoring documents already stored"""
+        rows = []
+        for hit in hits:
+            source = hit.get('_source', {})
+            timestamp = normalize_timestamp(source_field(source, '@timestamp'))
+            if not timestamp:
+                continue
+            rows.append((
+                hunt,
+                hit['_index'],
+                hit['_id'],
+                timestamp,
+                source_field(source, 'host.name'),
+                source_field(source, 'user.name'),
+                json.dumps(source)
+            ))
+        with self._lock:
+            before = self._conn.total_changes
+            self._conn.executemany(
+                """INSERT OR IGNORE INTO findings (hunt, doc_index, doc_id, timestamp, host, user, source)
+                   VALUES (?, ?, ?, ?, ?, ?, ?)""",
+                rows
+            )
+            self._conn.commit()
+            return self._conn.total_changes - before
+
+    def summarize(self, hunt, start, end, interval, size=100, top=10, order_field=None):
+        """Counts, timeline, top hosts/users and newest hits for [start, end);
+        ``order_field`` returns the hits with the highest value of that
+        _source field instead"""
+        bounds = (hunt, format_timestamp(start), format_timestamp(end))
+        order, order_params = "timestamp DESC", ()
+        if order_field:
+            # Nested or flattened _source; missing values sort last
+            order = "COALESCE(json_extract(source, ?), json_extract(source, ?)) DESC, timestamp DESC"
+            order_params = (f"$.{order_field}", f'$."{order_field}"')
+        where = "hunt = ? AND timestamp >= ? AND timestamp < ?"
+        with self._lock:
+            total = self._conn.execute(f"SELECT COUNT(*) FROM findings WHERE {where}", bounds).fetchone()[0]
+            timeline = self._conn.execute(
+                f"SELECT {_BUCKET_SQL[interval]} AS bucket, COUNT(*) AS count FROM findings "
+                f"WHERE {where} GROUP BY bucket",
+                bounds
+            ).fetchall()
+            terms = {}
+            for column in ('host', 'user'):
+                terms[column] = self._conn.execute(
+                    f"SELECT {column} AS key, COUNT(*) AS count FROM findings "
+                    f"WHERE {where} AND {column} IS NOT NULL "
+                    f"GROUP BY {column} ORDER BY count DESC LIMIT ?",
+                    bounds + (top,)
+                ).fetchall()
+            hits = self._conn.execute(
+                f"SELECT doc_index, doc_id, source FROM findings WHERE {where} "
+                f"ORDER BY {order} LIMIT ?",
+                bounds + order_params + (size,)
+            ).fetchall() if size else []
+
+        return {
+            "total": total,
+            "timeline": {row['bucket']: row['count'] for row in timeline},
+            "hosts": {row['key']: row['count'] for row in terms['host']},
+            "users": {row['key']: row['count'] for row in terms['user']},
+            "hits": [
+                {"_index": row['doc_index'], "_id": row['doc_id'], "_source": json.loads(row['source'])}
+                for row in hits
+            ]
+        }
+
+    def get_baselines(self, metric, entities):
+        """Stored baselines of ``metric`` for the given entities, by entity"""
+        entities = list(entities)
+        baselines = {}
+        with self._lock:
+            for i in range(0, len(entities), _LOOKUP_CHUNK):
+                chunk = entities[i:i + _LOOKUP_CHUNK]
+                rows = self._conn.execute(
+                    f"""SELECT entity, mean, variance, samples, covered_until FROM baselines
+                        WHERE metric = ? AND entity IN ({', '.join('?' * len(chunk))})""",
+                    [metric] + chunk
+                ).fetchall()
+                baselines.update((row['entity'], dict(row)) for row in rows)
+        return baselines
+
+    def set_baselines(self, metric, baselines):
+        """Store updated baselines by entity.
+
+        An update only applies when it moves ``covered_until`` forward, so two
+        hunts folding the same sub-windows concurrently cannot count them twice.
+        """
+        with self._lock:
+            self._conn.executemany(
+                """INSERT INTO baselines (metric, entity, mean, variance, samples, covered_until, updated_at)
+                   VALUES (?, ?, ?, ?, ?, ?, strftime('%s', 'now'))
+                   ON CONFLICT (metric, entity) DO UPDATE SET
+                       mean = excluded.mean,
+                       variance = excluded.variance,
+                       samples = excluded.samples,
+                       covered_until = excluded.covered_until,
+                       updated_at = excluded.updated_at
+                   WHERE excluded.covered_until > baselines.covered_until""",
+                [
+                    (metric, entity, baseline['mean'], baseline['variance'], baseline['samples'],
+                     format_timestamp(baseline['covered_until']))
+                    for entity, baseline in baselines.items()
+                ]
+            )
+            self._conn.commit()
+
+    def login_profiles(self):
+        """Every stored ``(user, packed hour-of-week counters)`` row"""
+        with self._lock:
+            return self._conn.execute("SELECT user, hours FROM login_profiles").fetchall()
+
+    def save_login_profiles(self, rows, coverage_start, covered_until):
+        """Store updated profile rows and advance the ``login_profiles``
+        watermark in one transaction, so no interval is counted twice"""
+        with self._lock:
+            self._conn.executemany(
+                """INSERT INTO login_profiles (user, hours, updated_at)
+                   VALUES (?, ?, strftime('%s', 'now'))
+                   ON CONFLICT (user) DO UPDATE SET
+                       hours = excluded.hours,
+                       updated_at = excluded.updated_at""",
+                rows
+            )
+            self._conn.execute(
+                """INSERT INTO watermarks (hunt, timestamp, coverage_start, covered_until, updated_at)
+                   VALUES ('login_profiles', NULL, ?, ?, strftime('%s', 'now'))
+                   ON CONFLICT (hunt) DO UPDATE SET
+                       covered_until = excluded.covered_until,
+                       updated_at = excluded.updated_at""",
+                (format_timestamp(coverage_start), format_timestamp(covered_until))
+            )
+            self._conn.commit()
+
+    def prune(self, before):
+        """Drop findings and executions older than before.
+
+        Only hunts that actually lose findings have their coverage start moved
+        forward; other watermarks (login_profiles, hunts with nothing stored
+        that far back) still cover what they did.
+        """
+        cutoff = format_timestamp(before)
+        with self._lock:
+            self._conn.execute(
+                """UPDATE watermarks SET coverage_start = ?
+                   WHERE coverage_start < ? AND EXISTS (
+                       SELECT 1 FROM findings
+                       WHERE findings.hunt = watermarks.hunt AND findings.timestamp < ?
+                   )""",
+                (cutoff, cutoff, cutoff)
+            )
+            self._conn.execute("DELETE FROM findings WHERE timestamp < ?", (cutoff,))
+            # execution_hits go with their executions (ON DELETE CASCADE)
+            self._conn.execute("DELETE FROM executions WHERE executed_at < ?", (cutoff,))
+            self._conn.commit()
@@ -0,0 +1,175 @@
+"""In-process result cache for repeated hunts.
+
+Entries expire after a TTL, the least recently used entries are evicted once
+either the entry count or the approximate memory cap is exceeded, and
+concurrent requests for the same key share a single execution.
+"""
+import asyncio
+import json
+import threading
+import time
+from collections import OrderedDict
+
+
+class _Pending:
+    """A computation other requests for the same key can wait on"""
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class HuntCache:
+    def __init__(self, ttl=60, max_entries=256, max_bytes=64 * 1024 * 1024):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # key -> (expires_at, size, value)
+        self._pending = {}
+        self._async_pending = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+
+    def get_or_compute(self, key, compute, cacheable=None):
+        """Return the cached value for key, running compute() on a miss.
+
+        Callers that arrive while the same key is being computed wait for
+        that execution instead of starting their own. Values rejected by
+        ``cacheable`` are handed to the waiting callers but not stored.
+        """
+        owner = False
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[2]
+            if entry:
+                self._discard(key)
+
+            pending = self._pending.get(key)
+            if pending:
+                self.coalesced += 1
+            else:
+                self.misses += 1
+                pending = self._pending[key] = _Pending()
+                owner = True
+
+        if not owner:
+            pending.event.wait()
+            if pending.error:
+                raise pending.error
+            return pending.value
+
+        try:
+            pending.value = compute()
+        except Exception as e:
+            pending.error = e
+            raise
+        finally:
+            # Serialize outside the lock so a large result never stalls other lookups
+            size = None
+            if pending.error is None and (cacheable is None or cacheable(pending.value)):
+                size = self._size(pending.value)
+            with self._lock:
+                del self._pending[key]
+                if size is not None:
+                    self._store(key, pending.value, size)
+            pending.event.set()
+        return pending.value
+
+    async def aget_or_compute(self, key, compute, cacheable=None):
+        """Coroutine counterpart of get_or_compute for the ASGI app.
+
+        ``compute`` is a coroutine function. Waiting callers share one
+        asyncio future instead of blocking a thread on an event.
+        """
+        owner = False
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[2]
+            if entry:
+                self._discard(key)
+
+            pending = self._async_pending.get(key)
+            if pending:
+                self.coalesced += 1
+            else:
+                self.misses += 1
+                pending = self._async_pending[key] = asyncio.get_running_loop().create_future()
+                owner = True
+
+        if not owner:
+            # Shield so one cancelled waiter does not cancel the shared result
+            return await asyncio.shield(pending)
+
+        try:
+            value = await compute()
+        except BaseException as e:
+            with self._lock:
+                del self._async_pending[key]
+            if isinstance(e, asyncio.CancelledError):
+                pending.cancel()
+            else:
+                pending.set_exception(e)
+                # Only the waiters need to see it; don't warn when there are none
+                pending.exception()
+            raise
+
+        size = self._size(value) if cacheable is None or cacheable(value) else None
+        with self._lock:
+            del self._async_pending[key]
+            if size is not None:
+                self._store(key, value, size)
+        pending.set_result(value)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses + self.coalesced
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "coalesced": self.coalesced,
+                "evictions": self.evictions,
+                "hit_ratio": round((self.hits + self.coalesced) / lookups, 4) if lookups else 0.0
+            }
+
+    @staticmethod
+    def _size(value):
+        """Approximate memory footprint of a value"""
+        return len(json.dumps(value, default=str))
+
+    def _store(self, key, value, size):
+        if size > self.max_bytes:
+            return
+        if key in self._entries:
+            self._discard(key)
+        self._entries[key] = (time.monotonic() + self.ttl, size, value)
+        self._bytes += size
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            oldest = next(iter(self._entries))
+            self._discard(oldest)
+            self.evictions += 1
+
+    def _discard(self, key):
+        _, size, _ = self._entries.pop(key)
+        self._bytes -= size
@@ -0,0 +1,160 @@
+"""Per-request hunt timings and the slow-hunt log.
+
+Hunts add phases (time range parsing, query building, Elasticsearch
+``took``, transfer, shaping, recording, JSON serialisation) to the timings
+of the current request, which the app returns as a ``Server-Timing``
+header. The timings live in a context variable, so they follow the request
+into ``asyncio.to_thread`` and into pool threads started with
+``contextvars.copy_context().run``.
+
+Searches slower than the threshold are re-run once in the background with
+``"profile": true``, and the profile is appended to a rotating JSON-lines
+log together with the compiled request.
+"""
+import contextvars
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from logging.handlers import RotatingFileHandler
+
+_current = contextvars.ContextVar('hunt_timings', default=None)
+
+
+class Timings:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.phases = {}  # name -> [milliseconds, description]
+        self._lock = threading.Lock()
+
+    def add(self, name, ms, description=None):
+        # Repeated phases (one per msearch batch, say) accumulate
+        with self._lock:
+            phase = self.phases.setdefault(name, [0.0, description])
+            phase[0] += ms
+            if description:
+                phase[1] = description
+
+    def elapsed_ms(self):
+        return (time.perf_counter() - self.started) * 1000
+
+    def header(self):
+        with self._lock:
+            phases = list(self.phases.items())
+        parts = []
+        for name, (ms, description) in phases + [('total', [self.elapsed_ms(), None])]:
+            part = f"{name};dur={ms:.1f}"
+            if description:
+                part += f';desc="{description}"'
+            parts.append(part)
+        return ', '.join(parts)
+
+
+def start():
+    """Begin collecting timings for the current request"""
+    timings = Timings()
+    _current.set(timings)
+    return timings
+
+
+def current():
+    return _current.get()
+
+
+def add(name, ms, description=None):
+    timings = _current.get()
+    if timings:
+        timings.add(name, ms, description)
+
+
+@contextmanager
+def phase(name, description=None):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        add(name, (time.perf_counter() - started) * 1000, description)
+
+
+def record_es(started, result, label=None):
+    """Split an Elasticsearch call into ES-reported ``took`` and the rest
+    (queueing, network, deserialisation); returns the wall time in ms"""
+    wall = (time.perf_counter() - started) * 1000
+    suffix = f"-{label}" if label else ''
+    took = result['took'] if result is not None and 'took' in result else None
+    if took is None:
+        add(f"es{suffix}", wall, "Elasticsearch round trip")
+    else:
+        add(f"es{suffix}", took, "Elasticsearch took")
+        add(f"transfer{suffix}", max(wall - took, 0), "Queueing, network and parsing")
+    return wall
+
+
+class SlowHuntLog:
+    def __init__(self, path, threshold_ms=2000, max_bytes=10 * 1024 * 1024, backups=5, cooldown=300):
+        self.path = path
+        self.threshold_ms = threshold_ms
+        self.cooldown = cooldown
+        self.captured = 0
+        self._last_capture = {}
+        self._lock = threading.Lock()
+        # One worker: profiling is diagnostic and must not compete with hunts
+        self._pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix='slow-hunt')
+        self._logger = None
+        if threshold_ms > 0:
+            os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+            handler = RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backups)
+            handler.setFormatter(logging.Formatter('%(message)s'))
+            self._logger = logging.getLogger(f"slow_hunts.{path}")
+            self._logger.setLevel(logging.INFO)
+            self._logger.propagate = False
+            self._logger.addHandler(handler)
+
+    def maybe_capture(self, hunt, elapsed_ms, request, rerun):
+        """Queue a profiled re-run of a search that took longer than the threshold.
+
+        ``request`` is the compiled search as sent and ``rerun()`` performs it
+        again with profiling enabled, returning the profile. Each hunt is
+        profiled at most once per cooldown period.
+        """
+        if not self._logger or elapsed_ms < self.threshold_ms:
+            return False
+        now = time.monotonic()
+        with self._lock:
+            if now - self._last_capture.get(hunt, -self.cooldown) < self.cooldown:
+                return False
+            self._last_capture[hunt] = now
+
+        timings = current()
+        phases = {name: round(ms, 1) for name, (ms, _) in timings.phases.items()} if timings else None
+        self._pool.submit(self._capture, hunt, elapsed_ms, request, rerun, phases)
+        return True
+
+    def _capture(self, hunt, elapsed_ms, request, rerun, phases):
+        started = time.perf_counter()
+        try:
+            profile = rerun()
+        except Exception as e:
+            profile = {"error": str(e)}
+        self._logger.info(json.dumps({
+            "@timestamp": datetime.now(timezone.utc).isoformat(),
+            "hunt": hunt,
+            "elapsed_ms": round(elapsed_ms, 1),
+            "profiled_ms": round((time.perf_counter() - started) * 1000, 1),
+            "timings": phases,
+            "request": request,
+            "profile": profile
+        }, default=str))
+        self.captured += 1
+
+    def status(self):
+        return {
+            "path": self.path,
+            "threshold_ms": self.threshold_ms,
+            "cooldown": self.cooldown,
+            "captured": self.captured
+        }
@@ -0,0 +1,135 @@
+"""Index routing for hunts.
+
+Every hunt used to search ``index="*"``, fanning out to every shard in the
+cluster including Kibana, TheHive and monitoring indices. The router keeps,
+for each hunt key (a technique, an IOC type or an anomaly hunt), the index
+patterns that actually map the fields the hunt filters on. Routes are
+discovered with ``_field_caps`` and refreshed in the background; seeded
+routes cover the time before the first refresh and any key discovery finds
+nothing for.
+"""
+import re
+import threading
+import time
+
+# Concrete index names are collapsed back to the patterns they were written by
+_DATA_STREAM_BACKING = re.compile(r'^\.ds-(?P<name>.+)-\d{4}\.\d{2}\.\d{2}-\d{6}$')
+_DATED_SUFFIX = re.compile(r'-\d{4}\.\d{2}(?:\.\d{2})?(?:-\d{6})?$|-\d{6}$')
+
+_FIELD_REFERENCE = re.compile(r'([A-Za-z_@][\w.@-]*)\s*:')
+
+
+def query_fields(query):
+    """Field names referenced by a Lucene query_string"""
+    return list(dict.fromkeys(_FIELD_REFERENCE.findall(query)))
+
+
+def collapse_index(index):
+    """Map a concrete index to the pattern or data stream it belongs to"""
+    match = _DATA_STREAM_BACKING.match(index)
+    if match:
+        return match.group('name')
+    if _DATED_SUFFIX.search(index):
+        return _DATED_SUFFIX.sub('-*', index)
+    return index
+
+
+class IndexRouter:
+    def __init__(self, es, candidates, fallback='*', refresh_interval=300):
+        self.es = es
+        self.candidates = candidates
+        self.fallback = fallback
+        self.refresh_interval = refresh_interval
+        self._keys = {}  # key -> (fields, match)
+        self._seeds = {}
+        self._routes = {}
+        self._lock = threading.Lock()
+        self._thread = None
+        self.last_refresh = None
+        self.last_error = None
+
+    def register(self, key, fields, match='all', seed=None):
+        """Route ``key`` to indices that map all (or any) of ``fields``"""
+        with self._lock:
+            self._keys[key] = (list(fields), match)
+            if seed:
+                self._seeds[key] = list(seed)
+
+    def indices(self, *keys):
+        """Index patterns to search for the union of the given keys"""
+        with self._lock:
+            patterns = []
+            for key in keys:
+                patterns.extend(self._routes.get(key) or self._seeds.get(key) or [self.fallback])
+        if self.fallback in patterns:
+            return [self.fallback]
+        return list(dict.fromkeys(patterns))
+
+    def refresh(self):
+        """Re-resolve every registered key from _field_caps"""
+        with self._lock:
+            keys = dict(self._keys)
+
+        fields = sorted({field for key_fields, _ in keys.values() for field in key_fields})
+        if not fields:
+            return
+
+        try:
+            caps = self.es.field_caps(
+                index=self.candidates,
+                fields=fields,
+                include_unmapped=True,
+                ignore_unavailable=True,
+                allow_no_indices=True
+            )
+        except Exception as e:
+            self.last_error = str(e)
+            print(f"Index routing refresh failed: {e}")
+            return
+
+        all_indices = set(caps['indices'])
+        mapped = {}
+        for field in fields:
+            unmapped = set()
+            for field_type, details in caps['fields'].get(field, {'unmapped': {}}).items():
+                if field_type == 'unmapped':
+                    unmapped.update(details.get('indices') or all_indices)
+            mapped[field] = all_indices - unmapped
+
+        routes = {}
+        for key, (key_fields, match) in keys.items():
+            sets = [mapped[field] for field in key_fields]
+            if not sets:
+                continue
+            indices = set.intersection(*sets) if match == 'all' else set.union(*sets)
+            if indices:
+                routes[key] = sorted({collapse_index(index) for index in indices})
+
+        with self._lock:
+            self._routes = routes
+        self.last_refresh = time.time()
+        self.last_error = None
+
+    def start(self):
+        """Refresh now and then every refresh_interval seconds in the background"""
+        if self._thread:
+            return
+        self._thread = threading.Thread(target=self._run, name='index-router', daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            self.refresh()
+            time.sleep(self.refresh_interval)
+
+    def describe(self):
+        with self._lock:
+            return {
+                "routes": {
+                    ':'.join(key): self._routes.get(key) or self._seeds.get(key) or [self.fallback]
+                    for key in self._keys
+                },
+                "discovered": sorted(':'.join(key) for key in self._routes),
+                "last_refresh": self.last_refresh,
+                "last_error": self.last_error
+            }
@@ -0,0 +1,92 @@
+"""Bulk IOC classification for the threat hunting service.
+
+Indicators are refanged (``hxxp://``, ``1.2.3[.]4``, ``user[at]example.com``)
+and then dispatched on cheap string properties - length, separators and
+character set - so at most one precompiled pattern runs per indicator.
+"""
+import re
+
+# IOC patterns
+IOC_PATTERNS = {
+    'ip': r'^(?:(?:25[0-5]|2[0-4][0-9]|[01]?[0-9][0-9]?)\.){3}(?:25[0-5]|2[0-4][0-9]|[01]?[0-9][0-9]?)$',
+    'domain': r'^(?:[a-zA-Z0-9](?:[a-zA-Z0-9-]{0,61}[a-zA-Z0-9])?\.)+[a-zA-Z]{2,}$',
+    'md5': r'^[a-fA-F0-9]{32}$',
+    'sha1': r'^[a-fA-F0-9]{40}$',
+    'sha256': r'^[a-fA-F0-9]{64}$',
+    'email': r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$',
+    'url': r'^https?://[^\s/$.?#].[^\s]*$'
+}
+
+_COMPILED = {ioc_type: re.compile(pattern) for ioc_type, pattern in IOC_PATTERNS.items()}
+_IP = _COMPILED['ip'].match
+_DOMAIN = _COMPILED['domain'].match
+_EMAIL = _COMPILED['email'].match
+_URL = _COMPILED['url'].match
+_HEX = re.compile(r'[a-fA-F0-9]+').fullmatch
+_HASH_LENGTHS = {32: 'md5', 40: 'sha1', 64: 'sha256'}
+
+# Common defanging conventions, applied only when a marker character is present
+_DEFANG_HINT = re.compile(r'[\[\(\{]|^(?:h[xX]{2}p|fxp)', re.IGNORECASE).search
+_DEFANG_SUBS = [
+    (re.compile(r'^h[xX]{2}p(s?)', re.IGNORECASE), lambda match: 'http' + match.group(1).lower()),
+    (re.compile(r'^fxp', re.IGNORECASE), 'ftp'),
+    (re.compile(r'[\[\(\{](?:\.|dot)[\]\)\}]', re.IGNORECASE), '.'),
+    (re.compile(r'[\[\(\{](?:@|at)[\]\)\}]', re.IGNORECASE), '@'),
+    (re.compile(r'[\[\(\{]:[\]\)\}]'), ':'),
+    (re.compile(r'[\[\(\{]/[\]\)\}]'), '/'),
+    (re.compile(r'\[(://)\]'), r'\1'),
+]
+
+
+def refang(ioc):
+    """Undo common defanging so an indicator can be matched against events"""
+    ioc = ioc.strip()
+    if not _DEFANG_HINT(ioc):
+        return ioc
+    for pattern, replacement in _DEFANG_SUBS:
+        ioc = pattern.sub(replacement, ioc)
+    return ioc
+
+
+def classify(ioc):
+    """Return the IOC type of a single (possibly defanged) indicator"""
+    return _classify(refang(ioc))
+
+
+def _classify(value):
+    length = len(value)
+    if not length or length > 2048:
+        return 'unknown'
+
+    if '://' in value:
+        return 'url' if _URL(value) else 'unknown'
+    if '@' in value:
+        return 'email' if _EMAIL(value) else 'unknown'
+
+    dots = value.count('.')
+    if not dots:
+        ioc_type = _HASH_LENGTHS.get(length)
+        if ioc_type and _HEX(value):
+            return ioc_type
+        return 'unknown'
+
+    if dots == 3 and length <= 15 and value[0].isdigit() and value[-1].isdigit():
+        if _IP(value):
+            return 'ip'
+    if length <= 253 and _DOMAIN(value):
+        return 'domain'
+    return 'unknown'
+
+
+def classify_many(iocs):
+    """Classify a batch of indicators.
+
+    Returns ``(ioc, normalized, type)`` tuples in input order, where
+    ``normalized`` is the refanged value that hunts should search for.
+    """
+    results = []
+    append = results.append
+    for ioc in iocs:
+        normalized = refang(ioc)
+        append((ioc, normalized, _classify(normalized)))
+    return results
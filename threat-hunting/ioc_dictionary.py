@@ -0,0 +1,186 @@
+"""Indicator dictionary for ingest-time IOC tagging.
+
+Logstash tags events as they stream in (``logstash/ioc_tagger.rb``). The
+filter looks every event's IPs, domains, hashes, URLs and email addresses up
+in an in-memory hash loaded from this dictionary, a JSON object mapping each
+normalised indicator to its ECS ``threat.indicator.type``. It re-reads the
+file when it changes, so updating it never restarts the pipeline. Matching
+events get ``threat.indicator.*``, ``soc.ioc.field`` and the ``ioc_match``
+tag.
+
+This module builds the dictionary from MISP attribute exports, the MISP API
+or plain indicator lists. Indicators are refanged and lower-cased where
+matching is case-insensitive. Only indicators new to the dictionary need a
+retro-hunt over data indexed before they were known; ``--retro-hunt`` sends
+just those to the IOC hunt for a bounded window.
+
+    python ioc_dictionary.py --misp-export misp.json --input extra.txt \\
+        --output /usr/share/logstash/ioc/indicators.json --retro-hunt http://localhost:7777
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+
+import requests
+
+from ioc_classifier import classify_many
+
+IOC_DICTIONARY_PATH = os.getenv(
+    'IOC_DICTIONARY_PATH',
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'configs', 'ioc-indicators.json')
+)
+IOC_RETRO_HUNT_RANGE = os.getenv('IOC_RETRO_HUNT_RANGE', '7d')
+
+# Classifier type -> ECS threat.indicator.type
+INDICATOR_TYPES = {
+    'ip': 'ipv4-addr',
+    'domain': 'domain-name',
+    'md5': 'file',
+    'sha1': 'file',
+    'sha256': 'file',
+    'email': 'email-addr',
+    'url': 'url'
+}
+# URLs keep their case; Logstash lower-cases the other event values before lookup
+CASE_SENSITIVE = {'url'}
+
+# MISP attribute types worth matching; composite "a|b" types contribute the
+# parts that are not a filename or port
+MISP_SKIPPED_PARTS = {'filename', 'port'}
+MISP_TYPES = {
+    'ip-src', 'ip-dst', 'ip-src|port', 'ip-dst|port', 'domain', 'hostname', 'domain|ip',
+    'md5', 'sha1', 'sha256', 'filename|md5', 'filename|sha1', 'filename|sha256',
+    'url', 'uri', 'link', 'email', 'email-src', 'email-dst'
+}
+
+
+def misp_values(export, ids_only=True):
+    """Indicator values from a MISP JSON export (events or attribute restSearch)"""
+    values = []
+    stack = [export]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, list):
+            stack.extend(node)
+        elif isinstance(node, dict):
+            if 'type' in node and 'value' in node and not isinstance(node['value'], (dict, list)):
+                if node['type'] in MISP_TYPES and (node.get('to_ids', True) or not ids_only):
+                    values.extend(
+                        part for part_type, part in zip(node['type'].split('|'), str(node['value']).split('|'))
+                        if part and part_type not in MISP_SKIPPED_PARTS
+                    )
+                continue
+            stack.extend(value for value in node.values() if isinstance(value, (dict, list)))
+    return values
+
+
+def fetch_misp(url, key, ids_only=True, verify=True, timeout=120):
+    response = requests.post(
+        f"{url.rstrip('/')}/attributes/restSearch",
+        headers={"Authorization": key, "Accept": "application/json", "Content-Type": "application/json"},
+        json={"returnFormat": "json", "type": sorted(MISP_TYPES), **({"to_ids": True} if ids_only else {})},
+        verify=verify,
+        timeout=timeout
+    )
+    response.raise_for_status()
+    return misp_values(response.json(), ids_only)
+
+
+def text_values(path):
+    """One indicator per line; blank lines and # comments are skipped"""
+    with open(path) as f:
+        return [line.strip() for line in f if line.strip() and not line.lstrip().startswith('#')]
+
+
+def build(values):
+    """``{indicator: threat.indicator.type}`` for every classifiable value"""
+    dictionary = {}
+    for _, normalized, ioc_type in classify_many(values):
+        indicator_type = INDICATOR_TYPES.get(ioc_type)
+        if indicator_type:
+            dictionary[normalized if ioc_type in CASE_SENSITIVE else normalized.lower()] = indicator_type
+    return dictionary
+
+
+def load(path=IOC_DICTIONARY_PATH):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def write(dictionary, path=IOC_DICTIONARY_PATH):
+    """Replace the dictionary atomically so Logstash never reads a partial file"""
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    with tempfile.NamedTemporaryFile('w', dir=directory, delete=False, suffix='.tmp') as f:
+        json.dump(dictionary, f, sort_keys=True, separators=(',', ':'))
+    os.chmod(f.name, 0o644)
+    os.replace(f.name, path)
+
+
+def retro_hunt(url, indicators, time_range=IOC_RETRO_HUNT_RANGE, timeout=300):
+    """Hunt newly added indicators over the bounded window the tags cannot cover"""
+    response = requests.post(
+        f"{url.rstrip('/')}/api/hunt/iocs",
+        json={"iocs": indicators, "time_range": time_range},
+        timeout=timeout
+    )
+    response.raise_for_status()
+    return response.json()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the Logstash IOC tagging dictionary")
+    parser.add_argument('--misp-export', action='append', default=[], help='MISP JSON export file')
+    parser.add_argument('--misp-url', help='fetch IDS attributes from this MISP instance')
+    parser.add_argument('--misp-key', default=os.getenv('MISP_API_KEY'))
+    parser.add_argument('--misp-insecure', action='store_true', help='skip MISP TLS verification')
+    parser.add_argument('--all-attributes', action='store_true', help='include attributes without to_ids')
+    parser.add_argument('--input', action='append', default=[], help='plain indicator list, one per line')
+    parser.add_argument('--output', default=IOC_DICTIONARY_PATH)
+    parser.add_argument('--retro-hunt', metavar='URL', help='threat-hunting URL to retro-hunt new indicators on')
+    parser.add_argument('--retro-range', default=IOC_RETRO_HUNT_RANGE)
+    args = parser.parse_args()
+
+    ids_only = not args.all_attributes
+    values = []
+    for path in args.misp_export:
+        with open(path) as f:
+            values.extend(misp_values(json.load(f), ids_only))
+    if args.misp_url:
+        if not args.misp_key:
+            parser.error('--misp-url needs --misp-key or MISP_API_KEY')
+        values.extend(fetch_misp(args.misp_url, args.misp_key, ids_only, verify=not args.misp_insecure))
+    for path in args.input:
+        values.extend(text_values(path))
+    if not values:
+        parser.error('no indicators: pass --misp-export, --misp-url or --input')
+
+    previous = load(args.output)
+    dictionary = build(values)
+    added = sorted(dictionary.keys() - previous.keys())
+    removed = len(previous.keys() - dictionary.keys())
+    write(dictionary, args.output)
+    print(f"{len(dictionary)} indicators ({len(added)} added, {removed} removed) written to {args.output}",
+          file=sys.stderr)
+
+    if args.retro_hunt and added:
+        result = retro_hunt(args.retro_hunt, added, args.retro_range)
+        if 'error' in result:
+            sys.exit(f"Retro-hunt failed: {result['error']}")
+        print(json.dumps({
+            "time_range": args.retro_range,
+            "indicators": len(added),
+            "matches": {
+                ioc: outcome['matches'] for ioc, outcome in result.items()
+                if isinstance(outcome, dict) and outcome.get('matches')
+            }
+        }))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,137 @@
+"""Aggregation-based lateral movement hunt.
+
+Remote-execution events (``psexec``, ``wmic``, ``net``, ``ssh``...) are
+grouped per ``user.name`` x originating ``host.name`` with a composite
+aggregation, so Elasticsearch returns one summary per mover rather than raw
+events. The remote host is read from a destination field
+(``destination.address`` by default). For each mover it reports:
+
+- the distinct destinations reached in the hunt window, and the peak of that
+  fan-out on any single day;
+- the typical daily fan-out over a baseline period just before the window;
+- destinations first contacted inside the window (first-seen edges).
+
+A ``bucket_selector`` keeps only movers whose peak daily fan-out reaches
+``min_fanout`` and ``min_ratio`` times their baseline; movers without a
+baseline count as a baseline of one. The caller ranks the survivors by that
+ratio, so users whose fan-out jumped lead the list.
+"""
+
+
+def search_body(filters, window, baseline_start, destination_field, page_size, keyword_suffix,
+                min_fanout, min_ratio, edges_per_mover):
+    window_start = window.start.isoformat()
+    destination = destination_field + keyword_suffix
+    daily_fanout = {
+        "date_histogram": {"field": "@timestamp", "calendar_interval": "day"},
+        "aggs": {"destinations": {"cardinality": {"field": destination}}}
+    }
+    return {
+        "query": {
+            "bool": {
+                "filter": filters + [
+                    {"range": {"@timestamp": {"gte": baseline_start.isoformat(), "lte": window.bounds()['lte']}}}
+                ]
+            }
+        },
+        "size": 0,
+        "aggs": {
+            "movers": {
+                "composite": {
+                    "size": page_size,
+                    "sources": [
+                        {"user": {"terms": {"field": "user.name" + keyword_suffix}}},
+                        {"source_host": {"terms": {"field": "host.name" + keyword_suffix}}}
+                    ]
+                },
+                "aggs": {
+                    "current": {
+                        "filter": window.range_clause(),
+                        "aggs": {
+                            "destinations": {"cardinality": {"field": destination}},
+                            "days": daily_fanout,
+                            "peak": {"max_bucket": {"buckets_path": "days>destinations"}}
+                        }
+                    },
+                    "baseline": {
+                        "filter": {"range": {"@timestamp": {"gte": baseline_start.isoformat(), "lt": window_start}}},
+                        "aggs": {
+                            "destinations": {"cardinality": {"field": destination}},
+                            "days": daily_fanout,
+                            "typical": {"avg_bucket": {"buckets_path": "days>destinations"}}
+                        }
+                    },
+                    # Newest first contacts first; edges older than the window are dropped
+                    "edges": {
+                        "terms": {"field": destination, "size": edges_per_mover, "order": {"first_seen": "desc"}},
+                        "aggs": {
+                            "first_seen": {"min": {"field": "@timestamp"}},
+                            "new": {
+                                "bucket_selector": {
+                                    "buckets_path": {"first_seen": "first_seen"},
+                                    "script": f"params.first_seen >= {int(window.start.timestamp() * 1000)}L"
+                                }
+                            }
+                        }
+                    },
+                    "jump": {
+                        "bucket_selector": {
+                            "buckets_path": {"peak": "current>peak", "typical": "baseline>typical"},
+                            "gap_policy": "insert_zeros",
+                            "script": (
+                                f"params.peak >= {min_fanout} && "
+                                f"params.peak >= {min_ratio} * Math.max(params.typical, 1)"
+                            )
+                        }
+                    }
+                }
+            }
+        }
+    }
+
+
+def _value(metric):
+    return metric.get('value') or 0
+
+
+def mover(bucket):
+    current, baseline = bucket['current'], bucket['baseline']
+    peak = int(_value(current['peak']))
+    typical = round(_value(baseline['typical']), 2)
+    return {
+        "user": bucket['key']['user'],
+        "source_host": bucket['key']['source_host'],
+        "events": current['doc_count'],
+        "destinations": current['destinations']['value'],
+        "peak_daily_fanout": peak,
+        "baseline_daily_fanout": typical,
+        "baseline_destinations": baseline['destinations']['value'],
+        "score": round(peak / max(typical, 1), 2),
+        "new_edges": [
+            {"destination": edge['key'], "first_seen": edge['first_seen'].get('value_as_string') or edge['first_seen']['value']}
+            for edge in bucket['edges']['buckets']
+        ]
+    }
+
+
+def rank(movers):
+    """Largest jump over baseline first, then most new edges and widest reach"""
+    return sorted(
+        movers,
+        key=lambda m: (m['score'], len(m['new_edges']), m['destinations']),
+        reverse=True
+    )
+
+
+def as_hit(entry):
+    """Findings-store hit for a mover, keyed by user and source host"""
+    return {
+        "_index": "",
+        "_id": f"lateral_movement:{entry['user']}|{entry['source_host']}",
+        "_source": {
+            "@timestamp": entry['new_edges'][0]['first_seen'] if entry['new_edges'] else None,
+            "host": {"name": entry['source_host']},
+            "user": {"name": entry['user']},
+            "lateral_movement": entry
+        }
+    }
@@ -0,0 +1,111 @@
+"""Compile catalogue query strings into structured filter-context DSL.
+
+The attack pattern catalogue is written as Lucene ``query_string`` text for
+readability. Sending it as-is makes Elasticsearch re-parse it on every
+request, expands ``field:*`` into wildcard term scans and keeps the clauses
+out of the filter cache. The subset the catalogue uses - ``AND``-joined
+``field:value``, ``field:(a OR b)`` and ``field:*`` clauses - compiles to
+``term``, ``terms`` and ``exists`` filters; anything else raises
+QueryCompileError so the caller can fall back to ``query_string``.
+
+String values match the keyword field case-insensitively, as the analysed
+``query_string`` did, so ``user.name:administrator`` still finds
+"Administrator". ``terms`` has no ``case_insensitive`` flag, so string lists
+become a ``bool.should`` of ``term`` clauses.
+"""
+import re
+
+_NUMBER = re.compile(r'^-?\d+(?:\.\d+)?$')
+_FIELD = re.compile(r'^[A-Za-z_@][\w.@-]*$')
+_BARE_VALUE = re.compile(r'^[^\s"*?~^\[\]{}()\\/:<>=!]+$')
+
+
+class QueryCompileError(ValueError):
+    pass
+
+
+def _split_top_level(text, separator):
+    """Split on separator outside quotes and parentheses"""
+    parts = []
+    depth = 0
+    quoted = False
+    start = 0
+    i = 0
+    while i < len(text):
+        char = text[i]
+        if char == '\\':
+            i += 2
+            continue
+        if char == '"':
+            quoted = not quoted
+        elif not quoted and char == '(':
+            depth += 1
+        elif not quoted and char == ')':
+            depth -= 1
+        elif not quoted and depth == 0 and text.startswith(separator, i):
+            parts.append(text[start:i])
+            i += len(separator)
+            start = i
+            continue
+        i += 1
+    if quoted or depth:
+        raise QueryCompileError(f"Unbalanced query: {text}")
+    parts.append(text[start:])
+    return [part.strip() for part in parts]
+
+
+def _parse_value(value):
+    if len(value) >= 2 and value[0] == '"' and value[-1] == '"':
+        inner = value[1:-1]
+        if '"' in inner.replace('\\"', ''):
+            raise QueryCompileError(f"Unsupported value: {value}")
+        return inner.replace('\\"', '"').replace('\\\\', '\\')
+    if _NUMBER.match(value):
+        return float(value) if '.' in value else int(value)
+    if _BARE_VALUE.match(value) and value not in ('AND', 'OR', 'NOT'):
+        return value
+    raise QueryCompileError(f"Unsupported value: {value}")
+
+
+def _numeric(values):
+    return all(isinstance(value, (int, float)) for value in values)
+
+
+def _string_term(field, value):
+    return {"term": {field: {"value": value, "case_insensitive": True}}}
+
+
+def compile_clause(clause, keyword_suffix='.keyword'):
+    """Compile one ``field:value`` clause into a filter"""
+    field, separator, value = clause.partition(':')
+    field, value = field.strip(), value.strip()
+    if not separator or not _FIELD.match(field) or not value:
+        raise QueryCompileError(f"Unsupported clause: {clause}")
+
+    if value == '*':
+        return {"exists": {"field": field}}
+
+    # Numbers query the field itself; strings go to the exact-match keyword field
+    if value[0] == '(' and value[-1] == ')':
+        values = [_parse_value(part) for part in _split_top_level(value[1:-1].strip(), ' OR ')]
+        if _numeric(values):
+            return {"terms": {field: values}}
+        if len(values) == 1:
+            return _string_term(field + keyword_suffix, values[0])
+        return {
+            "bool": {
+                "should": [_string_term(field + keyword_suffix, value) for value in values],
+                "minimum_should_match": 1
+            }
+        }
+
+    parsed = _parse_value(value)
+    if _numeric([parsed]):
+        return {"term": {field: parsed}}
+    return _string_term(field + keyword_suffix, parsed)
+
+
+def compile_query(query, keyword_suffix='.keyword'):
+    """Compile an AND-joined query string into a filter-context bool query"""
+    clauses = _split_top_level(query.strip(), ' AND ')
+    return {"bool": {"filter": [compile_clause(clause, keyword_suffix) for clause in clauses]}}
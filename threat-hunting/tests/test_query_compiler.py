@@ -0,0 +1,83 @@
+"""Compiled catalogue queries must match like the query_string they replace"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from query_compiler import QueryCompileError, compile_query
+
+
+def _field(doc, path):
+    for part in path.removesuffix('.keyword').split('.'):
+        if not isinstance(doc, dict) or part not in doc:
+            return None
+        doc = doc[part]
+    return doc
+
+
+def _matches(clause, doc):
+    """Evaluate the DSL subset the compiler emits with keyword-field semantics"""
+    kind, body = next(iter(clause.items()))
+    if kind == 'bool':
+        filters = all(_matches(inner, doc) for inner in body.get('filter', []))
+        should = body.get('should')
+        return filters and (not should or any(_matches(inner, doc) for inner in should))
+    if kind == 'exists':
+        return _field(doc, body['field']) is not None
+    (field, spec), = body.items()
+    actual = _field(doc, field)
+    if kind == 'terms':
+        return actual in spec
+    if not isinstance(spec, dict):
+        return actual == spec
+    if spec.get('case_insensitive') and isinstance(actual, str):
+        return actual.lower() == str(spec['value']).lower()
+    return actual == spec['value']
+
+
+@pytest.mark.parametrize('query, doc', [
+    (
+        'event.category:authentication AND event.outcome:success AND user.name:("admin" OR "administrator" OR "root")',
+        {"event": {"category": "authentication", "outcome": "success"}, "user": {"name": "Administrator"}}
+    ),
+    (
+        'process.name:("cmd.exe" OR "powershell.exe" OR "bash" OR "sh") AND process.args:*',
+        {"process": {"name": "PowerShell.exe", "args": ["-enc", "AAAA"]}}
+    ),
+    (
+        'event.category:process AND process.name:("svchost.exe" OR "winlogon.exe" OR "lsass.exe")',
+        {"event": {"category": "Process"}, "process": {"name": "LSASS.EXE"}}
+    ),
+    ('user.name:administrator', {"user": {"name": "ADMINISTRATOR"}}),
+])
+def test_string_values_match_case_insensitively(query, doc):
+    assert _matches(compile_query(query), doc)
+
+
+def test_non_matching_values_still_miss():
+    query = compile_query('process.name:("cmd.exe" OR "powershell.exe")')
+    assert not _matches(query, {"process": {"name": "PowerShell_ISE.exe"}})
+
+
+def test_numbers_query_the_field_itself():
+    query = compile_query('destination.port:(80 OR 443) AND event.code:4625')
+    assert query == {"bool": {"filter": [
+        {"terms": {"destination.port": [80, 443]}},
+        {"term": {"event.code": 4625}}
+    ]}}
+
+
+def test_string_clauses_are_case_insensitive_terms():
+    assert compile_query('network.protocol:("http" OR "dns")', keyword_suffix='') == {"bool": {"filter": [
+        {"bool": {"should": [
+            {"term": {"network.protocol": {"value": "http", "case_insensitive": True}}},
+            {"term": {"network.protocol": {"value": "dns", "case_insensitive": True}}}
+        ], "minimum_should_match": 1}}
+    ]}}
+
+
+def test_unsupported_syntax_falls_back():
+    with pytest.raises(QueryCompileError):
+        compile_query('process.name:power*')
@@ -0,0 +1,145 @@
+"""Server-side threshold hunts for brute force and password spraying.
+
+Instead of returning the newest failed logins for the client to count, these
+hunts let Elasticsearch find the offenders. A composite aggregation pages
+through ``source.ip`` x ``user.name`` (brute force) or ``source.ip`` (password
+spraying); under each entity a ``date_histogram`` with the rule's timeframe
+as its interval keeps only windows that reached the threshold, and a
+``bucket_selector`` drops every entity without one. Each page therefore
+carries only offending entities with their counts, peak window and first and
+last seen, however many failures the window holds.
+
+Windows are fixed ``timeframe``-wide buckets, so a burst straddling a bucket
+edge is counted in two halves.
+"""
+
+
+def _interval(threshold):
+    # fixed_interval has no week unit; seconds cover every timeframe
+    return f"{int(threshold.span.total_seconds())}s"
+
+
+def _selector(threshold):
+    return {
+        "bucket_selector": {
+            "buckets_path": {"peak": "peak"},
+            "script": f"params.peak != null && params.peak >= {threshold.count}"
+        }
+    }
+
+
+def brute_force_body(failed_logins, range_clause, threshold, page_size, keyword_suffix):
+    """Failures per source and account; offenders reached ``count`` failures in one window"""
+    return {
+        "query": {"bool": {"filter": [failed_logins, range_clause]}},
+        "size": 0,
+        "aggs": {
+            "offenders": {
+                "composite": {
+                    "size": page_size,
+                    "sources": [
+                        {"source_ip": {"terms": {"field": "source.ip" + keyword_suffix}}},
+                        {"user": {"terms": {"field": "user.name" + keyword_suffix}}}
+                    ]
+                },
+                "aggs": {
+                    "windows": {
+                        "date_histogram": {
+                            "field": "@timestamp",
+                            "fixed_interval": _interval(threshold),
+                            "min_doc_count": threshold.count
+                        }
+                    },
+                    "peak": {"max_bucket": {"buckets_path": "windows>_count"}},
+                    "first_seen": {"min": {"field": "@timestamp"}},
+                    "last_seen": {"max": {"field": "@timestamp"}},
+                    "threshold": _selector(threshold)
+                }
+            }
+        }
+    }
+
+
+def password_spray_body(failed_logins, range_clause, threshold, page_size, keyword_suffix):
+    """Distinct accounts failed per source; offenders hit ``count`` accounts in one window"""
+    user_field = "user.name" + keyword_suffix
+    return {
+        "query": {"bool": {"filter": [failed_logins, range_clause]}},
+        "size": 0,
+        "aggs": {
+            "offenders": {
+                "composite": {
+                    "size": page_size,
+                    "sources": [
+                        {"source_ip": {"terms": {"field": "source.ip" + keyword_suffix}}}
+                    ]
+                },
+                "aggs": {
+                    "windows": {
+                        "date_histogram": {
+                            "field": "@timestamp",
+                            "fixed_interval": _interval(threshold),
+                            # Fewer failures than the threshold cannot span enough accounts
+                            "min_doc_count": threshold.count
+                        },
+                        "aggs": {"accounts": {"cardinality": {"field": user_field}}}
+                    },
+                    "peak": {"max_bucket": {"buckets_path": "windows>accounts"}},
+                    "accounts": {"cardinality": {"field": user_field}},
+                    "users": {"terms": {"field": user_field, "size": 10}},
+                    "first_seen": {"min": {"field": "@timestamp"}},
+                    "last_seen": {"max": {"field": "@timestamp"}},
+                    "threshold": _selector(threshold)
+                }
+            }
+        }
+    }
+
+
+def _timestamp(metric):
+    return metric.get('value_as_string') or metric.get('value')
+
+
+def _peak(bucket):
+    peak = bucket['peak']
+    return int(peak.get('value') or 0), (peak.get('keys') or [None])[0]
+
+
+def brute_force_offender(bucket):
+    peak, peak_at = _peak(bucket)
+    return {
+        "source_ip": bucket['key']['source_ip'],
+        "user": bucket['key']['user'],
+        "failures": bucket['doc_count'],
+        "peak": peak,
+        "peak_at": peak_at,
+        "first_seen": _timestamp(bucket['first_seen']),
+        "last_seen": _timestamp(bucket['last_seen'])
+    }
+
+
+def password_spray_offender(bucket):
+    peak, peak_at = _peak(bucket)
+    return {
+        "source_ip": bucket['key']['source_ip'],
+        "failures": bucket['doc_count'],
+        "accounts": bucket['accounts']['value'],
+        "peak": peak,
+        "peak_at": peak_at,
+        "users": [user['key'] for user in bucket['users']['buckets']],
+        "first_seen": _timestamp(bucket['first_seen']),
+        "last_seen": _timestamp(bucket['last_seen'])
+    }
+
+
+def as_hit(hunt, offender):
+    """Findings-store hit for an offender, keyed by entity so executions diff cleanly"""
+    entity = '|'.join(filter(None, (offender['source_ip'], offender.get('user'))))
+    source = {
+        "@timestamp": offender['last_seen'],
+        "source": {"ip": offender['source_ip']},
+        "threshold": offender
+    }
+    if offender.get('user'):
+        source["user"] = {"name": offender['user']}
+    return {"_index": "", "_id": f"{hunt}:{entity}", "_source": source}